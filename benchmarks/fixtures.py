@@ -0,0 +1,70 @@
+import copy
+import json
+import os
+
+# 🔹 Données rejouées par le serveur de substitution.
+# Les pages `finder/search` sont dérivées de l'annonce réelle enregistrée dans
+# src/scrapers/leboncoin/ads.json : identifiants, prix et surfaces varient d'une annonce à l'autre
+# pour que la détection de changements et les index travaillent comme en production.
+
+RECORDED_AD_PATH = os.path.join(os.path.dirname(__file__), "..", "src", "scrapers", "leboncoin", "ads.json")
+
+ADS_PER_PAGE = 35
+IMAGES_PER_AD = 3
+
+# Taille moyenne d'une image d'annonce servie par le CDN (règle "ad-image")
+IMAGE_BYTES = 45_000
+
+
+def load_recorded_ad() -> dict:
+    with open(RECORDED_AD_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def jpeg_payload(size: int = IMAGE_BYTES) -> bytes:
+    """Contenu encadré comme un JPEG (SOI, APP0 JFIF, segments COM de remplissage, EOI) de `size` octets."""
+    head = bytes.fromhex("ffd8ffe000104a46494600010100000100010000")
+    body = bytearray()
+    remaining = max(size - len(head) - 2, 0)
+    while remaining > 4:
+        chunk = min(remaining - 4, 65533)
+        body += b"\xff\xfe" + (chunk + 2).to_bytes(2, "big") + bytes(chunk)
+        remaining -= chunk + 4
+    return head + bytes(body) + b"\xff\xd9"
+
+
+def make_ad(template: dict, list_id: int, base_url: str, images_per_ad: int = IMAGES_PER_AD) -> dict:
+    ad = copy.deepcopy(template)
+    ad["list_id"] = list_id
+    ad["url"] = f"{base_url}/ad/locations/{list_id}"
+    ad["price"] = [500 + (list_id * 37) % 2000]
+    urls = [f"{base_url}/api/v1/lbcpb1/images/{list_id}/{index}.jpg?rule=ad-image" for index in range(images_per_ad)]
+    ad["images"] = {**ad.get("images", {}), "nb_images": len(urls), "urls": urls}
+    for attr in ad.get("attributes", []):
+        if attr.get("key") == "square":
+            surface = 15 + list_id % 120
+            attr["value"], attr["value_label"] = str(surface), f"{surface} m²"
+    return ad
+
+
+def make_search_page(template: dict, page_number: int, base_url: str, total: int,
+                     per_page: int = ADS_PER_PAGE, images_per_ad: int = IMAGES_PER_AD, first_id: int = 3_000_000_000) -> dict:
+    """Réponse `finder/search` de la page `page_number` d'une recherche de `total` annonces."""
+    start = (page_number - 1) * per_page
+    ads = [
+        make_ad(template, first_id + index, base_url, images_per_ad)
+        for index in range(start, min(start + per_page, total))
+    ]
+    return {"total": total, "total_all": total, "max_pages": -(-total // per_page), "ads": ads, "pivot": f"page-{page_number}"}
+
+
+def ad_html(ad: dict) -> str:
+    """Page d'annonce minimale portant les données dans __NEXT_DATA__, comme le site."""
+    next_data = json.dumps({"props": {"pageProps": {"ad": ad}}}, ensure_ascii=False)
+    return (
+        "<!DOCTYPE html><html lang=\"fr\"><head><meta charset=\"utf-8\">"
+        f"<title>{ad.get('subject', '')}</title></head><body>"
+        f"<h1>{ad.get('subject', '')}</h1>"
+        f"<script id=\"__NEXT_DATA__\" type=\"application/json\">{next_data}</script>"
+        "</body></html>"
+    )
@@ -0,0 +1,328 @@
+"""Benchmarks hors ligne du pipeline de scraping.
+
+    python -m benchmarks.run                         # toutes les mesures, résultat dans benchmarks/results/<sha>.json
+    python -m benchmarks.run --only images,mongo     # sous-ensemble
+    python -m benchmarks.run --only model            # AdRecord face à RealStateLBCModel (sans réseau ni base)
+    python -m benchmarks.run --only imports          # démarrage à froid de l'API et du worker (processus neufs)
+    python -m benchmarks.run --compare <sha>         # compare au résultat enregistré pour un autre commit
+
+Leboncoin, le CDN d'images et Backblaze B2 sont remplacés par le serveur local de
+benchmarks/standin.py. Les mesures MongoDB utilisent un mongod local (BENCH_MONGO_URI,
+base dédiée vidée à chaque exécution) et sont ignorées s'il n'est pas joignable.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from benchmarks.standin import StandInServer
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+BENCH_MONGO_URI = os.getenv("BENCH_MONGO_URI", "mongodb://localhost:27017/xtractify_bench")
+BENCHMARKS = ("images", "process_ad", "mongo", "model", "imports")
+
+# Point d'entrée mesuré par processus, et dépendances lourdes que l'API ne doit pas charger
+IMPORT_TARGETS = {"api": "main", "worker": "src.workers.worker"}
+SCRAPER_MODULES = ("playwright", "bs4", "requests", "boto3", "b2sdk", "httpx", "src.scrapers.leboncoin.listings_parser")
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+try:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+except ImportError:
+    rss = None
+print(json.dumps({{"seconds": elapsed, "rss": rss, "modules": len(sys.modules),
+                  "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def git_revision() -> str:
+    try:
+        sha = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD", "--", "src"]).returncode != 0
+        return f"{sha}-dirty" if dirty else sha
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def configure_environment(standin_url: str, state_file: str):
+    """Les réglages sont lus à l'import de src.config.settings : à appeler avant tout import de `src`."""
+    os.environ["B2_REALM"] = standin_url
+    os.environ["MONGO_URI"] = BENCH_MONGO_URI
+    os.environ["CRAWL_STATE_BACKEND"] = "file"
+    os.environ["CRAWL_STATE_FILE"] = state_file
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("LOG_JSON", "false")
+
+
+def mongo_available() -> bool:
+    from pymongo import MongoClient
+    try:
+        MongoClient(BENCH_MONGO_URI, serverSelectionTimeoutMS=2000).admin.command("ping")
+        return True
+    except Exception:
+        return False
+
+
+def reset_bench_database():
+    from src.database.realStateLbc import client, db
+    client.drop_database(db.name)
+
+
+def fetch_pages(standin_url: str, pages: int) -> list[dict]:
+    import requests
+    return [
+        requests.post(f"{standin_url}/finder/search", json={"offset": (page - 1) * 35, "limit": 35}, timeout=10).json()
+        for page in range(1, pages + 1)
+    ]
+
+
+def rate(count: int, seconds: float, unit: str) -> dict:
+    return {"count": count, "seconds": round(seconds, 4), "per_second": round(count / seconds, 2) if seconds else None, "unit": unit}
+
+
+def footprint(count: int, allocated: int, unit: str = "octets/annonce") -> dict:
+    """Mémoire retenue par `count` objets ; pas de débit, ignorée par compare()."""
+    return {"count": count, "bytes": allocated, "per_second": None, "bytes_per_item": round(allocated / count), "unit": unit}
+
+
+# --- Mesures ---------------------------------------------------------------------------------
+
+async def bench_images(server: StandInServer, ads: int) -> dict:
+    """Téléchargement depuis le CDN puis envoi vers B2, annonce par annonce comme build_annonce."""
+    from src.utils.b2_util import upload_image_to_b2
+    page = fetch_pages(server.url, 1)[0]
+    urls_by_ad = [ad["images"]["urls"] for ad in page["ads"]][:ads]
+    start = time.perf_counter()
+    for urls in urls_by_ad:
+        await asyncio.gather(*(upload_image_to_b2(url, "bench") for url in urls))
+    elapsed = time.perf_counter() - start
+    return {"images": rate(sum(len(urls) for urls in urls_by_ad), elapsed, "images/s")}
+
+
+async def bench_process_ad(server: StandInServer, pages: int) -> dict:
+    """Pages complètes via persist_ads (plugin Leboncoin) : premier passage (annonces nouvelles), puis second (connues)."""
+    from src.scrapers.engine import RateLimiter, persist_ads
+    from src.scrapers.plugin import get_plugin
+    reset_bench_database()
+    plugin = get_plugin("leboncoin")
+    responses = fetch_pages(server.url, pages)
+    results = {}
+    for label in ("new", "known"):
+        summary = {"ads": 0, "new_ads": 0, "changed_ads": 0}
+        seen = set()
+        start = time.perf_counter()
+        for response in responses:
+            await persist_ads(plugin, None, response["ads"], "bench", seen, RateLimiter(0), summary)
+        results[f"process_ad_{label}"] = rate(summary["ads"], time.perf_counter() - start, "ads/s")
+    return results
+
+
+def bench_mongo(server: StandInServer, documents: int) -> dict:
+    """Écritures unitaires (insert), mises à jour de présence par page et lecture des annonces connues."""
+    from src.database.realStateLbc import RealStateLBCModel, save_annonce_to_db, mark_annonces_seen, load_known_annonces
+    reset_bench_database()
+    now = datetime.utcnow()
+    models = [
+        RealStateLBCModel(id=str(4_000_000_000 + index), title="Studio bench", price=500 + index % 900,
+                          surface=f"{15 + index % 80} m²", scraped_at=now)
+        for index in range(documents)
+    ]
+    ids = [model.id for model in models]
+    pages = [ids[i:i + 35] for i in range(0, len(ids), 35)]
+
+    start = time.perf_counter()
+    for model in models:
+        save_annonce_to_db(model)
+    insert = rate(documents, time.perf_counter() - start, "docs/s")
+
+    start = time.perf_counter()
+    for page in pages:
+        mark_annonces_seen(page, "bench")
+    seen = rate(len(pages), time.perf_counter() - start, "pages/s")
+
+    start = time.perf_counter()
+    for page in pages:
+        load_known_annonces(page)
+    known = rate(len(pages), time.perf_counter() - start, "pages/s")
+    return {"mongo_insert": insert, "mongo_mark_seen": seen, "mongo_load_known": known}
+
+
+def bench_model(server: StandInServer, pages: int, documents: int) -> dict:
+    """Construction, conversion en document BSON / JSON et mémoire : AdRecord face à RealStateLBCModel."""
+    from src.database.models import AdRecord
+    from src.database.realStateLbc import RealStateLBCModel, compute_fingerprint
+    from src.scrapers.leboncoin.listings_parser import annonce_values, tracked_fields
+    raw_ads = [ad for response in fetch_pages(server.url, pages) for ad in response["ads"]]
+    values = []
+    for index in range(documents):
+        ad = raw_ads[index % len(raw_ads)]
+        fields = tracked_fields(ad)
+        values.append(annonce_values(ad, fields, compute_fingerprint(fields), ad["images"]["urls"]))
+
+    implementations = {
+        "pydantic": (RealStateLBCModel, lambda model: model.model_dump(by_alias=True, exclude_none=True),
+                     lambda model: model.model_dump_json(exclude_none=True)),
+        "record": (AdRecord, AdRecord.to_document, AdRecord.to_json),
+    }
+    results = {}
+    for label, (model_class, to_document, to_json) in implementations.items():
+        start = time.perf_counter()
+        models = [model_class(**value) for value in values]
+        results[f"model_build_{label}"] = rate(documents, time.perf_counter() - start, "ads/s")
+        start = time.perf_counter()
+        for model in models:
+            to_document(model)
+        results[f"model_bson_{label}"] = rate(documents, time.perf_counter() - start, "ads/s")
+        start = time.perf_counter()
+        for model in models:
+            to_json(model)
+        results[f"model_json_{label}"] = rate(documents, time.perf_counter() - start, "ads/s")
+        del models
+
+        # Mémoire des instances seules : les valeurs (chaînes, listes) sont partagées par les deux modèles
+        tracemalloc.start()
+        models = [model_class(**value) for value in values]
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[f"model_memory_{label}"] = footprint(documents, allocated)
+        del models
+    return results
+
+
+def bench_imports(runs: int) -> dict:
+    """Import à froid des points d'entrée, chacun dans un processus neuf : durée, mémoire, modules chargés."""
+    import statistics
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = {}
+    for label, module in IMPORT_TARGETS.items():
+        probes = []
+        for _ in range(runs):
+            output = subprocess.check_output(
+                [sys.executable, "-c", IMPORT_PROBE.format(module=module, heavy=SCRAPER_MODULES)], cwd=root, text=True
+            )
+            probes.append(json.loads(output.strip().splitlines()[-1]))
+        seconds = statistics.median(probe["seconds"] for probe in probes)
+        results[f"import_{label}"] = {**rate(1, seconds, "imports/s"), "modules": probes[0]["modules"], "loaded": probes[0]["loaded"]}
+        if probes[0]["rss"]:
+            results[f"import_{label}_memory"] = footprint(1, min(probe["rss"] for probe in probes), "octets (RSS)")
+    return results
+
+
+# --- Enregistrement et comparaison -----------------------------------------------------------
+
+def save_results(results: dict) -> str:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    revision = results["revision"]
+    path = os.path.join(RESULTS_DIR, f"{revision}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def load_results(reference: str) -> dict:
+    path = reference if reference.endswith(".json") else os.path.join(RESULTS_DIR, f"{reference}.json")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> bool:
+    """Affiche l'écart par mesure ; retourne False si une mesure régresse de plus de `threshold`."""
+    ok = True
+    print(f"\n{'mesure':<22}{baseline['revision']:>16}{current['revision']:>16}{'écart':>10}")
+    for name, measure in current["metrics"].items():
+        before = baseline["metrics"].get(name)
+        if not before or not before.get("per_second") or not measure.get("per_second"):
+            continue
+        delta = measure["per_second"] / before["per_second"] - 1
+        flag = ""
+        if delta < -threshold:
+            flag, ok = "  ⚠️ régression", False
+        print(f"{name:<22}{before['per_second']:>16}{measure['per_second']:>16}{delta:>+10.1%}{flag}")
+    return ok
+
+
+async def run(selected: list[str], args) -> dict:
+    metrics, skipped = {}, {}
+    with tempfile.TemporaryDirectory() as tmp, StandInServer(
+        total_ads=args.pages * 35, images_per_ad=args.images_per_ad, image_bytes=args.image_bytes, latency=args.latency
+    ) as server:
+        configure_environment(server.url, os.path.join(tmp, "crawl_state.json"))
+        from src.config.logging_config import setup_logging
+        setup_logging()
+        has_mongo = mongo_available()
+
+        for name in selected:
+            if name in ("process_ad", "mongo") and not has_mongo:
+                skipped[name] = f"mongod injoignable ({BENCH_MONGO_URI})"
+                continue
+            print(f"⏱️ {name}...", flush=True)
+            if name == "images":
+                metrics.update(await bench_images(server, args.ads))
+            elif name == "process_ad":
+                metrics.update(await bench_process_ad(server, args.pages))
+            elif name == "mongo":
+                metrics.update(await asyncio.to_thread(bench_mongo, server, args.documents))
+            elif name == "imports":
+                metrics.update(await asyncio.to_thread(bench_imports, args.import_runs))
+            elif name == "model":
+                metrics.update(await asyncio.to_thread(bench_model, server, args.pages, args.documents))
+        if has_mongo and any(name in selected for name in ("process_ad", "mongo")):
+            reset_bench_database()
+
+    return {
+        "revision": git_revision(),
+        "date": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": vars(args),
+        "metrics": metrics,
+        "skipped": skipped,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks hors ligne Xtractify")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help=f"Mesures à lancer parmi {', '.join(BENCHMARKS)}")
+    parser.add_argument("--pages", type=int, default=4, help="Pages de 35 annonces traitées par process_ad")
+    parser.add_argument("--ads", type=int, default=35, help="Annonces dont les images sont transférées")
+    parser.add_argument("--images-per-ad", type=int, default=3)
+    parser.add_argument("--image-bytes", type=int, default=45_000)
+    parser.add_argument("--documents", type=int, default=2000, help="Documents écrits par la mesure mongo, annonces construites par la mesure model")
+    parser.add_argument("--import-runs", type=int, default=5, help="Processus lancés par point d'entrée pour la mesure imports")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence ajoutée à chaque réponse du serveur (s)")
+    parser.add_argument("--compare", help="Révision (ou fichier JSON) de référence")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Régression tolérée avant échec (0.10 = 10 %%)")
+    parser.add_argument("--no-save", action="store_true", help="Ne pas enregistrer le résultat")
+    args = parser.parse_args()
+
+    selected = [name for name in args.only.split(",") if name]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"mesures inconnues : {', '.join(sorted(unknown))}")
+
+    results = asyncio.run(run(selected, args))
+    for name, measure in results["metrics"].items():
+        if measure["per_second"] is None:
+            print(f"{name:<22}{measure['bytes_per_item']:>12} {measure['unit']}  ({measure['count']} en mémoire)")
+            continue
+        print(f"{name:<22}{measure['per_second']:>12} {measure['unit']}  ({measure['count']} en {measure['seconds']} s)")
+    for name, reason in results["skipped"].items():
+        print(f"{name:<22}ignorée : {reason}")
+    if not args.no_save:
+        print(f"💾 {save_results(results)}")
+    if args.compare and not compare(results, load_results(args.compare), args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from benchmarks.fixtures import load_recorded_ad, make_search_page, make_ad, ad_html, jpeg_payload, ADS_PER_PAGE
+
+# 🔹 Serveur local de substitution, sur un seul port :
+#   POST|GET /finder/search                 API de recherche (api.leboncoin.fr)
+#   GET      /ad/locations/<id>             pages d'annonce (www.leboncoin.fr)
+#   GET      /api/v1/lbcpb1/images/...      CDN d'images (img.leboncoin.fr)
+#   *        /b2api/v<N>/...                API native Backblaze B2 (autorisation, buckets, upload)
+# Le serveur sert de realm B2 : B2_REALM=http://127.0.0.1:<port>.
+
+B2_ROUTE = re.compile(r"^/b2api/v\d+/(?P<endpoint>\w+)$")
+BUCKET_ID = "benchbucket0001"
+
+
+class StandInState:
+    """Compteurs et paramètres partagés par les requêtes du serveur."""
+
+    def __init__(self, total_ads: int, images_per_ad: int, image_bytes: int, latency: float):
+        self.template = load_recorded_ad()
+        self.total_ads = total_ads
+        self.images_per_ad = images_per_ad
+        self.image = jpeg_payload(image_bytes)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.counters = {"search": 0, "ad_pages": 0, "images": 0, "uploads": 0, "uploaded_bytes": 0}
+
+    def count(self, name: str, amount: int = 1):
+        with self.lock:
+            self.counters[name] += amount
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "XtractifyStandIn/1.0"
+
+    @property
+    def state(self) -> StandInState:
+        return self.server.state
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def log_message(self, format, *args):
+        pass  # Pas de journal par requête : il fausserait les mesures
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, payload: dict, status: int = 200):
+        self._send(status, json.dumps(payload).encode("utf-8"), "application/json")
+
+    def do_GET(self):
+        self._route("GET", b"")
+
+    def do_POST(self):
+        self._route("POST", self._body())
+
+    def _route(self, method: str, body: bytes):
+        url = urlparse(self.path)
+        b2_match = B2_ROUTE.match(url.path)
+        if url.path.startswith("/finder/search"):
+            self._search(url, body)
+        elif url.path.startswith("/ad/"):
+            self._ad_page(url)
+        elif url.path.startswith("/api/v1/lbcpb1/images/"):
+            self.state.count("images")
+            self._send(200, self.state.image, "image/jpeg")
+        elif url.path.startswith("/b2api/upload/"):
+            self._b2_upload(url, body)
+        elif b2_match:
+            self._b2(b2_match.group("endpoint"), body)
+        else:
+            self._json({"error": "not found", "path": url.path}, status=404)
+
+    # --- Leboncoin -------------------------------------------------------------------------
+
+    def _search(self, url, body: bytes):
+        self.state.count("search")
+        page_number = int(parse_qs(url.query).get("page", ["1"])[0])
+        if body:
+            request = json.loads(body)
+            page_number = int(request.get("offset", 0)) // int(request.get("limit", ADS_PER_PAGE)) + 1
+        self._json(make_search_page(self.state.template, page_number, self.base_url, self.state.total_ads,
+                                    images_per_ad=self.state.images_per_ad))
+
+    def _ad_page(self, url):
+        self.state.count("ad_pages")
+        list_id = int(url.path.rstrip("/").split("/")[-1])
+        html = ad_html(make_ad(self.state.template, list_id, self.base_url, self.state.images_per_ad))
+        self._send(200, html.encode("utf-8"), "text/html; charset=utf-8")
+
+    # --- Backblaze B2 ----------------------------------------------------------------------
+
+    def _b2(self, endpoint: str, body: bytes):
+        base = self.base_url
+        if endpoint == "b2_authorize_account":
+            allowed = {"bucketId": None, "bucketName": None, "capabilities": ["listBuckets", "writeFiles", "readFiles"], "namePrefix": None}
+            self._json({
+                "accountId": "benchaccount",
+                "authorizationToken": "bench-token",
+                "apiInfo": {"storageApi": {
+                    "apiUrl": base,
+                    "downloadUrl": base,
+                    "s3ApiUrl": base,
+                    "recommendedPartSize": 100_000_000,
+                    "absoluteMinimumPartSize": 5_000_000,
+                    "infoType": "storageApi",
+                    # Restrictions de la clé, aux formats des différentes versions de l'API lues par b2sdk
+                    **allowed,
+                    "allowed": {**allowed, "buckets": None},
+                }},
+                "applicationKeyExpirationTimestamp": None,
+            })
+        elif endpoint == "b2_list_buckets":
+            request = json.loads(body or b"{}")
+            self._json({"buckets": [{
+                "accountId": "benchaccount",
+                "bucketId": BUCKET_ID,
+                "bucketName": request.get("bucketName") or "cercina-real-estate-files",
+                "bucketType": "allPublic",
+                "bucketInfo": {},
+                "corsRules": [],
+                "lifecycleRules": [],
+                "revision": 1,
+                "options": [],
+                "defaultServerSideEncryption": {"isClientAuthorizedToRead": True, "value": {"mode": None}},
+                "fileLockConfiguration": {"isClientAuthorizedToRead": True, "value": {"isFileLockEnabled": False, "defaultRetention": {"mode": None, "period": None}}},
+                "replicationConfiguration": {"isClientAuthorizedToRead": True, "value": None},
+            }]})
+        elif endpoint == "b2_get_upload_url":
+            self._json({"bucketId": BUCKET_ID, "uploadUrl": f"{base}/b2api/upload/{BUCKET_ID}", "authorizationToken": "bench-upload-token"})
+        else:
+            self._json({"status": 400, "code": "bad_request", "message": f"endpoint {endpoint} non simulé"}, status=400)
+
+    def _b2_upload(self, url, body: bytes):
+        self.state.count("uploads")
+        self.state.count("uploaded_bytes", len(body))
+        now = int(time.time() * 1000)
+        self._json({
+            "accountId": "benchaccount",
+            "action": "upload",
+            "bucketId": BUCKET_ID,
+            "contentLength": len(body),
+            "contentSha1": hashlib.sha1(body).hexdigest(),
+            "contentMd5": hashlib.md5(body).hexdigest(),
+            "contentType": self.headers.get("Content-Type", "b2/x-auto"),
+            "fileId": f"4_z{BUCKET_ID}_{now}_{self.state.counters['uploads']}",
+            "fileInfo": {},
+            "fileName": self.headers.get("X-Bz-File-Name", ""),
+            "uploadTimestamp": now,
+            "serverSideEncryption": {"mode": None},
+            "legalHold": {"isClientAuthorizedToRead": True, "value": None},
+            "fileRetention": {"isClientAuthorizedToRead": True, "value": {"mode": None}},
+            "replicationStatus": None,
+        })
+
+
+class StandInServer:
+    """Serveur de substitution lancé dans un thread : `with StandInServer() as server: server.url`."""
+
+    def __init__(self, total_ads: int = 350, images_per_ad: int = 3, image_bytes: int = 45_000, latency: float = 0.0):
+        self.state = StandInState(total_ads, images_per_ad, image_bytes, latency)
+        self.httpd = None
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = self.state
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
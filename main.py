@@ -4,13 +4,23 @@ import platform
 if platform.system() == "Windows":
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from src.database.database import init_db, close_db
+from src.config.logging_config import setup_logging
 from loguru import logger
 import uvicorn
 
+setup_logging()
+
 from src.api.apis import api_router  # Import du routeur d'API
+from src.api.listings import listings_router
+from src.api.jobs import start_crawl_schedule, stop_crawl_schedule
+from src.database.job_queue import ensure_job_indexes
+from src.database.realStateLbc import ensure_annonce_indexes
+from src.database.rollups import ensure_rollup_indexes
+from src.utils.metrics import render_metrics
+from src.utils.cache import init_response_cache
 
 # Initialisation de l'application FastAPI
 app = FastAPI(
@@ -30,12 +40,24 @@ app.add_middleware(
 
 # Inclusion des routes API
 app.include_router(api_router, prefix="/api/v1")
+app.include_router(listings_router, prefix="/api/v1")
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Métriques Prometheus du pipeline, agrégées sur les processus de la machine."""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
 
 @app.on_event("startup")
 async def startup_event():
     try:
         await init_db()
         logger.success("✅ Connexion à MongoDB établie avec succès")
+        await init_response_cache()
+        await asyncio.to_thread(ensure_job_indexes)
+        await asyncio.to_thread(ensure_annonce_indexes)
+        await asyncio.to_thread(ensure_rollup_indexes)
+        await start_crawl_schedule()
         logger.info("🚀 Serveur disponible sur http://localhost:8000")
     except Exception as e:
         logger.critical(f"🚨 Erreur critique lors du démarrage: {str(e)}")
@@ -44,6 +66,7 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     try:
+        await stop_crawl_schedule()
         await close_db()
         logger.info("🔌 Connexion MongoDB fermée proprement")
     except Exception as e:
@@ -1,16 +1,66 @@
+from typing import Literal
 from fastapi import APIRouter, HTTPException
-from src.scrapers.leboncoin.location_scraper import access_leboncoin
+from src.database.job_queue import enqueue_job, get_job
+from src.scrapers.plugin import available_plugins
+from src.utils.tracing import load_job_spans, flame_breakdown, to_otlp
 from loguru import logger
 
 api_router = APIRouter()
 
+# Les routes de scraping n'exécutent rien : elles déposent un job consommé par les workers (src.workers.worker)
+
 @api_router.get("/scrape/leboncoin")
-async def scrape_leboncoin():
-    """API pour ouvrir Leboncoin avec Playwright et IP Royal."""
+def scrape_leboncoin(mode: Literal["full", "incremental"] = "full", sharded: bool = False):
+    """Met en file un scraping Leboncoin (parcours complet ou incrémental, éventuellement découpé en shards)."""
     try:
-        result = access_leboncoin()  # ✅ Lancement continu en arrière-plan
-        print(f"🔍 DEBUG API: {result}")  
-        return result
+        job_id = enqueue_job("leboncoin", {"mode": mode, "sharded": sharded})
+        return {"status": "queued", "job_id": job_id}
     except Exception as e:
-        logger.error(f"⚠️ Erreur lors du scraping : {e}")
-        raise HTTPException(status_code=500, detail="Erreur lors du scraping")
\ No newline at end of file
+        logger.error(f"⚠️ Erreur lors de la mise en file du scraping : {e}")
+        raise HTTPException(status_code=500, detail="Erreur lors de la mise en file du scraping")
+
+
+@api_router.get("/scrape/leboncoin/plan")
+def plan_leboncoin():
+    """Met en file le recalcul du plan de shards (région, département, tranches de prix et de surface)."""
+    try:
+        job_id = enqueue_job("leboncoin", {"plan": True}, priority=10, dedup_key="leboncoin:plan")
+        return {"status": "queued", "job_id": job_id}
+    except Exception as e:
+        logger.error(f"⚠️ Erreur lors de la planification des shards : {e}")
+        raise HTTPException(status_code=500, detail="Erreur lors de la planification")
+
+
+@api_router.get("/scrape/sites/{site}")
+def scrape_site(site: str, mode: Literal["full", "incremental"] = "full", max_pages: int | None = None):
+    """Met en file le parcours d'un site enregistré comme plugin, exécuté par le moteur commun."""
+    if site not in available_plugins():
+        raise HTTPException(status_code=404, detail=f"Site inconnu, disponibles : {', '.join(available_plugins())}")
+    try:
+        job_id = enqueue_job("site", {"site": site, "mode": mode, "max_pages": max_pages}, dedup_key=f"site:{site}:{mode}")
+        return {"status": "queued", "job_id": job_id}
+    except Exception as e:
+        logger.error(f"⚠️ Erreur lors de la mise en file du scraping {site} : {e}")
+        raise HTTPException(status_code=500, detail="Erreur lors de la mise en file du scraping")
+
+
+@api_router.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    """État d'un job de scraping : queued, leased, done, dead."""
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job introuvable")
+    return job
+
+
+@api_router.get("/jobs/{job_id}/trace")
+def job_trace(job_id: str, format: Literal["breakdown", "spans", "otlp"] = "breakdown"):
+    """Temps passé par étape d'un job : arbre pour flame chart, spans bruts ou export OTLP/JSON."""
+    spans = load_job_spans(job_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail="Aucun span pour ce job")
+    if format == "spans":
+        return spans
+    if format == "otlp":
+        return to_otlp(job_id, spans)
+    return {"job_id": job_id, **flame_breakdown(spans)}
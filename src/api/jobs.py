@@ -0,0 +1,226 @@
+import asyncio
+from datetime import datetime, timedelta
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from loguru import logger
+from src.config.settings import (
+    INCREMENTAL_INTERVAL_MINUTES, FULL_SWEEP_INTERVAL_HOURS,
+    SCHEDULER_MIN_INTERVAL_MINUTES, SCHEDULER_MAX_INTERVAL_MINUTES, SCHEDULER_TARGET_NEW_ADS,
+    SCHEDULER_JITTER_SECONDS, SCHEDULER_MAX_CONCURRENT_CRAWLS, SCHEDULER_MISFIRE_GRACE_SECONDS,
+    EXPIRY_SWEEP_INTERVAL_MINUTES, EXPIRY_GRACE_HOURS
+)
+from src.database.crawl_state import load_crawl_state, load_shard_plan, save_schedule_stats
+from src.database.job_queue import enqueue_job, count_active_jobs
+from src.database.realStateLbc import expire_unseen_annonces
+from src.scrapers.leboncoin.search_params import DEFAULT_SEARCH_PARAMS, INCREMENTAL_SORT_PARAMS, search_query_key
+from src.scrapers.leboncoin.sharding import shard_filter, shards_overlap
+
+# Planificateur des parcours, démarré au lancement de l'API
+scheduler: AsyncIOScheduler | None = None
+
+FULL_SWEEP_JOB_ID = "crawl:full_sweep"
+
+def schedule_targets() -> list[dict]:
+    """Shards du dernier plan, ou la recherche par défaut si aucun plan n'a été calculé."""
+    shard_plan = load_shard_plan()
+    if shard_plan:
+        return shard_plan
+    return [{
+        "key": search_query_key(DEFAULT_SEARCH_PARAMS),
+        "label": "recherche par défaut",
+        "params": DEFAULT_SEARCH_PARAMS,
+        "total": None,
+        "default": True,
+    }]
+
+def target_job_id(target: dict) -> str:
+    return f"crawl:{target['key']}"
+
+def incremental_key(target: dict) -> str:
+    return search_query_key({**target["params"], **INCREMENTAL_SORT_PARAMS})
+
+def next_interval_minutes(current: float, new_ads: int, elapsed_hours: float, saturated: bool) -> float:
+    """Adapte l'intervalle au churn observé pour viser SCHEDULER_TARGET_NEW_ADS nouveautés par passage."""
+    if saturated:
+        # Le parcours n'a pas rattrapé les annonces connues : des nouveautés ont pu être manquées
+        interval = current / 2
+    elif new_ads == 0:
+        interval = current * 2
+    else:
+        churn_per_hour = new_ads / max(elapsed_hours, 1 / 60)
+        interval = SCHEDULER_TARGET_NEW_ADS / churn_per_hour * 60
+    return min(max(interval, SCHEDULER_MIN_INTERVAL_MINUTES), SCHEDULER_MAX_INTERVAL_MINUTES)
+
+async def enqueue_scheduled(payload: dict, dedup_key: str, label: str, priority: int = 0) -> bool:
+    """Dépose un job planifié, sauf si la file contient déjà trop de parcours en attente ou en cours."""
+    if await asyncio.to_thread(count_active_jobs, "leboncoin") >= SCHEDULER_MAX_CONCURRENT_CRAWLS:
+        logger.info(f"⏭️ Passage {label} reporté : {SCHEDULER_MAX_CONCURRENT_CRAWLS} parcours déjà en file")
+        return False
+    await asyncio.to_thread(enqueue_job, "leboncoin", payload, priority, dedup_key)
+    return True
+
+def add_target_job(target: dict, interval: float):
+    scheduler.add_job(
+        run_target_crawl,
+        IntervalTrigger(minutes=interval, jitter=SCHEDULER_JITTER_SECONDS),
+        args=[target],
+        id=target_job_id(target),
+        replace_existing=True,
+    )
+
+async def sync_target_jobs() -> dict[str, dict]:
+    """Aligne les passages planifiés sur le dernier plan de shards : shards nouveaux ajoutés, disparus retirés.
+
+    Retourne les cibles du plan par identifiant de job.
+    """
+    targets = {target_job_id(target): target for target in await asyncio.to_thread(schedule_targets)}
+    if scheduler is None:
+        return targets
+    removed = [job for job in scheduler.get_jobs()
+               if job.func is run_target_crawl and job.id not in targets]
+    for job in removed:
+        job.remove()
+    added = 0
+    for job_id, target in targets.items():
+        if scheduler.get_job(job_id) is None:
+            schedule = (await asyncio.to_thread(load_crawl_state, incremental_key(target)) or {}).get("schedule") or {}
+            add_target_job(target, schedule.get("interval_minutes", INCREMENTAL_INTERVAL_MINUTES))
+            added += 1
+    if scheduler.running and (removed or added):
+        logger.info(f"🗺️ Plan de shards modifié : {added} recherche(s) ajoutée(s), {len(removed)} retirée(s)")
+    return targets
+
+async def run_target_crawl(target: dict):
+    """Recalcule la fréquence du shard d'après son dernier passage, puis met en file le suivant."""
+    # Le plan a pu être recalculé depuis la création du job : shard disparu, nouveaux shards
+    target = (await sync_target_jobs()).get(target_job_id(target))
+    if target is None:
+        return
+    key = incremental_key(target)
+    state = await asyncio.to_thread(load_crawl_state, key) or {}
+    last_run = state.get("last_run") or {}
+    schedule = state.get("schedule") or {}
+    current = schedule.get("interval_minutes", INCREMENTAL_INTERVAL_MINUTES)
+    previous_finished_at = schedule.get("last_run_finished_at")
+    finished_at = last_run.get("finished_at")
+
+    # Le worker a terminé un passage depuis le dernier recalcul : ajuster l'intervalle au churn observé
+    if finished_at and finished_at != previous_finished_at:
+        elapsed_hours = (
+            (datetime.fromisoformat(finished_at) - datetime.fromisoformat(previous_finished_at)).total_seconds() / 3600
+            if previous_finished_at else current / 60
+        )
+        new_ads = last_run.get("new_ads", 0)
+        saturated = bool(last_run.get("pages")) and not last_run.get("stopped_early") and new_ads > 0
+        interval = next_interval_minutes(current, new_ads, elapsed_hours, saturated)
+        await asyncio.to_thread(save_schedule_stats, key, {
+            "interval_minutes": interval,
+            "churn_per_hour": round(new_ads / max(elapsed_hours, 1 / 60), 2),
+            "last_run_finished_at": finished_at,
+        })
+        if scheduler and interval != current:
+            scheduler.reschedule_job(
+                target_job_id(target),
+                trigger=IntervalTrigger(minutes=interval, jitter=SCHEDULER_JITTER_SECONDS)
+            )
+            logger.info(f"🗓️ {target['label']} : {new_ads} nouveautés, prochain passage toutes les {interval:.0f} min")
+
+    logger.info(f"⏰ Passage incrémental planifié : {target['label']}")
+    payload = {"mode": "incremental"} if target.get("default") else {"mode": "incremental", "shards": [target]}
+    await enqueue_scheduled(payload, target_job_id(target), target["label"])
+
+async def run_full_sweep():
+    """Balayage complet, découpé en shards si un plan existe."""
+    await sync_target_jobs()
+    sharded = bool(await asyncio.to_thread(load_shard_plan))
+    logger.info(f"⏰ Balayage complet planifié ({'par shards' if sharded else 'recherche par défaut'})")
+    await enqueue_scheduled({"mode": "full", "sharded": sharded}, FULL_SWEEP_JOB_ID, "balayage complet", priority=-1)
+
+def expiry_cutoff(target: dict, now: datetime) -> datetime | None:
+    """Seuil d'expiration d'un shard : début de son dernier parcours complet exhaustif, au plus tard now - délai de grâce.
+
+    Pas de seuil tant qu'un parcours est en cours (les annonces pas encore revues n'ont pas disparu)
+    ni sans parcours exhaustif (recherche tronquée, jamais terminée) : une annonce non revue
+    n'y prouve pas sa disparition.
+    """
+    state = load_crawl_state(target["key"]) or {}
+    last_run = state.get("last_run") or {}
+    if state.get("status") != "completed" or last_run.get("mode") != "full" or not last_run.get("exhaustive"):
+        return None
+    if not last_run.get("started_at"):
+        return None
+    return min(datetime.fromisoformat(last_run["started_at"]), now - timedelta(hours=EXPIRY_GRACE_HOURS))
+
+def sweep_expired_annonces() -> int:
+    """Marque comme expirées les annonces absentes du dernier parcours exhaustif de leur shard.
+
+    Une annonce peut relever de plusieurs shards (chevauchement, ancien plan) : elle n'expire que si
+    elle n'a été revue par aucun d'eux, c'est-à-dire avant le seuil de chaque shard qui la couvre.
+    """
+    now = datetime.utcnow()
+    targets = schedule_targets()
+    cutoffs = {target["key"]: expiry_cutoff(target, now) for target in targets}
+    expired = 0
+    for target in targets:
+        cutoff = cutoffs[target["key"]]
+        if cutoff is None:
+            continue
+        # Annonces encore couvertes par un shard voisin sans seuil ou qui les a revues après son seuil
+        protected = []
+        for other in targets:
+            if other["key"] == target["key"] or not shards_overlap(target["params"], other["params"]):
+                continue
+            other_cutoff = cutoffs[other["key"]]
+            seen = {} if other_cutoff is None else {"last_seen_at": {"$gte": other_cutoff}}
+            protected.append({**shard_filter(other["params"]), **seen})
+        count = expire_unseen_annonces(target["key"], cutoff, protected)
+        if count:
+            logger.info(f"🗑️ {target['label']} : {count} annonce(s) expirée(s), non revues depuis {cutoff.isoformat()}")
+        expired += count
+    return expired
+
+async def run_expiry_sweep():
+    try:
+        await asyncio.to_thread(sweep_expired_annonces)
+    except Exception as e:
+        logger.error(f"⚠️ Erreur lors du balayage d'expiration : {e}")
+
+async def start_crawl_schedule():
+    """Démarre le planificateur : un job incrémental par shard et un balayage complet rare."""
+    global scheduler
+    if not INCREMENTAL_INTERVAL_MINUTES:
+        logger.info("⏸️ Planification des parcours désactivée")
+        return
+
+    scheduler = AsyncIOScheduler(job_defaults={
+        "coalesce": True,  # Les passages manqués sont fusionnés en un seul
+        "max_instances": 1,
+        "misfire_grace_time": SCHEDULER_MISFIRE_GRACE_SECONDS,
+    })
+    # Lectures MongoDB synchrones (plan, fréquences) faites hors de la boucle d'événements de l'API
+    targets = await sync_target_jobs()
+    if FULL_SWEEP_INTERVAL_HOURS:
+        scheduler.add_job(
+            run_full_sweep,
+            IntervalTrigger(hours=FULL_SWEEP_INTERVAL_HOURS, jitter=SCHEDULER_JITTER_SECONDS),
+            id=FULL_SWEEP_JOB_ID,
+            replace_existing=True,
+        )
+    if EXPIRY_SWEEP_INTERVAL_MINUTES:
+        scheduler.add_job(
+            run_expiry_sweep,
+            IntervalTrigger(minutes=EXPIRY_SWEEP_INTERVAL_MINUTES),
+            id="expiry:sweep",
+            replace_existing=True,
+        )
+    scheduler.start()
+    logger.info(
+        f"🗓️ {len(targets)} recherche(s) planifiée(s), {SCHEDULER_MAX_CONCURRENT_CRAWLS} parcours en file au plus, "
+        f"balayage complet toutes les {FULL_SWEEP_INTERVAL_HOURS:g} h"
+    )
+
+async def stop_crawl_schedule():
+    global scheduler
+    if scheduler:
+        scheduler.shutdown(wait=False)
+        scheduler = None
@@ -0,0 +1,538 @@
+import base64
+import binascii
+import csv
+import io
+import json
+import math
+from datetime import datetime
+from typing import AsyncIterator, Literal
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pymongo.errors import OperationFailure
+from src.database.database import get_collection
+from src.database.rollups import merge_rollups, week_start, rollup_source, dimension_name
+from src.utils.cache import cached_json, request_scopes
+
+listings_router = APIRouter(prefix="/listings", tags=["listings"])
+
+# Champs exportés par défaut (les champs volumineux comme body/description sont à demander explicitement)
+DEFAULT_EXPORT_FIELDS = [
+    "id", "title", "price", "surface", "surface_m2", "price_m2", "nombreDepiece", "typeBien", "city", "zipcode",
+    "departement", "departement_id", "region", "latitude", "longitude", "url", "status",
+    "publication_date", "scraped_at", "last_seen_at", "expired",
+]
+
+# Champs réécrits à chaque passage des parcours (realStateLbc.mark_annonces_seen) sans incrément des
+# versions du cache : absents des champs par défaut ; demandés via `fields`, la réponse n'est pas mise en cache
+UNCACHED_FIELDS = ("last_seen_at", "crawl_shard")
+
+# Types Parquet des champs non textuels
+PARQUET_TYPES = {
+    "price": "float64", "surface_m2": "float64", "price_m2": "float64", "latitude": "float64", "longitude": "float64",
+    "nbrImages": "int64", "expired": "bool",
+    "publication_date": "timestamp", "index_date": "timestamp", "expiration_date": "timestamp",
+    "scraped_at": "timestamp", "last_seen_at": "timestamp", "expired_at": "timestamp",
+    "images": "list", "exterieur": "list", "caracteristiques": "list", "location": "json",
+}
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Code d'erreur MongoDB d'un accumulateur $group inconnu ($median avant MongoDB 7.0)
+UNKNOWN_GROUP_OPERATOR = 15952
+
+
+def cached_projection(fields: str | None) -> dict:
+    """Projection d'une réponse : champs demandés, ou champs par défaut sans les champs volatils."""
+    requested = fields.split(",") if fields else [field for field in DEFAULT_EXPORT_FIELDS if field not in UNCACHED_FIELDS]
+    projection = {field: 1 for field in requested if field}
+    projection["_id"] = 1  # Projection jamais vide (sinon MongoDB renverrait tout le document)
+    return projection
+
+
+def cacheable_fields(fields: str | None) -> bool:
+    """La réponse peut être mise en cache : aucun champ volatil n'est demandé explicitement."""
+    return not fields or not set(fields.split(",")) & set(UNCACHED_FIELDS)
+
+
+def build_listing_query(zipcode: str | None = None, departement: str | None = None,
+                        price_min: float | None = None, price_max: float | None = None,
+                        surface_min: float | None = None, surface_max: float | None = None,
+                        scraped_after: datetime | None = None, scraped_before: datetime | None = None,
+                        include_expired: bool = True, city: str | None = None, departement_id: str | None = None,
+                        type_bien: str | None = None, published_after: datetime | None = None,
+                        published_before: datetime | None = None) -> dict:
+    """Filtre MongoDB des annonces ; `zipcode` et `departement` acceptent plusieurs valeurs séparées par des virgules."""
+    query = {}
+    if zipcode:
+        query["zipcode"] = {"$in": zipcode.split(",")}
+    # Égalités simples : servies par les préfixes des index de LISTING_EQUALITY_PREFIXES
+    for field, value in (("city", city), ("departement_id", departement_id), ("typeBien", type_bien)):
+        if value:
+            query[field] = value
+    if departement:
+        values = departement.split(",")
+        # Identifiant ("75") ou nom ("Paris") de département
+        query["$or"] = [{"departement_id": {"$in": values}}, {"departement": {"$in": values}}]
+    for field, low, high in (("price", price_min, price_max), ("surface_m2", surface_min, surface_max)):
+        bounds = {}
+        if low is not None:
+            bounds["$gte"] = low
+        if high is not None:
+            bounds["$lte"] = high
+        if bounds:
+            query[field] = bounds
+    if scraped_after or scraped_before:
+        query["scraped_at"] = {}
+        if scraped_after:
+            query["scraped_at"]["$gte"] = scraped_after
+        if scraped_before:
+            query["scraped_at"]["$lt"] = scraped_before
+    if published_after or published_before:
+        query["publication_date"] = {}
+        if published_after:
+            query["publication_date"]["$gte"] = published_after
+        if published_before:
+            query["publication_date"]["$lt"] = published_before
+    if not include_expired:
+        query["expired"] = {"$ne": True}
+    return query
+
+
+def encode_cursor(document: dict) -> str:
+    """Jeton de pagination : position (scraped_at, _id) du dernier document renvoyé."""
+    position = {"scraped_at": document["scraped_at"].isoformat(), "_id": document["_id"]}
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(token: str) -> dict:
+    """Condition « après le jeton » pour le tri (scraped_at, _id) décroissant."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        scraped_at = datetime.fromisoformat(position["scraped_at"])
+        last_id = position["_id"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+    return {"$or": [
+        {"scraped_at": {"$lt": scraped_at}},
+        {"scraped_at": scraped_at, "_id": {"$lt": last_id}},
+    ]}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _stringify(value) -> str:
+    return json.dumps(value, default=_json_default) if isinstance(value, (dict, list)) else str(value)
+
+
+async def iter_batches(cursor, batch_size: int) -> AsyncIterator[list[dict]]:
+    """Regroupe les documents du curseur par lots : la mémoire reste bornée par `batch_size`."""
+    batch = []
+    async for document in cursor:
+        document.pop("_id", None)
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def stream_ndjson(batches: AsyncIterator[list[dict]]) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        yield "".join(json.dumps(doc, default=_json_default, ensure_ascii=False) + "\n" for doc in batch).encode("utf-8")
+
+
+async def stream_csv(batches: AsyncIterator[list[dict]], fields: list[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue().encode("utf-8")
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for doc in batch:
+            writer.writerow({
+                field: "|".join(map(str, value)) if isinstance(value, list) else
+                value.isoformat() if isinstance(value, datetime) else value
+                for field, value in doc.items()
+            })
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Fichier en écriture seule dont le contenu est vidé après chaque groupe de lignes Parquet."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+async def stream_parquet(batches: AsyncIterator[list[dict]], fields: list[str]) -> AsyncIterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {"float64": pa.float64(), "int64": pa.int64(), "bool": pa.bool_(),
+                   "timestamp": pa.timestamp("ms"), "list": pa.list_(pa.string())}
+    schema = pa.schema([(field, arrow_types.get(PARQUET_TYPES.get(field), pa.string())) for field in fields])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        # Un groupe de lignes par lot : les premiers octets partent dès le premier lot
+        async for batch in batches:
+            columns = {
+                field: [doc.get(field) if PARQUET_TYPES.get(field) not in (None, "json") else
+                        (_stringify(doc[field]) if doc.get(field) is not None else None) for doc in batch]
+                for field in fields
+            }
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+@listings_router.get("")
+async def list_listings(
+    request: Request,
+    city: str | None = None,
+    zipcode: str | None = None,
+    departement_id: str | None = None,
+    typeBien: str | None = None,
+    price_min: float | None = None,
+    price_max: float | None = None,
+    surface_min: float | None = Query(None, description="Surface minimale en m²"),
+    surface_max: float | None = Query(None, description="Surface maximale en m²"),
+    published_after: datetime | None = None,
+    published_before: datetime | None = None,
+    include_expired: bool = True,
+    fields: str | None = Query(None, description="Champs renvoyés, séparés par des virgules"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = Query(None, description="Jeton next_cursor de la page précédente"),
+):
+    """Annonces triées de la plus récemment collectée à la plus ancienne, paginées par curseur (scraped_at, _id).
+
+    Chaque page est une lecture d'index depuis la position du curseur : la page 10 000 coûte autant que la première.
+    """
+    return await cached_json(request, request_scopes(departement_id, zipcode), lambda: _list_listings(
+        city, zipcode, departement_id, typeBien, price_min, price_max, surface_min, surface_max,
+        published_after, published_before, include_expired, fields, limit, cursor,
+    ), cacheable=cacheable_fields(fields))
+
+
+async def _list_listings(city, zipcode, departement_id, typeBien, price_min, price_max, surface_min, surface_max,
+                         published_after, published_before, include_expired, fields, limit, cursor) -> dict:
+    query = build_listing_query(zipcode, None, price_min, price_max, surface_min, surface_max,
+                                include_expired=include_expired, city=city, departement_id=departement_id,
+                                type_bien=typeBien, published_after=published_after, published_before=published_before)
+    if cursor:
+        query = {"$and": [query, decode_cursor(cursor)]} if query else decode_cursor(cursor)
+
+    projection = cached_projection(fields)
+    projection["scraped_at"] = 1  # Nécessaire au jeton de pagination
+    documents = await (
+        get_collection("realStateLbc")
+        .find(query, projection)
+        .sort([("scraped_at", -1), ("_id", -1)])
+        .limit(limit + 1)
+        .to_list(length=limit + 1)
+    )
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+    return {
+        "items": documents,
+        "next_cursor": encode_cursor(documents[-1]) if has_more else None,
+    }
+
+
+@listings_router.get("/export")
+async def export_listings(
+    format: Literal["ndjson", "csv", "parquet"] = "ndjson",
+    fields: str | None = Query(None, description="Champs exportés, séparés par des virgules"),
+    zipcode: str | None = None,
+    departement: str | None = None,
+    price_min: float | None = None,
+    price_max: float | None = None,
+    surface_min: float | None = Query(None, description="Surface minimale en m²"),
+    surface_max: float | None = Query(None, description="Surface maximale en m²"),
+    scraped_after: datetime | None = None,
+    scraped_before: datetime | None = None,
+    include_expired: bool = True,
+    batch_size: int = Query(1000, ge=1, le=10000),
+):
+    """Exporte les annonces en flux (NDJSON, CSV ou Parquet), lot par lot depuis un curseur MongoDB."""
+    export_fields = fields.split(",") if fields else DEFAULT_EXPORT_FIELDS
+    if format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Export Parquet indisponible : pyarrow n'est pas installé")
+
+    query = build_listing_query(zipcode, departement, price_min, price_max, surface_min, surface_max,
+                                scraped_after, scraped_before, include_expired)
+    projection = {field: 1 for field in export_fields}
+    projection["_id"] = 0
+    cursor = get_collection("realStateLbc").find(query, projection, batch_size=batch_size)
+    batches = iter_batches(cursor, batch_size)
+
+    if format == "ndjson":
+        body = stream_ndjson(batches)
+    elif format == "csv":
+        body = stream_csv(batches, export_fields)
+    else:
+        body = stream_parquet(batches, export_fields)
+    filename = f"listings-{datetime.utcnow():%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(body, media_type=MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+def parse_bbox(bbox: str) -> tuple[float, float, float, float]:
+    """`min_lng,min_lat,max_lng,max_lat` → bornes numériques."""
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(value) for value in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox attendu : min_lng,min_lat,max_lng,max_lat")
+    if not (-180 <= min_lng < max_lng <= 180 and -90 <= min_lat < max_lat <= 90):
+        raise HTTPException(status_code=400, detail="bbox hors limites ou inversée")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def bbox_polygon(min_lng: float, min_lat: float, max_lng: float, max_lat: float) -> dict:
+    return {"type": "Polygon", "coordinates": [[
+        [min_lng, min_lat], [max_lng, min_lat], [max_lng, max_lat], [min_lng, max_lat], [min_lng, min_lat],
+    ]]}
+
+
+def tile_bounds(x: int, y: int, zoom: int) -> list[float]:
+    """Emprise [min_lng, min_lat, max_lng, max_lat] d'une tuile web-mercator."""
+    n = 2 ** zoom
+
+    def lat(tile_y: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+    return [x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)]
+
+
+@listings_router.get("/near")
+async def listings_near(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(5, gt=0, le=100),
+    typeBien: str | None = None,
+    price_min: float | None = None,
+    price_max: float | None = None,
+    surface_min: float | None = None,
+    surface_max: float | None = None,
+    include_expired: bool = False,
+    fields: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Annonces dans un rayon autour d'un point, de la plus proche à la plus éloignée ($geoNear)."""
+    return await cached_json(request, request_scopes(), lambda: _listings_near(
+        lat, lng, radius_km, typeBien, price_min, price_max, surface_min, surface_max, include_expired, fields, limit,
+    ), cacheable=cacheable_fields(fields))
+
+
+async def _listings_near(lat, lng, radius_km, typeBien, price_min, price_max, surface_min, surface_max,
+                         include_expired, fields, limit) -> dict:
+    query = build_listing_query(None, None, price_min, price_max, surface_min, surface_max,
+                                include_expired=include_expired, type_bien=typeBien)
+    projection = cached_projection(fields)
+    projection["distance_m"] = 1
+    pipeline = [
+        {"$geoNear": {
+            "near": {"type": "Point", "coordinates": [lng, lat]},
+            "distanceField": "distance_m",
+            "maxDistance": radius_km * 1000,
+            "query": query,
+            "spherical": True,
+        }},
+        {"$limit": limit},
+        {"$project": projection},
+    ]
+    items = await get_collection("realStateLbc").aggregate(pipeline).to_list(length=limit)
+    return {"items": items}
+
+
+@listings_router.get("/within")
+async def listings_within(
+    request: Request,
+    bbox: str = Query(..., description="min_lng,min_lat,max_lng,max_lat"),
+    typeBien: str | None = None,
+    price_min: float | None = None,
+    price_max: float | None = None,
+    surface_min: float | None = None,
+    surface_max: float | None = None,
+    include_expired: bool = False,
+    fields: str | None = None,
+    limit: int = Query(200, ge=1, le=1000),
+    cursor: str | None = None,
+):
+    """Annonces dans une emprise rectangulaire ($geoWithin), paginées comme /listings."""
+    polygon = bbox_polygon(*parse_bbox(bbox))
+    return await cached_json(request, request_scopes(), lambda: _listings_within(
+        polygon, typeBien, price_min, price_max, surface_min, surface_max, include_expired, fields, limit, cursor,
+    ), cacheable=cacheable_fields(fields))
+
+
+async def _listings_within(polygon, typeBien, price_min, price_max, surface_min, surface_max,
+                           include_expired, fields, limit, cursor) -> dict:
+    query = build_listing_query(None, None, price_min, price_max, surface_min, surface_max,
+                                include_expired=include_expired, type_bien=typeBien)
+    query["location"] = {"$geoWithin": {"$geometry": polygon}}
+    if cursor:
+        query = {"$and": [query, decode_cursor(cursor)]}
+    projection = cached_projection(fields)
+    projection["scraped_at"] = 1
+    documents = await (
+        get_collection("realStateLbc")
+        .find(query, projection)
+        .sort([("scraped_at", -1), ("_id", -1)])
+        .limit(limit + 1)
+        .to_list(length=limit + 1)
+    )
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+    return {"items": documents, "next_cursor": encode_cursor(documents[-1]) if has_more else None}
+
+
+@listings_router.get("/heatmap")
+async def listings_heatmap(
+    request: Request,
+    bbox: str = Query(..., description="min_lng,min_lat,max_lng,max_lat"),
+    zoom: int = Query(10, ge=0, le=18),
+    typeBien: str | None = None,
+    include_expired: bool = False,
+):
+    """Tuiles web-mercator de l'emprise : nombre d'annonces et prix médian au m² par tuile.
+
+    Le regroupement par tuile est calculé dans MongoDB ; seules les tuiles non vides sont renvoyées.
+    L'accumulateur $median demande MongoDB 7.0 ou plus récent (501 sur un serveur plus ancien).
+    """
+    polygon = bbox_polygon(*parse_bbox(bbox))
+    return await cached_json(request, request_scopes(), lambda: _listings_heatmap(polygon, zoom, typeBien, include_expired))
+
+
+async def _listings_heatmap(polygon: dict, zoom: int, typeBien: str | None, include_expired: bool) -> dict:
+    query = build_listing_query(None, None, include_expired=include_expired, type_bien=typeBien)
+    query["location"] = {"$geoWithin": {"$geometry": polygon}}
+    n = 2 ** zoom
+    longitude = {"$arrayElemAt": ["$location.coordinates", 0]}
+    latitude = {"$degreesToRadians": {"$arrayElemAt": ["$location.coordinates", 1]}}
+    pipeline = [
+        {"$match": query},
+        {"$group": {
+            "_id": {
+                "x": {"$floor": {"$multiply": [{"$divide": [{"$add": [longitude, 180]}, 360]}, n]}},
+                # y = (1 - ln(tan(lat) + 1 / cos(lat)) / π) / 2 × n
+                "y": {"$floor": {"$multiply": [
+                    {"$divide": [
+                        {"$subtract": [1, {"$divide": [
+                            {"$ln": {"$add": [{"$tan": latitude}, {"$divide": [1, {"$cos": latitude}]}]}},
+                            math.pi,
+                        ]}]},
+                        2,
+                    ]},
+                    n,
+                ]}},
+            },
+            "count": {"$sum": 1},
+            "median_price_m2": {"$median": {"input": "$price_m2", "method": "approximate"}},
+        }},
+    ]
+    try:
+        tiles = await get_collection("realStateLbc").aggregate(pipeline).to_list(length=None)
+    except OperationFailure as e:
+        if e.code != UNKNOWN_GROUP_OPERATOR:
+            raise
+        raise HTTPException(status_code=501, detail="Carte de chaleur indisponible : $median demande MongoDB 7.0 ou plus récent")
+    return {
+        "zoom": zoom,
+        "tiles": [
+            {
+                "x": int(tile["_id"]["x"]),
+                "y": int(tile["_id"]["y"]),
+                "bbox": tile_bounds(int(tile["_id"]["x"]), int(tile["_id"]["y"]), zoom),
+                "count": tile["count"],
+                "median_price_m2": tile["median_price_m2"],
+            }
+            for tile in tiles
+        ],
+    }
+
+
+
+@listings_router.get("/stats")
+async def listings_stats(
+    request: Request,
+    group_by: Literal[
+        "all", "departement_id", "typeBien", "departement_id+typeBien", "departement_id+city", "departement_id+city+typeBien"
+    ] = "departement_id",
+    departement_id: str | None = None,
+    city: str | None = None,
+    typeBien: str | None = None,
+    week_from: datetime | None = Query(None, description="Première semaine de publication incluse"),
+    week_to: datetime | None = Query(None, description="Semaines de publication antérieures à cette date"),
+    by_week: bool = False,
+):
+    """Nombre d'annonces, moyenne, médiane et p90 du prix et du prix au m², par groupe (et par semaine).
+
+    Lu dans les statistiques pré-agrégées à l'ingestion (src/database/rollups.py), sans parcourir les annonces ;
+    elles couvrent toutes les annonces publiées, expirées comprises.
+    """
+    return await cached_json(request, request_scopes(departement_id), lambda: _listings_stats(
+        group_by, departement_id, city, typeBien, week_from, week_to, by_week,
+    ))
+
+
+async def _listings_stats(group_by: str, departement_id: str | None, city: str | None, typeBien: str | None,
+                          week_from: datetime | None, week_to: datetime | None, by_week: bool) -> dict:
+    group_fields = () if group_by == "all" else tuple(group_by.split("+"))
+    filters = {field: value.split(",") for field, value in
+               (("departement_id", departement_id), ("city", city), ("typeBien", typeBien)) if value}
+    # Les filtres s'appliquent toujours, même sur un champ absent du regroupement
+    source = rollup_source(group_fields, set(filters))
+    if source is None:
+        raise HTTPException(status_code=400, detail=f"Filtres {', '.join(filters)} indisponibles pour group_by={group_by}")
+    query = {"dimension": dimension_name(source)}
+    for field, values in filters.items():
+        query[f"keys.{field}"] = {"$in": values}
+    if week_from or week_to:
+        query["week"] = {}
+        if week_from:
+            query["week"]["$gte"] = week_start(week_from)
+        if week_to:
+            query["week"]["$lt"] = week_to
+    groups = {}
+    async for bucket in get_collection("marketRollups").find(query):
+        group_key = (tuple((field, bucket["keys"][field]) for field in group_fields), bucket["week"] if by_week else None)
+        groups.setdefault(group_key, []).append(bucket)
+    results = [
+        {**dict(keys), **({"week": week} if by_week else {}), **merge_rollups(buckets)}
+        for (keys, week), buckets in groups.items()
+    ]
+    results.sort(key=lambda group: (-group["count"], str(group.get("week"))))
+    return {"group_by": group_by, "groups": results}
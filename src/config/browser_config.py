@@ -1,10 +1,13 @@
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright, Playwright, Browser, BrowserContext
 from src.config.proxy_manager import get_proxy_url, PROXY_USER, PROXY_PASS,get_current_ip
 import random
 import logging
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+from src.config.settings import BLOCK_TRACKERS, BLOCKED_RESOURCE_TYPES, STUBBED_RESOURCE_TYPES, BROWSER_HEADLESS
+from src.utils.metrics import CAPTCHA_CHALLENGES
+from src.utils.tracing import traced
 
-# Configuration du logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 
@@ -117,51 +120,213 @@ USER_AGENTS = [
 EXTRA_ARGS = [
 
 ]
-def setup_browser():
-    """Initialise et configure le navigateur Playwright avec IP Royal."""
+
+# Domaines DataDome : jamais filtrés, sous peine de déclencher le CAPTCHA
+DATADOME_DOMAINS = (
+    "datadome.co",
+    "captcha-delivery.com",
+)
+
+# Traqueurs et régies tiers inutiles au scraping
+TRACKER_DOMAINS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "doubleclick.net",
+    "adservice.google.com",
+    "facebook.net",
+    "facebook.com",
+    "criteo.com",
+    "criteo.net",
+    "hotjar.com",
+    "scorecardresearch.com",
+    "xiti.com",
+    "ati-host.net",
+    "tiqcdn.com",
+    "sentry.io",
+    "adnxs.com",
+    "smartadserver.com",
+    "taboola.com",
+    "outbrain.com",
+    "teads.tv",
+    "amazon-adsystem.com",
+    "pubmatic.com",
+    "rubiconproject.com",
+    "branch.io",
+    "snapchat.com",
+    "tiktok.com",
+)
+
+# Page de défi DataDome chargée dans la session (CAPTCHA affiché)
+CAPTCHA_CHALLENGE_URL = "captcha-delivery.com/captcha"
+
+# Tailles supposées par type de ressource (ordres de grandeur, non mesurés) : les requêtes bloquées
+# ne sont jamais téléchargées, les octets économisés ne sont donc qu'une estimation.
+# Seul bytes_transferred est mesuré (tailles réelles des réponses autorisées).
+ESTIMATED_RESOURCE_BYTES = {
+    "image": 45_000,
+    "media": 400_000,
+    "font": 35_000,
+    "script": 60_000,
+    "stylesheet": 20_000,
+    "xhr": 5_000,
+    "fetch": 5_000,
+    "other": 5_000,
+}
+
+# GIF transparent 1x1 servi à la place des images
+TRANSPARENT_GIF = bytes.fromhex(
+    "47494638396101000100800000000000ffffff21f90401000000002c00000000010001000002024401003b"
+)
+
+def _matches_domain(host: str, domains: tuple) -> bool:
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+@dataclass
+class ResourcePolicy:
+    """Politique de routage appliquée à un BrowserContext."""
+    blocked_types: frozenset = frozenset(BLOCKED_RESOURCE_TYPES)
+    stubbed_types: frozenset = frozenset(STUBBED_RESOURCE_TYPES)
+    block_trackers: bool = BLOCK_TRACKERS
+    allowed_domains: tuple = DATADOME_DOMAINS
+    tracker_domains: tuple = TRACKER_DOMAINS
+
+    def decide(self, url: str, resource_type: str) -> str:
+        """Retourne 'allow', 'abort' ou 'stub' pour une requête."""
+        host = urlparse(url).hostname or ""
+        if _matches_domain(host, self.allowed_domains):
+            return "allow"
+        if self.block_trackers and _matches_domain(host, self.tracker_domains):
+            return "abort"
+        if resource_type in self.stubbed_types:
+            return "stub"
+        if resource_type in self.blocked_types:
+            return "abort"
+        return "allow"
+
+@dataclass
+class RouteStats:
+    """Compteurs de routage d'une session : requêtes filtrées, octets économisés (estimés) et transférés (mesurés)."""
+    allowed: int = 0
+    blocked: dict = field(default_factory=dict)
+    bytes_saved_estimate: int = 0
+    bytes_transferred: int = 0
+
+    def record_blocked(self, resource_type: str, served_bytes: int = 0):
+        self.blocked[resource_type] = self.blocked.get(resource_type, 0) + 1
+        self.bytes_saved_estimate += max(ESTIMATED_RESOURCE_BYTES.get(resource_type, ESTIMATED_RESOURCE_BYTES["other"]) - served_bytes, 0)
+
+    def report(self) -> dict:
+        return {
+            "allowed_requests": self.allowed,
+            "blocked_requests": sum(self.blocked.values()),
+            "blocked_by_type": dict(self.blocked),
+            "bytes_saved_estimate": self.bytes_saved_estimate,
+            "bytes_transferred": self.bytes_transferred,
+        }
+
+async def install_resource_policy(context: BrowserContext, policy: ResourcePolicy | None = None) -> RouteStats:
+    """Installe le filtrage des ressources sur le contexte et retourne ses statistiques."""
+    policy = policy or ResourcePolicy()
+    stats = RouteStats()
+
+    async def handle_route(route):
+        request = route.request
+        decision = policy.decide(request.url, request.resource_type)
+        if CAPTCHA_CHALLENGE_URL in request.url and request.resource_type == "document":
+            CAPTCHA_CHALLENGES.inc()
+        try:
+            if decision == "stub":
+                stats.record_blocked(request.resource_type, len(TRANSPARENT_GIF))
+                await route.fulfill(status=200, content_type="image/gif", body=TRANSPARENT_GIF)
+            elif decision == "abort":
+                stats.record_blocked(request.resource_type)
+                await route.abort("blockedbyclient")
+            else:
+                stats.allowed += 1
+                await route.continue_()
+        except Exception as e:
+            # La page a pu être fermée entre-temps
+            logger.debug(f"⚠️ Routage impossible pour {request.url}: {e}")
+
+    async def on_request_finished(request):
+        try:
+            sizes = await request.sizes()
+            stats.bytes_transferred += sizes["responseBodySize"] + sizes["responseHeadersSize"]
+        except Exception:
+            pass
+
+    def on_close(_):
+        report = stats.report()
+        logger.info(
+            f"📉 Ressources filtrées : {report['blocked_requests']} requêtes "
+            f"(estimation : ~{report['bytes_saved_estimate'] / 1_048_576:.1f} Mo économisés ; "
+            f"{report['bytes_transferred'] / 1_048_576:.1f} Mo transférés)"
+        )
+
+    await context.route("**/*", handle_route)
+    context.on("requestfinished", on_request_finished)
+    context.on("close", on_close)
+    return stats
+@traced()
+async def launch_browser(playwright: Playwright) -> Browser:
+    """Lance Chromium ; une seule instance peut servir plusieurs contextes en parallèle."""
     # proxy = get_proxy_url()
-    # logger.info(f"🎯 Lancement du navigateur avec proxy : {get_current_ip(proxy)}")
+    # logger.info(f"🎯 Lancement du navigateur avec proxy : {await get_current_ip(proxy)}")
+    return await playwright.chromium.launch(
+        # proxy={
+        #     # "server": proxy,
+        #     "username": PROXY_USER,
+        #     "password": PROXY_PASS
+        # },
+        headless=BROWSER_HEADLESS,
+        args=[
+            "--disable-infobars",
+            "--disable-web-security",
+            f"--window-size={random.choice(['1920,1080', '1440,900', '1366,768'])}",
+            "--enable-webgl",
+            "--hide-scrollbars",
+            "--mute-audio",
+        ]
+    )
+
+@traced()
+async def create_context(browser: Browser) -> BrowserContext:
+    """Crée un contexte isolé (cookies, UA, viewport) sur un navigateur déjà lancé."""
+    user_agent = random.choice(MOBILE_USER_AGENTS)
+
+    context = await browser.new_context(
+        user_agent=user_agent,
+        viewport={"width": random.randint(500, 600), "height": random.randint(600, 750)},
+        locale="fr-FR",
+        timezone_id="Europe/Paris",
+        java_script_enabled=True
+    )
+
+    # Empêcher la détection des bots
+    await context.add_init_script("""
+        Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
+        Object.defineProperty(navigator, 'language', {get: () => 'fr-FR'});
+        Object.defineProperty(navigator, 'platform', {get: () => 'Linux armv8l'});
+    """)
 
+    return context
+
+@traced()
+async def setup_browser(playwright: Playwright | None = None):
+    """Initialise et configure le navigateur Playwright avec IP Royal."""
     try:
-        playwright = sync_playwright().start()
-        browser = playwright.chromium.launch(
-            # proxy={
-            #     # "server": proxy,
-            #     "username": PROXY_USER,
-            #     "password": PROXY_PASS
-            # },
-            headless=False,
-            args=[
-                "--disable-infobars",
-                "--disable-web-security",
-                f"--window-size={random.choice(['1920,1080', '1440,900', '1366,768'])}",
-                "--enable-webgl",
-                "--hide-scrollbars",
-                "--mute-audio",
-            ]
-        )
+        if playwright is None:
+            playwright = await async_playwright().start()
+        browser = await launch_browser(playwright)
 
         if not browser:
             logger.error("❌ ERREUR: Le navigateur ne s'est pas lancé !")
             return None, None
 
-        user_agent = random.choice(MOBILE_USER_AGENTS)
-
-        context = browser.new_context(
-            user_agent=user_agent,
-            viewport={"width": random.randint(500, 600), "height": random.randint(600, 750)},
-            locale="fr-FR",
-            timezone_id="Europe/Paris",
-            java_script_enabled=True
-        )
-
-        # Empêcher la détection des bots
-        context.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
-            Object.defineProperty(navigator, 'language', {get: () => 'fr-FR'});
-            Object.defineProperty(navigator, 'platform', {get: () => 'Linux armv8l'});
-        """)
-
+        context = await create_context(browser)
+        await install_resource_policy(context)
         return browser, context
     
     except Exception as e:
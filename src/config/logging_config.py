@@ -0,0 +1,79 @@
+import logging
+import random
+import sys
+from loguru import logger
+from src.config.settings import LOG_LEVEL, LOG_JSON, LOG_FILE, LOG_AD_SAMPLE_RATE
+from src.utils.tracing import get_current_job_id
+
+# 🔹 Configuration unique de la journalisation, pour l'API, les workers et les processus de scraping.
+# - loguru est le seul émetteur : les loggers `logging` de la bibliothèque standard lui sont redirigés ;
+# - les sinks utilisent enqueue=True : l'écriture (sérialisation JSON, I/O) se fait dans un thread dédié ;
+# - les messages émis pour chaque annonce ou image ne sont conservés qu'en partie : `if ad_log_sampled(): ...`
+#   décide avant toute mise en forme, pour les loggers loguru comme `logging` ;
+# - chaque message porte le job en cours (`job_id`), lu dans le contexte du traçage.
+
+STDLIB_FORMAT = "<green>{time:HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | {name} | {extra[job_id]} | {message}"
+
+# Bibliothèques trop bavardes au niveau INFO
+QUIET_LOGGERS = ("pymongo", "apscheduler", "urllib3", "b2sdk", "asyncio")
+
+
+def ad_log_sampled() -> bool:
+    """Tirage d'un message par annonce ou image : vrai avec la probabilité LOG_AD_SAMPLE_RATE.
+
+        if ad_log_sampled():
+            logger.info(f"✅ Annonce enregistrée : {annonce_id}")
+    """
+    return random.random() < LOG_AD_SAMPLE_RATE
+
+
+_configured = False
+
+
+class InterceptHandler(logging.Handler):
+    """Redirige les enregistrements `logging` vers loguru en conservant module et ligne.
+
+    Les messages par annonce sont écartés avant d'arriver ici (ad_log_sampled, niveau DEBUG) :
+    seuls les enregistrements conservés paient la conversion.
+    """
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            level = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+
+        # Remonter jusqu'à l'appelant réel, au-delà du module logging (sys._getframe : pas de copie de la pile)
+        frame, depth = sys._getframe(1), 1
+        while frame is not None and frame.f_code.co_filename == logging.__file__:
+            frame = frame.f_back
+            depth += 1
+        del frame
+
+        logger.opt(depth=depth, exception=record.exc_info).bind(logger=record.name).log(level, record.getMessage())
+
+
+def bind_job_context(record):
+    record["extra"].setdefault("job_id", get_current_job_id())
+
+
+def setup_logging(level: str = LOG_LEVEL):
+    """Installe les sinks loguru et redirige `logging` ; sans effet si déjà appelée dans le processus."""
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
+    logger.remove()
+    logger.configure(patcher=bind_job_context)
+    if LOG_JSON:
+        logger.add(sys.stderr, level=level, serialize=True, enqueue=True)
+    else:
+        logger.add(sys.stderr, level=level, format=STDLIB_FORMAT, enqueue=True)
+    if LOG_FILE:
+        logger.add(LOG_FILE, level=level, serialize=True, enqueue=True,
+                   rotation="50 MB", retention=5, compression="gz")
+
+    logging.basicConfig(handlers=[InterceptHandler()], level=level, force=True)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
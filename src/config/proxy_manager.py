@@ -1,10 +1,14 @@
 import random
 import string
 import logging
-import requests
+import httpx
+from src.config.settings import (
+    IP_ROYAL_PROXY_HOST, IP_ROYAL_PROXY_PORT, IP_ROYAL_PROXY_USER, IP_ROYAL_PROXY_PASSWORD,
+    IP_ROYAL_PROXY_COUNTRY, IP_ROYAL_PROXY_LIFETIME
+)
+from src.utils.metrics import PROXY_CHECKS
+from src.utils.request_manager import get_request_manager
 
-# Configuration du logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 def generate_session_id():
@@ -12,28 +16,33 @@ def generate_session_id():
 
 SESSION_ID = generate_session_id()
 
-PROXY_HOST = "geo.iproyal.com"
-PROXY_PORT = "12321"
-PROXY_USER = "MEEr6bZGGdo8q1xU"
-PROXY_PASS = f"uSMU7Zv9SRjhG60b_country-fr_session-{SESSION_ID}_lifetime-35m_streaming-1"
+def proxy_password(session_id: str) -> str:
+    """Mot de passe IP Royal d'une session : pays, identifiant de session et durée de vie."""
+    return (f"{IP_ROYAL_PROXY_PASSWORD}_country-{IP_ROYAL_PROXY_COUNTRY}_session-{session_id}"
+            f"_lifetime-{IP_ROYAL_PROXY_LIFETIME}_streaming-1")
+
+PROXY_HOST = IP_ROYAL_PROXY_HOST
+PROXY_PORT = str(IP_ROYAL_PROXY_PORT)
+PROXY_USER = IP_ROYAL_PROXY_USER
+PROXY_PASS = proxy_password(SESSION_ID)
 
 PROXY_URL = f"http://{PROXY_USER}:{PROXY_PASS}@{PROXY_HOST}:{PROXY_PORT}"
 
 def get_proxy_url():
     """Retourne l'URL du proxy pour l'utiliser dans tout le projet."""
-    session_id = generate_session_id()
-    proxy_pass = f"uSMU7Zv9SRjhG60b_country-fr_session-{session_id}_lifetime-35m_streaming-1"
-    # proxy_pass = "uSMU7Zv9SRjhG60b_country-fr_session-KPNbYudH_lifetime-31m_streaming-1"
+    proxy_pass = proxy_password(generate_session_id())
     proxy_url = f"http://{PROXY_USER}:{proxy_pass}@{PROXY_HOST}:{PROXY_PORT}"
     return proxy_url
 
-def get_current_ip(proxy_url):
+async def get_current_ip(proxy_url):
     """Vérifie l'IP actuelle utilisée par le proxy."""
     try:
-        response = requests.get("https://api64.ipify.org?format=json", proxies={"http": proxy_url, "https": proxy_url}, timeout=10)
+        response = await get_request_manager().get("https://api64.ipify.org?format=json", proxy=proxy_url)
         ip = response.json().get("ip", "Unknown")
         logger.info(f"📡 IP actuelle via proxy : {ip}")
+        PROXY_CHECKS.labels("ok").inc()
         return ip
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, ValueError) as e:
+        PROXY_CHECKS.labels("error").inc()
         logger.error(f"❌ Impossible de récupérer l'IP via proxy: {e}")
         return "Unknown"
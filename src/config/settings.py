@@ -1,11 +1,299 @@
+import logging
 import os
 from dotenv import load_dotenv
+from pydantic import BaseModel, ConfigDict, field_validator, model_validator
 
-# Charger les variables d'environnement
-load_dotenv("src/environment/local.env")
+# 🔹 Configuration typée, validée une fois au démarrage. Le profil est choisi par XTRACTIFY_ENV
+# ("local" par défaut, "prod") : src/environment/<profil>.env, résolu depuis ce fichier et non depuis
+# le répertoire courant. Les variables d'environnement du processus priment sur le fichier.
+# Les profils contiennent des secrets et ne sont pas versionnés : partir de src/environment/.env.example.
+# Chaque réglage reste importable par son nom :
+#   from src.config.settings import settings, HTTP_POOL_SIZE
+#   XTRACTIFY_ENV=prod SCRAPER_CONCURRENCY=4 python -m src.workers.worker
 
-# Vérifier si la variable MONGO_URI est bien définie
-MONGO_URI = os.getenv("MONGO_URI")
+ENVIRONMENT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "environment")
+PROFILE = os.getenv("XTRACTIFY_ENV", "local")
 
-if not MONGO_URI:
-    raise ValueError("❌ MONGO_URI n'est pas défini dans src/environment/local.env")
+
+# Anciens noms des variables (profils antérieurs à l'API native B2), acceptés avec un avertissement
+LEGACY_NAMES = {
+    "AWS_S3_ACCESS_KEY": "B2_KEY_ID",
+    "AWS_S3_SECRET_KEY": "B2_APPLICATION_KEY",
+    "AWS_S3_BUCKET_NAME": "B2_BUCKET_NAME",
+    "IP_ROYAL_PROXY_PASS_BASE": "IP_ROYAL_PROXY_PASSWORD",
+}
+
+# Secrets sans valeur par défaut exigés au démarrage selon le profil
+REQUIRED_SECRETS = {
+    "prod": ("MONGO_URI", "B2_KEY_ID", "B2_APPLICATION_KEY", "B2_BUCKET_NAME",
+             "IP_ROYAL_PROXY_USER", "IP_ROYAL_PROXY_PASSWORD"),
+}
+
+
+def _truthy(value) -> bool:
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+class Settings(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    # Connexion MongoDB ; son absence n'est signalée qu'à la première connexion (voir realStateLbc.get_client)
+    MONGO_URI: str | None = None
+    # Connexions par client MongoDB (pymongo et motor)
+    MONGO_MAX_POOL_SIZE: int = 100
+
+    # Nombre de contextes Playwright pilotés en parallèle par un processus de scraping
+    SCRAPER_CONCURRENCY: int = 1
+    # Nouvelles annonces normalisées en parallèle par les plugins de sites (images…)
+    PLUGIN_NORMALIZE_CONCURRENCY: int = 4
+    # Navigateur sans fenêtre
+    BROWSER_HEADLESS: bool = False
+
+    # Profil du moteur de comportement humain (stealth, balanced, fast)
+    HUMAN_BEHAVIOR_PROFILE: str = "balanced"
+    # Budget d'attente volontaire par session en secondes (vide = budget du profil)
+    HUMAN_BEHAVIOR_BUDGET: float | None = None
+
+    # Types de ressources Playwright bloqués (abort) ou remplacés par un contenu vide (stub)
+    BLOCKED_RESOURCE_TYPES: list[str] = ["media", "font"]
+    STUBBED_RESOURCE_TYPES: list[str] = ["image"]
+    # Bloquer les traqueurs et régies publicitaires tiers
+    BLOCK_TRACKERS: bool = True
+
+    # Délais Playwright (ms) : navigation et attente des éléments de page, réponse de l'API de recherche
+    NAVIGATION_TIMEOUT_MS: int = 60000
+    API_RESPONSE_TIMEOUT_MS: int = 70000
+    # Tentatives de lecture d'une page de résultats avant l'arrêt de la recherche (moteur des plugins)
+    PAGE_MAX_RETRIES: int = 3
+
+    # Stockage de l'état de pagination des recherches : "mongo" ou "file"
+    CRAWL_STATE_BACKEND: str = "mongo"
+    CRAWL_STATE_FILE: str = "crawl_state.json"
+
+    # Mode incrémental : part d'annonces déjà connues sur une page au-delà de laquelle le parcours s'arrête
+    INCREMENTAL_STOP_RATIO: float = 0.8
+
+    # Planification : passages incrémentaux fréquents, balayage complet rare (0 = désactivé)
+    INCREMENTAL_INTERVAL_MINUTES: float = 20
+    FULL_SWEEP_INTERVAL_HOURS: float = 24
+
+    # Fréquence adaptative par shard : bornes de l'intervalle et nombre de nouveautés visé par passage
+    SCHEDULER_MIN_INTERVAL_MINUTES: float = 10
+    SCHEDULER_MAX_INTERVAL_MINUTES: float = 360
+    SCHEDULER_TARGET_NEW_ADS: int = 20
+    SCHEDULER_JITTER_SECONDS: int = 120
+    # Plafond de parcours planifiés en attente ou en cours dans la file de jobs
+    SCHEDULER_MAX_CONCURRENT_CRAWLS: int = 2
+    SCHEDULER_MISFIRE_GRACE_SECONDS: int = 600
+
+    # Découpage de la recherche : nombre d'annonces par page Leboncoin et volume maximal d'un shard
+    # (SHARD_RESULT_CAP vide = ADS_PER_PAGE × SHARD_MAX_PAGES)
+    ADS_PER_PAGE: int = 35
+    SHARD_MAX_PAGES: int = 100
+    SHARD_RESULT_CAP: int | None = None
+
+    # Pagination : pages consécutives sans annonce nouvelle avant arrêt, pages re-parcourues au plus après un décalage
+    PAGINATION_MAX_REPEATS: int = 2
+    PAGINATION_MAX_REFETCH: int = 2
+
+    # File de jobs distribuée : tentatives maximales, durée du bail et fréquence des battements de cœur
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_LEASE_SECONDS: int = 120
+    JOB_HEARTBEAT_SECONDS: int = 30
+
+    # Worker : attente entre deux consultations d'une file vide
+    WORKER_POLL_SECONDS: float = 5
+
+    # Expiration des annonces : fréquence du balayage et délai minimal sans apparition avant expiration
+    EXPIRY_SWEEP_INTERVAL_MINUTES: float = 60
+    EXPIRY_GRACE_HOURS: float = 6
+
+    # Statistiques de marché : documents lus par lot lors d'une reconstruction complète
+    ROLLUP_REBUILD_BATCH_SIZE: int = 5000
+
+    # Métriques Prometheus : répertoire partagé par les processus d'une machine (mode multiprocess)
+    # et port HTTP exposé par chaque worker (0 = pas de serveur, métriques lues par l'API locale)
+    PROMETHEUS_MULTIPROC_DIR: str = ""
+    WORKER_METRICS_PORT: int = 0
+
+    # Traçage par étapes des jobs : activation et collecteur OTLP/HTTP local (vide = pas d'export)
+    TRACING_ENABLED: bool = True
+    OTLP_ENDPOINT: str = ""
+
+    # Journalisation : niveau, sortie JSON, fichier optionnel et part des messages par annonce conservés
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = True
+    LOG_FILE: str = ""
+    LOG_AD_SAMPLE_RATE: float = 0.05
+
+    # Backblaze B2 : realm d'autorisation ("production" ou URL d'un serveur de substitution, cf. benchmarks),
+    # clé d'application et bucket des images
+    B2_REALM: str = "production"
+    B2_KEY_ID: str = ""
+    B2_APPLICATION_KEY: str = ""
+    B2_BUCKET_NAME: str = ""
+
+    # Proxy résidentiel IP Royal : le mot de passe est complété par le pays et une session par navigateur
+    IP_ROYAL_PROXY_HOST: str = "geo.iproyal.com"
+    IP_ROYAL_PROXY_PORT: int = 12321
+    IP_ROYAL_PROXY_USER: str = ""
+    IP_ROYAL_PROXY_PASSWORD: str = ""
+    IP_ROYAL_PROXY_COUNTRY: str = "fr"
+    IP_ROYAL_PROXY_LIFETIME: str = "35m"
+
+    # Cache des réponses de lecture de l'API : durée de vie, taille du cache local (0 = désactivé)
+    # et second niveau partagé entre réplicas ("mongo", "file" pour le substitut local, vide = aucun)
+    CACHE_TTL_SECONDS: float = 300
+    CACHE_MAX_ENTRIES: int = 512
+    CACHE_SHARED_BACKEND: str = ""
+    CACHE_SHARED_DIR: str = ".cache/api"
+
+    # Requêtes HTTP sortantes (src/utils/request_manager.py) : connexions par hôte, délai, nouvelles tentatives
+    # sur 429/5xx, débit par défaut et par hôte ("img.leboncoin.fr=20,api64.ipify.org=1", requêtes/s, 0 = illimité)
+    # et débit par session de proxy
+    HTTP_POOL_SIZE: int = 20
+    HTTP_TIMEOUT_SECONDS: float = 10
+    HTTP_MAX_RETRIES: int = 3
+    HTTP_BACKOFF_SECONDS: float = 0.5
+    HTTP_DEFAULT_RATE: float = 0
+    HTTP_HOST_RATES: dict[str, float] = {"img.leboncoin.fr": 20.0, "api64.ipify.org": 1.0}
+    HTTP_PROXY_SESSION_RATE: float = 5
+
+    @field_validator("MONGO_URI", "HUMAN_BEHAVIOR_BUDGET", "SHARD_RESULT_CAP", mode="before")
+    @classmethod
+    def _empty_as_none(cls, value):
+        return None if value == "" else value
+
+    @field_validator("BROWSER_HEADLESS", "BLOCK_TRACKERS", "TRACING_ENABLED", "LOG_JSON", mode="before")
+    @classmethod
+    def _parse_flag(cls, value):
+        return _truthy(value) if isinstance(value, str) else value
+
+    @field_validator("BLOCKED_RESOURCE_TYPES", "STUBBED_RESOURCE_TYPES", mode="before")
+    @classmethod
+    def _parse_list(cls, value):
+        return [item for item in value.split(",") if item] if isinstance(value, str) else value
+
+    @field_validator("HTTP_HOST_RATES", mode="before")
+    @classmethod
+    def _parse_rates(cls, value):
+        if not isinstance(value, str):
+            return value
+        return {host.strip(): rate for host, _, rate in (item.partition("=") for item in value.split(",") if item)}
+
+    @model_validator(mode="after")
+    def _derived(self):
+        if self.SHARD_RESULT_CAP is None:
+            self.SHARD_RESULT_CAP = self.ADS_PER_PAGE * self.SHARD_MAX_PAGES
+        return self
+
+
+def load_settings(profile: str = PROFILE) -> Settings:
+    """Charge le fichier du profil dans l'environnement, puis valide les réglages."""
+    path = os.path.join(ENVIRONMENT_DIR, f"{profile}.env")
+    if not os.path.exists(path) and "XTRACTIFY_ENV" in os.environ:
+        raise FileNotFoundError(f"❌ Profil de configuration introuvable : {path} (modèle : .env.example)")
+    # Profil par défaut absent : valeurs par défaut et variables d'environnement seules
+    load_dotenv(path)
+    values = {name: os.environ[name] for name in Settings.model_fields if name in os.environ}
+    for legacy, name in LEGACY_NAMES.items():
+        if legacy in os.environ and name not in values:
+            logging.getLogger(__name__).warning(f"⚠️ {legacy} est obsolète, utiliser {name} (voir .env.example).")
+            value = os.environ[legacy]
+            # L'ancien mot de passe IP Royal embarquait déjà les options de pays et de session
+            values[name] = value.split("_country-")[0] if legacy == "IP_ROYAL_PROXY_PASS_BASE" else value
+    missing = [name for name in REQUIRED_SECRETS.get(profile, ()) if not values.get(name)]
+    if missing:
+        raise RuntimeError(f"❌ Profil {profile} : variables requises absentes ou vides : {', '.join(missing)}")
+    return Settings(**values)
+
+
+settings = load_settings()
+
+# Réglages exposés comme constantes du module, comme avant l'objet typé
+MONGO_URI = settings.MONGO_URI
+MONGO_MAX_POOL_SIZE = settings.MONGO_MAX_POOL_SIZE
+
+SCRAPER_CONCURRENCY = settings.SCRAPER_CONCURRENCY
+PLUGIN_NORMALIZE_CONCURRENCY = settings.PLUGIN_NORMALIZE_CONCURRENCY
+BROWSER_HEADLESS = settings.BROWSER_HEADLESS
+
+HUMAN_BEHAVIOR_PROFILE = settings.HUMAN_BEHAVIOR_PROFILE
+HUMAN_BEHAVIOR_BUDGET = settings.HUMAN_BEHAVIOR_BUDGET
+
+BLOCKED_RESOURCE_TYPES = settings.BLOCKED_RESOURCE_TYPES
+STUBBED_RESOURCE_TYPES = settings.STUBBED_RESOURCE_TYPES
+BLOCK_TRACKERS = settings.BLOCK_TRACKERS
+
+NAVIGATION_TIMEOUT_MS = settings.NAVIGATION_TIMEOUT_MS
+API_RESPONSE_TIMEOUT_MS = settings.API_RESPONSE_TIMEOUT_MS
+PAGE_MAX_RETRIES = settings.PAGE_MAX_RETRIES
+
+CRAWL_STATE_BACKEND = settings.CRAWL_STATE_BACKEND
+CRAWL_STATE_FILE = settings.CRAWL_STATE_FILE
+
+INCREMENTAL_STOP_RATIO = settings.INCREMENTAL_STOP_RATIO
+
+INCREMENTAL_INTERVAL_MINUTES = settings.INCREMENTAL_INTERVAL_MINUTES
+FULL_SWEEP_INTERVAL_HOURS = settings.FULL_SWEEP_INTERVAL_HOURS
+
+SCHEDULER_MIN_INTERVAL_MINUTES = settings.SCHEDULER_MIN_INTERVAL_MINUTES
+SCHEDULER_MAX_INTERVAL_MINUTES = settings.SCHEDULER_MAX_INTERVAL_MINUTES
+SCHEDULER_TARGET_NEW_ADS = settings.SCHEDULER_TARGET_NEW_ADS
+SCHEDULER_JITTER_SECONDS = settings.SCHEDULER_JITTER_SECONDS
+SCHEDULER_MAX_CONCURRENT_CRAWLS = settings.SCHEDULER_MAX_CONCURRENT_CRAWLS
+SCHEDULER_MISFIRE_GRACE_SECONDS = settings.SCHEDULER_MISFIRE_GRACE_SECONDS
+
+ADS_PER_PAGE = settings.ADS_PER_PAGE
+SHARD_MAX_PAGES = settings.SHARD_MAX_PAGES
+SHARD_RESULT_CAP = settings.SHARD_RESULT_CAP
+
+PAGINATION_MAX_REPEATS = settings.PAGINATION_MAX_REPEATS
+PAGINATION_MAX_REFETCH = settings.PAGINATION_MAX_REFETCH
+
+JOB_MAX_ATTEMPTS = settings.JOB_MAX_ATTEMPTS
+JOB_LEASE_SECONDS = settings.JOB_LEASE_SECONDS
+JOB_HEARTBEAT_SECONDS = settings.JOB_HEARTBEAT_SECONDS
+
+WORKER_POLL_SECONDS = settings.WORKER_POLL_SECONDS
+
+EXPIRY_SWEEP_INTERVAL_MINUTES = settings.EXPIRY_SWEEP_INTERVAL_MINUTES
+EXPIRY_GRACE_HOURS = settings.EXPIRY_GRACE_HOURS
+
+ROLLUP_REBUILD_BATCH_SIZE = settings.ROLLUP_REBUILD_BATCH_SIZE
+
+PROMETHEUS_MULTIPROC_DIR = settings.PROMETHEUS_MULTIPROC_DIR
+WORKER_METRICS_PORT = settings.WORKER_METRICS_PORT
+
+TRACING_ENABLED = settings.TRACING_ENABLED
+OTLP_ENDPOINT = settings.OTLP_ENDPOINT
+
+LOG_LEVEL = settings.LOG_LEVEL
+LOG_JSON = settings.LOG_JSON
+LOG_FILE = settings.LOG_FILE
+LOG_AD_SAMPLE_RATE = settings.LOG_AD_SAMPLE_RATE
+
+B2_REALM = settings.B2_REALM
+B2_KEY_ID = settings.B2_KEY_ID
+B2_APPLICATION_KEY = settings.B2_APPLICATION_KEY
+B2_BUCKET_NAME = settings.B2_BUCKET_NAME
+
+IP_ROYAL_PROXY_HOST = settings.IP_ROYAL_PROXY_HOST
+IP_ROYAL_PROXY_PORT = settings.IP_ROYAL_PROXY_PORT
+IP_ROYAL_PROXY_USER = settings.IP_ROYAL_PROXY_USER
+IP_ROYAL_PROXY_PASSWORD = settings.IP_ROYAL_PROXY_PASSWORD
+IP_ROYAL_PROXY_COUNTRY = settings.IP_ROYAL_PROXY_COUNTRY
+IP_ROYAL_PROXY_LIFETIME = settings.IP_ROYAL_PROXY_LIFETIME
+
+CACHE_TTL_SECONDS = settings.CACHE_TTL_SECONDS
+CACHE_MAX_ENTRIES = settings.CACHE_MAX_ENTRIES
+CACHE_SHARED_BACKEND = settings.CACHE_SHARED_BACKEND
+CACHE_SHARED_DIR = settings.CACHE_SHARED_DIR
+
+HTTP_POOL_SIZE = settings.HTTP_POOL_SIZE
+HTTP_TIMEOUT_SECONDS = settings.HTTP_TIMEOUT_SECONDS
+HTTP_MAX_RETRIES = settings.HTTP_MAX_RETRIES
+HTTP_BACKOFF_SECONDS = settings.HTTP_BACKOFF_SECONDS
+HTTP_DEFAULT_RATE = settings.HTTP_DEFAULT_RATE
+HTTP_HOST_RATES = settings.HTTP_HOST_RATES
+HTTP_PROXY_SESSION_RATE = settings.HTTP_PROXY_SESSION_RATE
@@ -0,0 +1,149 @@
+import json
+import os
+import threading
+from datetime import datetime
+from loguru import logger
+from src.config.settings import CRAWL_STATE_BACKEND, CRAWL_STATE_FILE
+
+# 🔹 État de progression d'une recherche, une entrée par clé de recherche :
+#   last_completed_page     dernière page entièrement traitée
+#   newest_publication_date date de publication la plus récente rencontrée
+#   high_water_mark         newest_publication_date du dernier parcours terminé
+#   pivot                   jeton de pagination renvoyé par l'API finder/search
+#   status                  "in_progress" tant que la recherche n'a pas été parcourue jusqu'au bout
+#   last_run                résumé du dernier parcours terminé (pages, annonces, nouveautés)
+#   schedule                fréquence de passage calculée par le planificateur (churn, intervalle)
+
+
+class MongoCrawlStateStore:
+    """Stockage de l'état dans la collection `crawlState` (clé de recherche comme `_id`)."""
+
+    def __init__(self):
+        from src.database.realStateLbc import db
+        self.collection = db["crawlState"]
+
+    def get(self, key: str) -> dict | None:
+        return self.collection.find_one({"_id": key})
+
+    def put(self, key: str, state: dict):
+        self.collection.replace_one({"_id": key}, {**state, "_id": key}, upsert=True)
+
+
+class FileCrawlStateStore:
+    """Stockage de l'état dans un fichier JSON local, pour les exécutions sans MongoDB."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def _read_all(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def get(self, key: str) -> dict | None:
+        with self.lock:
+            return self._read_all().get(key)
+
+    def put(self, key: str, state: dict):
+        with self.lock:
+            states = self._read_all()
+            states[key] = {**state, "_id": key}
+            # Écriture atomique : un crash ne laisse jamais un fichier tronqué
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(states, f, default=str, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+# Entrée réservée au plan de shards, à côté des états de recherche
+SHARD_PLAN_KEY = "shard_plan"
+
+_store = None
+
+def get_crawl_state_store():
+    global _store
+    if _store is None:
+        if CRAWL_STATE_BACKEND == "file":
+            _store = FileCrawlStateStore(CRAWL_STATE_FILE)
+        else:
+            _store = MongoCrawlStateStore()
+    return _store
+
+
+def load_crawl_state(key: str) -> dict | None:
+    return get_crawl_state_store().get(key)
+
+def start_crawl(key: str, params: dict, resume: bool = True) -> dict:
+    """Reprend la recherche interrompue, ou démarre un nouveau parcours si la précédente est terminée."""
+    state = load_crawl_state(key)
+    if resume and state and state.get("status") == "in_progress":
+        logger.info(f"♻️ Reprise de la recherche {key} après la page {state.get('last_completed_page', 0)}")
+        return state
+
+    now = datetime.utcnow().isoformat()
+    new_state = {
+        "params": params,
+        "status": "in_progress",
+        "last_completed_page": 0,
+        "newest_publication_date": (state or {}).get("newest_publication_date"),
+        "high_water_mark": (state or {}).get("high_water_mark"),
+        "last_run": (state or {}).get("last_run"),
+        "schedule": (state or {}).get("schedule"),
+        "pivot": None,
+        "ads_seen": 0,
+        "started_at": now,
+        "updated_at": now,
+    }
+    get_crawl_state_store().put(key, new_state)
+    return new_state
+
+def save_page_checkpoint(key: str, state: dict, page_number: int, ads: list, pivot: str | None = None,
+                         dates: list[str | None] | None = None) -> dict:
+    """Enregistre qu'une page a été entièrement traitée (`dates` : dates de publication des annonces,
+    lues par défaut dans first_publication_date)."""
+    if dates is None:
+        dates = [ad.get("first_publication_date") for ad in ads]
+    dates = [date for date in dates if date]
+    newest = max(dates + ([state["newest_publication_date"]] if state.get("newest_publication_date") else []), default=None)
+    state.update({
+        "last_completed_page": page_number,
+        "newest_publication_date": newest,
+        "pivot": pivot,
+        "ads_seen": state.get("ads_seen", 0) + len(ads),
+        "updated_at": datetime.utcnow().isoformat(),
+    })
+    get_crawl_state_store().put(key, state)
+    return state
+
+def complete_crawl(key: str, state: dict, summary: dict | None = None) -> dict:
+    """Marque la recherche comme parcourue : le prochain lancement repartira de la page 1."""
+    now = datetime.utcnow().isoformat()
+    state.update({
+        "status": "completed",
+        "pivot": None,
+        "high_water_mark": state.get("newest_publication_date"),
+        "completed_at": now,
+        "updated_at": now,
+    })
+    if summary is not None:
+        # Début du parcours conservé avec son résumé : started_at est remis à zéro par le parcours suivant
+        state["last_run"] = {**summary, "started_at": state.get("started_at"), "finished_at": now}
+    get_crawl_state_store().put(key, state)
+    return state
+
+def save_schedule_stats(key: str, schedule: dict):
+    """Mémorise la fréquence calculée pour une recherche, conservée d'un redémarrage à l'autre."""
+    state = load_crawl_state(key) or {"status": "completed", "last_completed_page": 0}
+    state["schedule"] = {**schedule, "updated_at": datetime.utcnow().isoformat()}
+    get_crawl_state_store().put(key, state)
+
+def save_shard_plan(shard_plan: list[dict]):
+    """Enregistre le dernier plan de shards calculé, consommé par les parcours découpés."""
+    now = datetime.utcnow().isoformat()
+    get_crawl_state_store().put(SHARD_PLAN_KEY, {"shards": shard_plan, "created_at": now, "updated_at": now})
+
+def load_shard_plan() -> list[dict]:
+    plan = load_crawl_state(SHARD_PLAN_KEY)
+    return plan["shards"] if plan else []
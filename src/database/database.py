@@ -1,16 +1,34 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from src.config.settings import MONGO_URI
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE
+from src.config.settings import MONGO_URI, MONGO_MAX_POOL_SIZE
 from loguru import logger
 
 # Variables globales pour stocker la connexion
 client = None
 database = None
 
+# 🔹 Index de /api/v1/listings, selon la règle égalité → tri → intervalle : filtres d'égalité en tête,
+# puis la clé de pagination (scraped_at, _id), puis prix et surface pour filtrer dans l'index.
+LISTING_SORT_KEYS = [("scraped_at", DESCENDING), ("_id", DESCENDING)]
+LISTING_RANGE_KEYS = [("price", ASCENDING), ("surface_m2", ASCENDING)]
+LISTING_EQUALITY_PREFIXES = [
+    [],
+    [("departement_id", ASCENDING)],
+    [("departement_id", ASCENDING), ("typeBien", ASCENDING)],
+    [("zipcode", ASCENDING)],
+    [("zipcode", ASCENDING), ("typeBien", ASCENDING)],
+    [("city", ASCENDING)],
+    [("city", ASCENDING), ("typeBien", ASCENDING)],
+    [("typeBien", ASCENDING)],
+]
+
 async def init_db():
     """Initialisation de la connexion à MongoDB."""
     global client, database
     try:
-        client = AsyncIOMotorClient(MONGO_URI)
+        if not MONGO_URI:
+            raise ValueError("❌ MONGO_URI n'est pas défini (src/environment/local.env ou environnement)")
+        client = AsyncIOMotorClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
         
         # Récupérer automatiquement la base de données depuis l'URI
         database_name = MONGO_URI.split("/")[-1]  # Extraire "xtractify_db" de l'URI
@@ -19,14 +37,31 @@ async def init_db():
 
         database = client[database_name]  # Sélection de la base de données
         logger.success(f"✅ Connexion à MongoDB réussie ({database_name})")
+        await ensure_listing_indexes()
 
     except Exception as e:
         logger.critical(f"🚨 Erreur de connexion à MongoDB: {str(e)}")
         raise SystemExit(1)
 
+async def ensure_listing_indexes():
+    """Crée les index composés des requêtes d'annonces (sans effet s'ils existent déjà)."""
+    listings = database["realStateLbc"]
+    for prefix in LISTING_EQUALITY_PREFIXES:
+        await listings.create_index(prefix + LISTING_SORT_KEYS + LISTING_RANGE_KEYS)
+    # Filtre par date de publication sans autre critère
+    await listings.create_index([("publication_date", DESCENDING)] + LISTING_SORT_KEYS)
+    # Recherches géographiques ($geoNear, $geoWithin) et tuiles de la carte
+    await listings.create_index([("location", GEOSPHERE), ("typeBien", ASCENDING)])
+
 async def close_db():
     """Ferme proprement la connexion à MongoDB."""
     global client
     if client:
         client.close()
         logger.info("🔌 Connexion MongoDB fermée proprement")
+
+def get_collection(name: str):
+    """Collection Motor de la base ouverte par init_db (lectures asynchrones de l'API)."""
+    if database is None:
+        raise RuntimeError("❌ Base de données non initialisée, init_db() n'a pas été appelé")
+    return database[name]
@@ -0,0 +1,131 @@
+import uuid
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from loguru import logger
+from src.config.settings import JOB_MAX_ATTEMPTS
+from src.database.realStateLbc import db, get_db, LazyHandle
+
+# 🔹 File de travail des scrapings, partagée par tous les workers via MongoDB.
+# Cycle de vie d'un job : queued → leased → done, ou retour en queued si le worker échoue
+# ou disparaît (bail expiré), puis dead après JOB_MAX_ATTEMPTS tentatives.
+jobs_collection = LazyHandle(lambda: get_db()["scrapeJobs"])
+
+ACTIVE_STATUSES = ["queued", "leased"]
+
+
+def ensure_job_indexes():
+    jobs_collection.create_index([("status", ASCENDING), ("priority", DESCENDING), ("created_at", ASCENDING)])
+    jobs_collection.create_index([("status", ASCENDING), ("lease_expires_at", ASCENDING)])
+    # Un seul job actif par dedup_key : deux enqueue_job concurrents ne peuvent pas tous deux insérer
+    jobs_collection.create_index(
+        [("dedup_key", ASCENDING)], name="dedup_key_active", unique=True,
+        partialFilterExpression={"dedup_key": {"$type": "string"}, "status": {"$in": ACTIVE_STATUSES}},
+    )
+    db["jobSpans"].create_index([("job_id", ASCENDING), ("start", ASCENDING)])
+
+
+def enqueue_job(kind: str, payload: dict, priority: int = 0, dedup_key: str | None = None) -> str:
+    """Ajoute un job à la file ; avec `dedup_key`, réutilise le job identique encore en attente ou en cours."""
+    while True:
+        if dedup_key:
+            existing = jobs_collection.find_one({"dedup_key": dedup_key, "status": {"$in": ACTIVE_STATUSES}}, {"_id": 1})
+            if existing:
+                return existing["_id"]
+
+        job_id = uuid.uuid4().hex
+        try:
+            jobs_collection.insert_one({
+                "_id": job_id,
+                "kind": kind,
+                "payload": payload,
+                "priority": priority,
+                "dedup_key": dedup_key,
+                "status": "queued",
+                "attempts": 0,
+                "created_at": datetime.utcnow(),
+            })
+        except DuplicateKeyError:
+            # Job identique ajouté entre-temps par un autre processus (index unique dedup_key_active)
+            continue
+        logger.info(f"📥 Job {kind} ajouté à la file : {job_id}")
+        return job_id
+
+
+def lease_job(worker_id: str, lease_seconds: int) -> dict | None:
+    """Attribue au worker le prochain job disponible, y compris ceux dont le bail a expiré."""
+    while True:
+        now = datetime.utcnow()
+        job = jobs_collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued"},
+                {"status": "leased", "lease_expires_at": {"$lt": now}},
+            ]},
+            {
+                "$set": {
+                    "status": "leased",
+                    "worker_id": worker_id,
+                    "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                    "heartbeat_at": now,
+                    "started_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("priority", DESCENDING), ("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if job is None or job["attempts"] <= JOB_MAX_ATTEMPTS:
+            return job
+        # Job repris trop souvent (worker mort à chaque tentative) : abandon définitif
+        jobs_collection.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": "dead", "finished_at": now, "error": "Nombre maximal de tentatives atteint"}}
+        )
+        logger.error(f"💀 Job {job['_id']} abandonné après {JOB_MAX_ATTEMPTS} tentatives")
+
+
+def heartbeat_job(job_id: str, worker_id: str, lease_seconds: int) -> bool:
+    """Prolonge le bail ; retourne False si le job a été repris par un autre worker."""
+    now = datetime.utcnow()
+    result = jobs_collection.update_one(
+        {"_id": job_id, "worker_id": worker_id, "status": "leased"},
+        {"$set": {"heartbeat_at": now, "lease_expires_at": now + timedelta(seconds=lease_seconds)}}
+    )
+    return result.modified_count == 1
+
+
+def complete_job(job_id: str, worker_id: str, result: dict):
+    jobs_collection.update_one(
+        {"_id": job_id, "worker_id": worker_id},
+        {"$set": {"status": "done", "result": result, "finished_at": datetime.utcnow()}}
+    )
+
+
+def fail_job(job_id: str, worker_id: str, error: str):
+    """Remet le job en file pour une nouvelle tentative, ou l'abandonne si elles sont épuisées."""
+    job = jobs_collection.find_one({"_id": job_id}, {"attempts": 1})
+    status = "dead" if job and job.get("attempts", 0) >= JOB_MAX_ATTEMPTS else "queued"
+    jobs_collection.update_one(
+        {"_id": job_id, "worker_id": worker_id},
+        {"$set": {"status": status, "error": error, "finished_at": datetime.utcnow()},
+         "$unset": {"lease_expires_at": ""}}
+    )
+
+
+def get_job(job_id: str) -> dict | None:
+    return jobs_collection.find_one({"_id": job_id})
+
+
+def count_active_jobs(kind: str | None = None) -> int:
+    query = {"status": {"$in": ACTIVE_STATUSES}}
+    if kind:
+        query["kind"] = kind
+    return jobs_collection.count_documents(query)
+
+
+def release_job(job_id: str, worker_id: str):
+    """Rend immédiatement un job à la file lors de l'arrêt du worker, sans compter la tentative."""
+    jobs_collection.update_one(
+        {"_id": job_id, "worker_id": worker_id, "status": "leased"},
+        {"$set": {"status": "queued"}, "$unset": {"lease_expires_at": "", "worker_id": ""}, "$inc": {"attempts": -1}}
+    )
@@ -0,0 +1,69 @@
+import argparse
+from loguru import logger
+from src.config.logging_config import setup_logging
+from src.database.realStateLbc import collection, bump_cache_versions
+
+# 🔹 Migrations ponctuelles des annonces déjà en base, lancées à la main après un déploiement
+# qui ajoute un champ dérivé (et non au démarrage de l'API : ce sont des balayages complets).
+#   python -m src.database.migrations --all
+#   python -m src.database.migrations surface_m2
+
+
+# ✅ Renseigne surface_m2 pour les annonces enregistrées avant son introduction (une seule requête)
+def backfill_surface_m2() -> int:
+    number = {"$regexFind": {"input": "$surface", "regex": r"\d+(?:[.,]\d+)?"}}
+    result = collection.update_many(
+        {"surface_m2": {"$exists": False}, "surface": {"$type": "string"}},
+        [{"$set": {"surface_m2": {"$convert": {
+            "input": {"$replaceAll": {"input": {"$ifNull": [{"$getField": {"field": "match", "input": number}}, ""]}, "find": ",", "replacement": "."}},
+            "to": "double", "onError": None, "onNull": None,
+        }}}}]
+    )
+    return result.modified_count
+
+
+# ✅ Renseigne location et price_m2 pour les annonces enregistrées avant leur introduction
+def backfill_geo_fields() -> int:
+    located = collection.update_many(
+        {"location": {"$exists": False}, "latitude": {"$type": "number"}, "longitude": {"$type": "number"}},
+        [{"$set": {"location": {"type": "Point", "coordinates": ["$longitude", "$latitude"]}}}]
+    )
+    priced = collection.update_many(
+        {"price_m2": {"$exists": False}, "price": {"$gt": 0}, "surface_m2": {"$gt": 0}},
+        [{"$set": {"price_m2": {"$round": [{"$divide": ["$price", "$surface_m2"]}, 2]}}}]
+    )
+    return located.modified_count + priced.modified_count
+
+
+# Ordre d'exécution : price_m2 (geo) dépend de surface_m2
+MIGRATIONS = {
+    "surface_m2": backfill_surface_m2,
+    "geo": backfill_geo_fields,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="xtractify-migrations", description="Migrations des annonces en base")
+    parser.add_argument("names", nargs="*", metavar="migration", help=f"Migrations à exécuter : {', '.join(MIGRATIONS)}")
+    parser.add_argument("--all", action="store_true", help="Exécute toutes les migrations, dans l'ordre")
+    args = parser.parse_args()
+    unknown = sorted(set(args.names) - set(MIGRATIONS))
+    if unknown:
+        parser.error(f"migration(s) inconnue(s) : {', '.join(unknown)}")
+    setup_logging()
+    names = list(MIGRATIONS) if args.all else [name for name in MIGRATIONS if name in args.names]
+    if not names:
+        parser.print_help()
+        return
+    updated = 0
+    for name in names:
+        count = MIGRATIONS[name]()
+        updated += count
+        logger.info(f"🧱 Migration {name} : {count} annonce(s) mise(s) à jour")
+    if updated:
+        # Annonces réécrites hors parcours : toutes les réponses en cache de l'API sont périmées
+        bump_cache_versions([])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import json
+from datetime import datetime
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 🔹 Représentation interne d'une annonce pendant le scraping. Le modèle pydantic
+# (RealStateLBCModel) reste réservé aux frontières de l'API ; le pipeline construit un
+# AdRecord à __slots__, sans validation, directement convertible en document BSON ou en JSON.
+#   record = AdRecord(id="2901234567", price=850, publication_date="2025-02-11 10:12:34", ...)
+#   collection.insert_one(record.to_document())
+
+# Mêmes champs, dans le même ordre, que RealStateLBCModel
+AD_FIELDS = (
+    "id", "publication_date", "index_date", "expiration_date", "status", "ad_type", "title", "description",
+    "body", "url", "category_id", "category_name", "price", "nbrImages", "images",
+    "typeBien", "meuble", "surface", "surface_m2", "price_m2", "nombreDepiece", "nombreChambres",
+    "nombreSalleEau", "nb_salles_de_bain", "nb_parkings", "nb_niveaux", "disponibilite", "annee_construction",
+    "classeEnergie", "ges", "ascenseur", "etage", "nombreEtages",
+    "exterieur", "charges_incluses", "depot_garantie", "loyer_mensuel_charges", "caracteristiques",
+    "region", "city", "zipcode", "departement", "latitude", "longitude", "region_id", "departement_id", "location",
+    "agencename", "scraped_at",
+    "fingerprint", "last_seen_at", "crawl_shard", "expired", "expired_at", "history",
+)
+
+# Dates Leboncoin ("2025-02-11 10:12:34") converties à la construction
+DATE_FIELDS = ("publication_date", "index_date", "expiration_date")
+# Nombres stockés en double, comme le faisait la validation pydantic
+FLOAT_FIELDS = ("price", "surface_m2", "price_m2", "latitude", "longitude")
+
+
+def parse_lbc_date(value) -> datetime | None:
+    """Date Leboncoin → datetime ; None si vide ou illisible."""
+    if not value or isinstance(value, datetime):
+        return value or None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class AdRecord:
+    """Annonce normalisée : un attribut par champ de AD_FIELDS, None si absent."""
+
+    __slots__ = AD_FIELDS
+
+    def __init__(self, **values):
+        for name in AD_FIELDS:
+            setattr(self, name, values.pop(name, None))
+        if values:
+            raise TypeError(f"Champs inconnus : {', '.join(sorted(values))}")
+        if self.id is None:
+            raise TypeError("Champ obligatoire manquant : id")
+        for name in DATE_FIELDS:
+            setattr(self, name, parse_lbc_date(getattr(self, name)))
+        for name in FLOAT_FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                setattr(self, name, float(value))
+
+    def __repr__(self) -> str:
+        return f"AdRecord(id={self.id!r}, title={self.title!r}, price={self.price!r})"
+
+    def to_document(self) -> dict:
+        """Document MongoDB (`_id` = identifiant de l'annonce, champs vides omis)."""
+        document = {"_id": self.id}
+        for name in AD_FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                document[name] = value
+        return document
+
+    def to_json(self) -> bytes:
+        """Document encodé en JSON (orjson s'il est installé)."""
+        if orjson is not None:
+            return orjson.dumps(self.to_document(), default=_json_default)
+        return json.dumps(self.to_document(), default=_json_default, ensure_ascii=False).encode("utf-8")
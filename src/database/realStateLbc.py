@@ -1,13 +1,61 @@
+import hashlib
+import json
+import re
+import threading
 from pydantic import BaseModel, Field, validator
 from typing import Optional, List
 from datetime import datetime
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from loguru import logger
+from src.database.models import AdRecord
+from src.utils.metrics import MONGO_WRITE_SECONDS, observe_seconds
+from src.utils.tracing import traced
+from src.config.logging_config import ad_log_sampled
+from src.config.settings import MONGO_URI, MONGO_MAX_POOL_SIZE
 
-# 🔹 Connexion à la base de données MongoDB
-client = MongoClient("mongodb://localhost:27017")
-db = client["xtracto"]
-collection = db["realStateLbc"]
+# 🔹 Connexion à la base de données MongoDB (base indiquée dans MONGO_URI), ouverte à la première
+# requête et non à l'import : l'API et les outils qui n'écrivent pas en base ne paient pas la connexion.
+_client = None
+_client_lock = threading.Lock()
+
+def get_client() -> MongoClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            if not MONGO_URI:
+                raise ValueError("❌ MONGO_URI n'est pas défini (src/environment/local.env ou environnement)")
+            _client = MongoClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
+        return _client
+
+def get_db():
+    return get_client().get_default_database("xtracto")
+
+
+class LazyHandle:
+    """Objet pymongo (client, base, collection) construit à sa première utilisation."""
+
+    __slots__ = ("_factory", "_target")
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            self._target = self._factory()
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __getitem__(self, name):
+        return self._resolve()[name]
+
+
+client = LazyHandle(get_client)
+db = LazyHandle(get_db)
+collection = LazyHandle(lambda: get_db()["realStateLbc"])
 
 
 class RealStateLBCModel(BaseModel):
@@ -32,6 +80,8 @@ class RealStateLBCModel(BaseModel):
     typeBien: Optional[str] = None                # Type de bien
     meuble: Optional[str] = None                  # Ce bien est :
     surface: Optional[str] = None                 # Surface habitable
+    surface_m2: Optional[float] = None            # Surface habitable en m² (numérique, pour les filtres)
+    price_m2: Optional[float] = None              # Prix au m² (price / surface_m2)
     nombreDepiece: Optional[str] = None           # Nombre de pièces
     nombreChambres: Optional[str] = None          # Nombre de chambres
     nombreSalleEau: Optional[str] = None          # Nombre de salle d'eau
@@ -66,12 +116,21 @@ class RealStateLBCModel(BaseModel):
     longitude: Optional[float] = None             # location.lng
     region_id: Optional[str] = None               # location.region_id
     departement_id: Optional[str] = None          # location.department_id
+    location: Optional[dict] = None               # Point GeoJSON [lng, lat], index 2dsphere
 
     # 🔹 Informations sur l'agence
     agencename: Optional[str] = None              # owner.name
 
     scraped_at: datetime
 
+    # 🔹 Suivi des changements
+    fingerprint: Optional[str] = None             # Empreinte des champs suivis (TRACKED_FIELDS)
+    last_seen_at: Optional[datetime] = None       # Dernière apparition dans les résultats de recherche
+    crawl_shard: Optional[str] = None             # Recherche (shard) dans laquelle l'annonce a été vue
+    expired: Optional[bool] = None                # Annonce disparue des résultats (voir expire_unseen_annonces)
+    expired_at: Optional[datetime] = None
+    history: Optional[List[dict]] = None          # Changements observés : {at, price, status, changed}
+
 
     @validator("publication_date", pre=True, always=True)
     def parse_publication_date(cls, v):
@@ -82,21 +141,177 @@ class RealStateLBCModel(BaseModel):
         except Exception:
             return None
 
+# 🔹 Champs dont la modification est historisée (prix, statut, contenu de l'annonce)
+TRACKED_FIELDS = [
+    "price", "status", "title", "description", "surface", "nombreDepiece",
+    "charges_incluses", "loyer_mensuel_charges", "depot_garantie", "nbrImages",
+]
+
+
+# ✅ Surface numérique à partir du libellé Leboncoin ("24 m²", "12,5 m²")
+SURFACE_PATTERN = re.compile(r"\d+(?:[.,]\d+)?")
+
+def parse_surface(label: str | None) -> float | None:
+    match = SURFACE_PATTERN.search(label or "")
+    return float(match.group().replace(",", ".")) if match else None
+
+
+# ✅ Point GeoJSON (longitude en premier) à partir des coordonnées Leboncoin
+def geo_point(latitude: float | None, longitude: float | None) -> dict | None:
+    if latitude is None or longitude is None:
+        return None
+    return {"type": "Point", "coordinates": [float(longitude), float(latitude)]}
+
+
+def price_per_m2(price: float | None, surface_m2: float | None) -> float | None:
+    if not price or not surface_m2:
+        return None
+    return round(price / surface_m2, 2)
+
+
+# ✅ Empreinte stable d'un sous-ensemble canonique de champs
+def compute_fingerprint(fields: dict) -> str:
+    canonical = json.dumps({name: fields.get(name) for name in TRACKED_FIELDS}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
 # ✅ Sauvegarde d'une annonce dans MongoDB
-def save_annonce_to_db(annonce: RealStateLBCModel) -> bool:
-    # Vérifier si l'annonce existe déjà via son ID
-    if collection.find_one({"id": annonce.id}):  
-        logger.info(f"⏭ Annonce {annonce.id} déjà existante en base.")
+@traced()
+def save_annonce_to_db(annonce: AdRecord | RealStateLBCModel) -> bool:
+    # Insérer l'annonce avec `id` comme `_id` : un doublon est refusé par l'index unique de `_id`
+    if isinstance(annonce, AdRecord):
+        annonce_dict = annonce.to_document()
+    else:
+        annonce_dict = annonce.dict(by_alias=True, exclude_none=True)
+        annonce_dict["_id"] = annonce_dict["id"]  # ✅ Définir `_id` comme étant l'ID de l'annonce
+
+    try:
+        with observe_seconds(MONGO_WRITE_SECONDS, operation="insert"):
+            collection.insert_one(annonce_dict)
+    except DuplicateKeyError:
+        if ad_log_sampled():
+            logger.info(f"⏭ Annonce {annonce.id} déjà existante en base.")
         return False
-    
-    # Insérer l'annonce avec `id` comme `_id` pour éviter les doublons
-    annonce_dict = annonce.dict(by_alias=True, exclude_none=True)
-    annonce_dict["_id"] = annonce_dict["id"]  # ✅ Définir `_id` comme étant l'ID de l'annonce
-    
-    collection.insert_one(annonce_dict)
     return True
 
 
+# ✅ Insère un lot de nouvelles annonces en une requête ; les doublons concurrents sont ignorés.
+# Retourne les `_id` réellement insérés.
+@traced()
+def insert_annonces(documents: list[dict], target=None) -> set:
+    if not documents:
+        return set()
+    try:
+        with observe_seconds(MONGO_WRITE_SECONDS, operation="insert_many"):
+            result = (target if target is not None else collection).insert_many(documents, ordered=False)
+        return set(result.inserted_ids)
+    except BulkWriteError as e:
+        # Insertion non ordonnée : chaque document refusé (doublon inséré entre-temps…) a son erreur
+        failed = {error["index"] for error in e.details.get("writeErrors", [])}
+        return {document["_id"] for index, document in enumerate(documents) if index not in failed}
+
+
 # ✅ Vérifier si une annonce existe déjà en base
 def annonce_exists(annonce_id: str) -> bool:
     return collection.find_one({"id": annonce_id}) is not None  # ✅ Recherche sur `id`
+
+
+# ✅ Identifiants déjà présents en base parmi une page d'annonces (une seule requête)
+def existing_annonce_ids(annonce_ids: list[str]) -> set[str]:
+    if not annonce_ids:
+        return set()
+    return {doc["_id"] for doc in collection.find({"_id": {"$in": annonce_ids}}, {"_id": 1})}
+
+
+# ✅ Champs suivis et empreinte des annonces déjà en base parmi une page (une seule requête)
+def load_known_annonces(annonce_ids: list[str], target=None) -> dict[str, dict]:
+    if not annonce_ids:
+        return {}
+    projection = {name: 1 for name in TRACKED_FIELDS + ["fingerprint", "expired", "departement_id"]}
+    return {doc["_id"]: doc for doc in (target if target is not None else collection).find({"_id": {"$in": annonce_ids}}, projection)}
+
+
+# ✅ Enregistre uniquement ce qui a changé depuis la dernière observation
+@traced()
+def record_annonce_changes(annonce_id: str, previous: dict, fields: dict, fingerprint: str, target=None) -> list[str]:
+    now = datetime.utcnow()
+    changed = [name for name in TRACKED_FIELDS if previous.get(name) != fields.get(name)]
+    surface_m2 = parse_surface(fields.get("surface"))
+    update = {"$set": {
+        **fields, "surface_m2": surface_m2, "price_m2": price_per_m2(fields.get("price"), surface_m2),
+        "fingerprint": fingerprint, "last_seen_at": now,
+    }}
+    if previous.get("fingerprint") is None:
+        # Annonce antérieure au suivi : l'empreinte sert de référence, sans entrée d'historique
+        changed = []
+    elif changed:
+        update["$push"] = {"history": {"at": now, "price": fields.get("price"), "status": fields.get("status"), "changed": changed}}
+    with observe_seconds(MONGO_WRITE_SECONDS, operation="update_changes"):
+        (target if target is not None else collection).update_one({"_id": annonce_id}, update)
+    return changed
+
+
+# ✅ Index utilisés par le suivi de présence et le balayage d'expiration
+def ensure_annonce_indexes():
+    collection.create_index([("crawl_shard", ASCENDING), ("last_seen_at", ASCENDING)])
+    collection.create_index([("expired", ASCENDING)])
+
+
+# ✅ Marque toutes les annonces d'une page comme vues (une écriture par page, plus les éventuelles réapparitions)
+@traced()
+def mark_annonces_seen(annonce_ids: list[str], shard_key: str | None = None, target=None,
+                       known: dict[str, dict] | None = None) -> int:
+    """Présence des annonces d'une page en une requête ; `known` (load_known_annonces) évite de relire
+    les annonces expirées qui réapparaissent."""
+    if not annonce_ids:
+        return 0
+    target = target if target is not None else collection
+    seen = {"last_seen_at": datetime.utcnow(), "expired": False}
+    if shard_key:
+        seen["crawl_shard"] = shard_key
+    # Une annonce expirée qui réapparaît redevient active : changement visible par l'API, le cache est invalidé
+    # (last_seen_at et crawl_shard, eux, ne figurent pas dans les réponses en cache)
+    if known is None:
+        departements = target.distinct("departement_id", {"_id": {"$in": annonce_ids}, "expired": True})
+        reactivated = bool(departements)
+    else:
+        expired = [doc for doc in known.values() if doc.get("expired")]
+        departements = {doc.get("departement_id") for doc in expired}
+        reactivated = bool(expired)
+    # Mise à jour par pipeline : expired_at n'est retiré que des annonces expirées, dans la même requête
+    with observe_seconds(MONGO_WRITE_SECONDS, operation="mark_seen"):
+        result = target.update_many({"_id": {"$in": annonce_ids}}, [{"$set": {
+            **seen, "expired_at": {"$cond": [{"$eq": ["$expired", True]}, "$$REMOVE", "$expired_at"]},
+        }}])
+    if reactivated:
+        bump_cache_versions(departements)
+    return result.modified_count
+
+
+# ✅ Expire les annonces d'un shard qui n'ont pas été revues depuis `cutoff`
+def expire_unseen_annonces(shard_key: str, cutoff: datetime, protected: list[dict] | None = None) -> int:
+    unseen = {"crawl_shard": shard_key, "last_seen_at": {"$lt": cutoff}, "expired": {"$ne": True}}
+    if protected:
+        # Filtres des annonces encore couvertes par un autre shard (voir jobs.sweep_expired_annonces)
+        unseen["$nor"] = protected
+    departements = collection.distinct("departement_id", unseen)
+    result = collection.update_many(unseen, {"$set": {"expired": True, "expired_at": datetime.utcnow()}})
+    if result.modified_count:
+        bump_cache_versions(departements)
+    return result.modified_count
+
+
+# 🔹 Versions des périmètres du cache de l'API (src/utils/cache.py) : global et par département
+CACHE_GLOBAL_SCOPE = "all"
+
+def cache_scope(departement_id: str) -> str:
+    return f"dep:{str(departement_id).lstrip('0') or '0'}"
+
+
+# ✅ Invalide les réponses en cache qui couvrent les départements modifiés (et les réponses globales)
+def bump_cache_versions(departement_ids) -> None:
+    scopes = {CACHE_GLOBAL_SCOPE} | {cache_scope(value) for value in departement_ids if value}
+    db["cacheVersions"].bulk_write(
+        [UpdateOne({"_id": scope}, {"$inc": {"v": 1}}, upsert=True) for scope in sorted(scopes)],
+        ordered=False
+    )
@@ -0,0 +1,208 @@
+import argparse
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta
+from loguru import logger
+from pymongo import ASCENDING, UpdateOne
+from src.config.logging_config import setup_logging
+from src.config.settings import ROLLUP_REBUILD_BATCH_SIZE
+from src.database.realStateLbc import db, collection, get_db, LazyHandle, bump_cache_versions
+from src.utils.tracing import traced
+
+# 🔹 Statistiques de marché pré-agrégées, tenues à jour à l'ingestion.
+# Un seau par (dimension, valeurs de la dimension, semaine de publication) contient le nombre
+# d'annonces, les sommes de prix et de prix au m², et un histogramme logarithmique de chaque
+# mesure. Les histogrammes s'additionnent : n'importe quelle combinaison de semaines ou de seaux
+# donne moyenne, médiane et p90 sans relire `realStateLbc` (erreur relative bornée par SKETCH_ALPHA).
+rollups_collection = LazyHandle(lambda: get_db()["marketRollups"])
+
+ROLLUP_DIMENSIONS = [
+    (),                                 # France entière
+    ("departement_id",),
+    ("typeBien",),
+    ("departement_id", "typeBien"),
+    # Une ville est toujours qualifiée par son département : des communes homonymes existent (Saint-Denis…)
+    ("departement_id", "city"),
+    ("departement_id", "city", "typeBien"),
+]
+
+MEASURES = ["price", "price_m2"]
+
+# Précision relative des quantiles : valeur représentative à 1 % près des valeurs de son intervalle
+SKETCH_ALPHA = 0.01
+SKETCH_GAMMA = (1 + SKETCH_ALPHA) / (1 - SKETCH_ALPHA)
+_LOG_GAMMA = math.log(SKETCH_GAMMA)
+
+# Taille des lots lus lors d'une reconstruction complète
+REBUILD_BATCH_SIZE = ROLLUP_REBUILD_BATCH_SIZE
+
+
+def dimension_name(dimension: tuple) -> str:
+    return "+".join(dimension) or "all"
+
+
+def rollup_source(group_fields: tuple, filter_fields: set) -> tuple | None:
+    """Plus petite dimension dont les seaux portent les champs de regroupement et de filtre (None si aucune).
+
+    Un filtre sur un champ absent du regroupement se lit dans une dimension plus fine, dont les
+    seaux sont ensuite refusionnés : prix des appartements par département = departement_id+typeBien
+    filtré sur typeBien, regroupé par departement_id.
+    """
+    needed = set(group_fields) | set(filter_fields)
+    candidates = [dimension for dimension in ROLLUP_DIMENSIONS if needed <= set(dimension)]
+    return min(candidates, key=len) if candidates else None
+
+
+def week_start(publication_date) -> datetime | None:
+    """Lundi de la semaine de publication (date brute Leboncoin ou datetime)."""
+    if isinstance(publication_date, str):
+        try:
+            publication_date = datetime.strptime(publication_date, "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            return None
+    if not isinstance(publication_date, datetime):
+        return None
+    day = publication_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    return day - timedelta(days=day.weekday())
+
+
+def sketch_bin(value: float) -> str:
+    return str(math.ceil(math.log(value) / _LOG_GAMMA))
+
+
+def sketch_value(index: int) -> float:
+    """Valeur représentative d'un intervalle : à SKETCH_ALPHA près de toutes les valeurs qu'il contient."""
+    return 2 * SKETCH_GAMMA ** index / (SKETCH_GAMMA + 1)
+
+
+def rollup_increments(observations: list[tuple[dict, int]]) -> dict[str, dict]:
+    """Regroupe par seau les contributions d'un lot d'annonces.
+
+    Chaque observation est (annonce, signe) : +1 ajoute l'annonce, -1 retire une ancienne valeur
+    (annonce dont le prix ou la surface a changé). L'annonce porte departement_id, city, typeBien,
+    publication_date, price et price_m2.
+    """
+    buckets = {}
+    for annonce, sign in observations:
+        week = week_start(annonce.get("publication_date"))
+        if week is None:
+            continue
+        for dimension in ROLLUP_DIMENSIONS:
+            keys = {field: annonce.get(field) for field in dimension}
+            if any(value is None for value in keys.values()):
+                continue
+            bucket_id = "|".join([dimension_name(dimension), *(str(keys[field]) for field in dimension), week.date().isoformat()])
+            bucket = buckets.setdefault(bucket_id, {
+                "fields": {"dimension": dimension_name(dimension), "keys": keys, "week": week},
+                "inc": defaultdict(int),
+            })
+            bucket["inc"]["count"] += sign
+            for measure in MEASURES:
+                value = annonce.get(measure)
+                if not isinstance(value, (int, float)) or value <= 0:
+                    continue
+                bucket["inc"][f"{measure}_count"] += sign
+                bucket["inc"][f"{measure}_sum"] += sign * value
+                bucket["inc"][f"{measure}_sketch.{sketch_bin(value)}"] += sign
+    return buckets
+
+
+@traced()
+def record_rollups(observations: list[tuple[dict, int]], target=None) -> int:
+    """Applique les contributions d'un lot en une seule écriture groupée ($inc par seau)."""
+    buckets = rollup_increments(observations)
+    if not buckets:
+        return 0
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {"_id": bucket_id},
+            {"$inc": dict(bucket["inc"]), "$setOnInsert": bucket["fields"], "$set": {"updated_at": now}},
+            upsert=True,
+        )
+        for bucket_id, bucket in buckets.items()
+    ]
+    (target if target is not None else rollups_collection).bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+def ensure_rollup_indexes(target=None):
+    target = target if target is not None else rollups_collection
+    target.create_index([("dimension", ASCENDING), ("week", ASCENDING)])
+    target.create_index([("dimension", ASCENDING), ("keys.departement_id", ASCENDING), ("week", ASCENDING)])
+    target.create_index([("dimension", ASCENDING), ("keys.city", ASCENDING), ("week", ASCENDING)])
+
+
+def sketch_quantile(sketch: dict, count: int, quantile: float) -> float | None:
+    if count <= 0:
+        return None
+    rank = quantile * (count - 1)
+    seen = 0
+    for index in sorted(sketch, key=int):
+        seen += sketch[index]
+        if seen > rank:
+            return round(sketch_value(int(index)), 2)
+    return None
+
+
+def merge_rollups(documents: list[dict]) -> dict:
+    """Fusionne des seaux (semaines, villes…) et calcule nombre, moyenne, médiane et p90 de chaque mesure."""
+    merged = {"count": sum(document.get("count", 0) for document in documents)}
+    for measure in MEASURES:
+        count = sum(document.get(f"{measure}_count", 0) for document in documents)
+        total = sum(document.get(f"{measure}_sum", 0) for document in documents)
+        sketch = defaultdict(int)
+        for document in documents:
+            for index, number in (document.get(f"{measure}_sketch") or {}).items():
+                sketch[index] += number
+        merged[measure] = {
+            "count": count,
+            "mean": round(total / count, 2) if count else None,
+            "median": sketch_quantile(sketch, count, 0.5),
+            "p90": sketch_quantile(sketch, count, 0.9),
+        }
+    return merged
+
+
+def rebuild_rollups() -> int:
+    """Recalcule toutes les statistiques depuis `realStateLbc` puis remplace la collection d'un coup.
+
+    À lancer hors parcours : les annonces ingérées pendant la reconstruction n'y figureraient pas.
+    """
+    staging = db[f"{rollups_collection.name}_rebuild"]
+    staging.drop()
+    projection = {"_id": 0, "departement_id": 1, "city": 1, "typeBien": 1, "publication_date": 1, "price": 1, "price_m2": 1}
+    batch, annonces = [], 0
+    for annonce in collection.find({}, projection, batch_size=REBUILD_BATCH_SIZE):
+        batch.append((annonce, 1))
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            record_rollups(batch, staging)
+            annonces += len(batch)
+            batch = []
+    if batch:
+        record_rollups(batch, staging)
+        annonces += len(batch)
+    if annonces:
+        ensure_rollup_indexes(staging)
+        staging.rename(rollups_collection.name, dropTarget=True)
+    else:
+        rollups_collection.drop()
+    # Statistiques remplacées en bloc : toutes les réponses en cache de l'API sont périmées
+    bump_cache_versions([])
+    logger.info(f"📊 Statistiques reconstruites à partir de {annonces} annonces")
+    return annonces
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="xtractify-rollups", description="Statistiques de marché pré-agrégées")
+    parser.add_argument("--rebuild", action="store_true", help="Recalcule les statistiques depuis les annonces brutes")
+    args = parser.parse_args()
+    setup_logging()
+    if args.rebuild:
+        rebuild_rollups()
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
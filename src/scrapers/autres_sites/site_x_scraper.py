@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+from src.config.settings import NAVIGATION_TIMEOUT_MS
+from src.database.realStateLbc import parse_surface, geo_point, price_per_m2
+from src.scrapers.plugin import ScraperPlugin, register_plugin
+from src.utils.b2_util import upload_image_to_b2
+
+if TYPE_CHECKING:  # Playwright n'est chargé que par les workers
+    from playwright.async_api import Page
+
+logger = logging.getLogger(__name__)
+
+# 🔹 Exemple de plugin pour un site qui expose une API JSON de recherche paginée :
+#   GET https://api.site-x.example/v1/search?category=locations&page=2&per_page=30
+#   → {"count": 412, "results": [{"id": 81, "title": …, "price": 950, "surface": "42 m²", …}]}
+# Seule la lecture du site est écrite ici : sessions, débit, dédoublonnage, suivi des changements,
+# présence et écritures groupées viennent du moteur (src/scrapers/engine.py).
+# Pour l'activer, décommenter "site_x" dans PLUGIN_MODULES (src/scrapers/plugin.py), puis mettre
+# en file un parcours : GET /api/v1/scrape/sites/site_x
+
+
+@register_plugin
+class SiteXPlugin(ScraperPlugin):
+    name = "site_x"
+    collection = "realStateSiteX"
+    home_url = "https://www.site-x.example/"
+    api_url = "https://api.site-x.example/v1/search"
+    default_params = {"category": "locations"}
+    page_size = 30
+    requests_per_minute = 20
+
+    async def fetch_search_page(self, page: "Page", params: dict, page_number: int) -> dict | None:
+        # Requête faite par le contexte du navigateur : cookies de session et proxy partagés avec la page
+        response = await page.request.get(
+            self.api_url, params={**params, "page": page_number, "per_page": self.page_size},
+            timeout=NAVIGATION_TIMEOUT_MS,
+        )
+        if not response.ok:
+            logger.warning(f"⚠️ [site_x] Page {page_number} : HTTP {response.status}")
+            return None
+        data = await response.json()
+        return {"ads": data.get("results") or [], "total": data.get("count")}
+
+    def is_last_page(self, response: dict, page_number: int) -> bool:
+        return len(response["ads"]) < self.page_size
+
+    def ad_id(self, raw: dict) -> str:
+        return str(raw["id"])
+
+    def publication_date(self, raw: dict) -> str | None:
+        return raw.get("published_at")
+
+    def tracked_fields(self, raw: dict) -> dict:
+        # Mêmes noms que TRACKED_FIELDS : l'historique des changements se lit comme celui de Leboncoin
+        return {
+            "price": raw.get("price"),
+            "status": raw.get("status"),
+            "title": raw.get("title"),
+            "description": raw.get("description"),
+            "surface": raw.get("surface"),
+            "nombreDepiece": raw.get("rooms"),
+            "nbrImages": len(raw.get("photos") or []),
+        }
+
+    def departement_id(self, raw: dict) -> str | None:
+        zipcode = raw.get("zipcode") or ""
+        return zipcode[:2] or None
+
+    def search_params(self, params: dict, mode: str) -> dict:
+        return {**params, "sort": "-published_at"} if mode == "incremental" else params
+
+    async def normalize_ad(self, raw: dict, fields: dict, detail: dict | None = None) -> dict:
+        # Noms de champs de RealStateLBCModel : l'API de lecture et les migrations s'appliquent telles quelles
+        images = list(await asyncio.gather(*(upload_image_to_b2(url, "site_x") for url in raw.get("photos") or [])))
+        surface_m2 = parse_surface(fields["surface"])
+        latitude, longitude = raw.get("lat"), raw.get("lng")
+        return {
+            "id": self.ad_id(raw),
+            "publication_date": raw.get("published_at"),
+            "url": raw.get("url"),
+            **fields,
+            "images": images,
+            "typeBien": raw.get("property_type"),
+            "surface_m2": surface_m2,
+            "price_m2": price_per_m2(fields["price"], surface_m2),
+            "city": raw.get("city"),
+            "zipcode": raw.get("zipcode"),
+            "departement_id": self.departement_id(raw),
+            "latitude": latitude,
+            "longitude": longitude,
+            "location": geo_point(latitude, longitude),
+            "agencename": raw.get("agency"),
+        }
@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from playwright.async_api import Browser, Page
+from src.config.browser_config import create_context, install_resource_policy
+from src.config.settings import INCREMENTAL_STOP_RATIO, PAGE_MAX_RETRIES, SCRAPER_CONCURRENCY
+from src.database.crawl_state import start_crawl, save_page_checkpoint, complete_crawl
+from src.database.realStateLbc import (
+    db, load_known_annonces, insert_annonces, record_annonce_changes, mark_annonces_seen,
+    bump_cache_versions, compute_fingerprint
+)
+from src.database.rollups import record_rollups
+from src.scrapers.plugin import ScraperPlugin, get_plugin
+from src.scrapers.pagination import PaginationTracker
+from src.utils.human_behavior import start_behavior_session
+from src.utils.metrics import ADS_PROCESSED, SESSIONS
+from src.utils.request_manager import get_request_manager
+from src.utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# 🔹 Moteur d'exécution commun aux plugins de sites (src/scrapers/plugin.py) :
+# un contexte Playwright par session, un débit partagé par site, un dédoublonnage sur tout
+# le parcours et une écriture groupée par page (insertions, changements, présence, statistiques).
+
+
+class RateLimiter:
+    """Espacement minimal entre deux requêtes d'un site, partagé par toutes ses sessions."""
+
+    def __init__(self, requests_per_minute: float):
+        self.interval = 60 / requests_per_minute if requests_per_minute else 0
+        self.lock = asyncio.Lock()
+        self.next_at = 0.0
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            if self.next_at > now:
+                await asyncio.sleep(self.next_at - now)
+            self.next_at = max(now, self.next_at) + self.interval
+
+
+@traced()
+async def persist_ads(plugin: ScraperPlugin, page: Page, ads: list[dict], shard_key: str, seen: set[str],
+                      limiter: RateLimiter, summary: dict) -> float:
+    """Enregistre une page d'annonces ; retourne la part d'annonces déjà connues."""
+    target = db[plugin.collection]
+    ads = [ad for ad in ads if plugin.ad_id(ad) not in seen]  # Annonce décalée d'une page à l'autre
+    ad_ids = [plugin.ad_id(ad) for ad in ads]
+    seen.update(ad_ids)
+    if not ads:
+        return 1.0
+    known = await asyncio.to_thread(load_known_annonces, ad_ids, target)
+
+    new_ads, changes = [], []
+    for ad, ad_id in zip(ads, ad_ids):
+        fields = plugin.tracked_fields(ad)
+        fingerprint = compute_fingerprint(fields)
+        previous = known.get(ad_id)
+        if previous is None:
+            new_ads.append((ad, ad_id, fields, fingerprint))
+        elif previous.get("fingerprint") != fingerprint:
+            changes.append((ad, ad_id, previous, fields, fingerprint))
+
+    # Les détails passent par la page de la session : récupérés un par un, au débit du site
+    details = {}
+    if type(plugin).fetch_detail is not ScraperPlugin.fetch_detail:
+        for ad, ad_id, _, _ in new_ads:
+            await limiter.wait()
+            try:
+                details[ad_id] = await plugin.fetch_detail(page, ad)
+            except Exception as e:
+                logger.warning(f"⚠️ [{plugin.name}] Détail de l'annonce {ad_id} indisponible : {e}")
+
+    semaphore = asyncio.Semaphore(plugin.normalize_concurrency)
+
+    async def normalize(ad: dict, ad_id: str, fields: dict, fingerprint: str) -> dict | None:
+        async with semaphore:
+            try:
+                document = await plugin.normalize_ad(ad, fields, details.get(ad_id))
+            except Exception as e:
+                logger.error(f"❌ [{plugin.name}] Annonce {ad_id} non normalisée : {e}")
+                return None
+        now = datetime.utcnow()
+        return {
+            **document, "_id": ad_id, "fingerprint": fingerprint, "scraped_at": now, "last_seen_at": now,
+            "history": [{"at": now, "price": fields.get("price"), "status": fields.get("status"), "changed": []}],
+        }
+
+    documents = [document for document in await asyncio.gather(*(normalize(*item) for item in new_ads)) if document]
+    inserted_ids = await asyncio.to_thread(insert_annonces, documents, target)
+
+    changed_ids = set()
+    for ad, ad_id, previous, fields, fingerprint in changes:
+        if await asyncio.to_thread(record_annonce_changes, ad_id, previous, fields, fingerprint, target):
+            changed_ids.add(ad_id)
+    await asyncio.to_thread(mark_annonces_seen, ad_ids, shard_key, target, known)
+
+    outcomes = {ad_id: "new" if ad_id in inserted_ids else "changed" if ad_id in changed_ids else "unchanged"
+                for ad_id in ad_ids}
+    for outcome in outcomes.values():
+        ADS_PROCESSED.labels(outcome).inc()
+    observations = [observation for ad, ad_id in zip(ads, ad_ids)
+                    for observation in plugin.rollup_observations(ad, outcomes[ad_id], known.get(ad_id))]
+    if observations:
+        await asyncio.to_thread(record_rollups, observations)
+    written = [ad for ad, ad_id in zip(ads, ad_ids) if outcomes[ad_id] != "unchanged"]
+    if written:
+        await asyncio.to_thread(bump_cache_versions, {plugin.departement_id(ad) for ad in written})
+
+    summary["ads"] += len(ads)
+    summary["new_ads"] += len(inserted_ids)
+    summary["changed_ads"] += len(changed_ids)
+    return len(known) / len(ads)
+
+
+@traced()
+async def fetch_page(plugin: ScraperPlugin, page: Page, params: dict, page_number: int, limiter: RateLimiter) -> dict | None:
+    """Page de résultats, avec PAGE_MAX_RETRIES tentatives au débit du site."""
+    for attempt in range(1, PAGE_MAX_RETRIES + 1):
+        await limiter.wait()
+        response = await plugin.fetch_search_page(page, params, page_number)
+        if response is not None:
+            return response
+        logger.warning(f"⚠️ [{plugin.name}] Page {page_number} illisible (tentative {attempt}/{PAGE_MAX_RETRIES})")
+    return None
+
+
+async def crawl_query(plugin: ScraperPlugin, page: Page, params: dict, mode: str, max_pages: int,
+                      limiter: RateLimiter, seen: set[str]) -> dict:
+    """Parcourt une recherche page par page, avec reprise en mode complet et arrêt anticipé en incrémental.
+
+    Le parcours n'est exhaustif (base du balayage d'expiration) que si le site en signale la fin :
+    page vide, dernière page (plugin.is_last_page) ou `total` annonces vues.
+    """
+    shard_key = plugin.query_key(params)  # Même clé de présence en parcours complet et incrémental
+    params = plugin.search_params(params, mode)
+    key = plugin.query_key(params)
+    state = await asyncio.to_thread(start_crawl, key, params, mode == "full")
+    high_water_mark = state.get("high_water_mark")
+    current_page = state.get("last_completed_page", 0)
+    summary = {
+        "site": plugin.name, "mode": mode, "query_key": key, "shard_key": shard_key, "pages": 0, "ads": 0,
+        "new_ads": 0, "changed_ads": 0, "stopped_early": False, "exhaustive": False, "total": None,
+    }
+    pager = PaginationTracker(plugin.ad_id)
+    while current_page < max_pages:
+        response = await fetch_page(plugin, page, params, current_page + 1, limiter)
+        if response is None:
+            # L'état reste "in_progress" : le prochain lancement reprendra à cette page
+            logger.error(f"❌ [{plugin.name}] Page {current_page + 1} illisible, arrêt de la recherche {key}")
+            return summary
+        if summary["total"] is None:
+            summary["total"] = response.get("total")
+        if not response.get("ads"):
+            summary["exhaustive"] = True
+            break
+        current_page += 1
+        # Annonces décalées entre deux pages : doublons écartés, pages où d'autres ont glissé re-parcourues
+        window = pager.observe(current_page, response)
+        ads = window.fresh
+        for gap_page in window.gap_pages:
+            gap_response = await fetch_page(plugin, page, params, gap_page, limiter)
+            if gap_response:
+                ads += pager.observe_refetch(gap_page, gap_response)
+        known_ratio = await persist_ads(plugin, page, ads, shard_key, seen, limiter, summary)
+        summary["pages"] += 1
+        summary["pagination"] = pager.report()
+        dates = [plugin.publication_date(ad) for ad in ads]
+        await asyncio.to_thread(save_page_checkpoint, key, state, current_page, ads, response.get("pivot"), dates)
+        logger.info(f"✅ [{plugin.name}] Page {current_page} : {len(ads)} annonces, {known_ratio:.0%} déjà connues")
+        if plugin.is_last_page(response, current_page) or (
+                summary["total"] and state.get("ads_seen", 0) >= summary["total"]):
+            summary["exhaustive"] = True
+            break
+        if pager.exhausted:
+            logger.info(f"🔁 [{plugin.name}] Page {current_page} : aucune annonce nouvelle depuis {pager.repeats} pages, arrêt.")
+            break
+        newest = max(filter(None, dates), default=None)
+        older_than_mark = bool(high_water_mark and newest and newest <= high_water_mark)
+        if mode == "incremental" and (known_ratio >= INCREMENTAL_STOP_RATIO or older_than_mark):
+            logger.info(
+                f"🛑 [{plugin.name}] Page {current_page} : {known_ratio:.0%} d'annonces déjà connues"
+                f"{' et aucune plus récente que ' + high_water_mark if older_than_mark else ''}, arrêt."
+            )
+            summary["stopped_early"] = True
+            break
+    await asyncio.to_thread(complete_crawl, key, state, summary)
+    return summary
+
+
+async def run_plugin_session(browser: Browser, plugin: ScraperPlugin, session_index: int, queries: asyncio.Queue,
+                             mode: str, max_pages: int, limiter: RateLimiter, seen: set[str]) -> dict:
+    """Session d'un site dans un contexte dédié : consomme les recherches de la file jusqu'à épuisement."""
+    context = await create_context(browser)
+    route_stats = await install_resource_policy(context)
+    behavior = start_behavior_session()
+    try:
+        page = await context.new_page()
+        await plugin.bootstrap_session(page)
+        crawl_summary = []
+        while not queries.empty():
+            crawl_summary.append(await crawl_query(plugin, page, queries.get_nowait(), mode, max_pages, limiter, seen))
+        SESSIONS.labels("success").inc()
+        return {"status": "success", "crawl": crawl_summary, "behavior": behavior.report(),
+                "resources": route_stats.report(), "http": get_request_manager().host_stats()}
+    except Exception as e:
+        logger.error(f"⚠️ [{plugin.name} {session_index}] Erreur de session : {e}")
+        SESSIONS.labels("error").inc()
+        return {"status": "error", "message": str(e), "behavior": behavior.report(), "resources": route_stats.report()}
+    finally:
+        report = behavior.report()
+        logger.info(
+            f"⏱️ [{plugin.name} {session_index}] Attentes volontaires ({report['profile']}) : "
+            f"{report['waited_seconds']}s sur {report['waits']} pauses, "
+            f"{report['skipped_cosmetic']} actions décoratives ignorées"
+        )
+        await context.close()
+
+
+async def run_plugin_job(browser: Browser, site: str, queries: list[dict] | None = None, mode: str = "full",
+                         concurrency: int = SCRAPER_CONCURRENCY, max_pages: int | None = None) -> dict:
+    """Exécute un parcours du site `site` : `queries` (ou sa recherche par défaut) réparties entre `concurrency` sessions."""
+    plugin = get_plugin(site)
+    work = asyncio.Queue()
+    for params in queries or [plugin.default_params]:
+        work.put_nowait(params)
+    limiter = RateLimiter(plugin.requests_per_minute)
+    seen = set()
+    results = await asyncio.gather(*(
+        run_plugin_session(browser, plugin, index, work, mode, max_pages or plugin.max_pages, limiter, seen)
+        for index in range(min(concurrency, work.qsize()))
+    ))
+    succeeded = sum(1 for result in results if result["status"] == "success")
+    # Attentes volontaires de toutes les sessions : temps du job passé hors réseau et hors base
+    waited = round(sum(result["behavior"]["waited_seconds"] for result in results), 2)
+    return {"status": "success" if succeeded else "error", "site": site, "waited_seconds": waited, "sessions": results}
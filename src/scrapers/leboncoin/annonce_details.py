@@ -1,31 +1,33 @@
+import asyncio
 import logging
 from datetime import datetime
-from playwright.sync_api import Page
+from playwright.async_api import Page
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse
 from src.database.realStateLbc import save_annonce_to_db, annonce_exists, RealStateLBCModel
-from playwright.sync_api import expect
+from playwright.async_api import expect
 from src.utils.human_behavior import human_like_delay_search
+from src.config.settings import NAVIGATION_TIMEOUT_MS
 
 logger = logging.getLogger(__name__)
 
-def scrape_annonce_details(page: Page, ad_url: str):
+async def scrape_annonce_details(page: Page, ad_url: str):
     """Scrape les détails d'une annonce sur Leboncoin et l'enregistre en base de données si elle n'existe pas encore."""
     try:
         # Attendre que la page soit complètement chargée
         title_element = page.locator("h1.text-headline-1-expanded.u-break-word")
-        expect(title_element).to_be_visible(timeout=60000)
-        human_like_delay_search(2, 3)
+        await expect(title_element).to_be_visible(timeout=NAVIGATION_TIMEOUT_MS)
+        await human_like_delay_search(2, 3)
         logger.info("✅ Annonce ouverte avec succès")
 
         # Si un bouton "Voir plus" est présent, cliquer dessus pour charger la description complète
         voir_plus_button = page.locator("div[data-qa-id='adview_description_container'] button")
-        if voir_plus_button.count() > 0:
-            voir_plus_button.first.click()
-            human_like_delay_search(2, 3)
+        if await voir_plus_button.count() > 0:
+            await voir_plus_button.first.click()
+            await human_like_delay_search(2, 3)
 
         # Extraction du contenu HTML et création d'un objet BeautifulSoup
-        html_content = page.content()
+        html_content = await page.content()
         soup = BeautifulSoup(html_content, "html.parser")
         logger.info("🔍 Extraction des détails de l'annonce...")
 
@@ -34,7 +36,7 @@ def scrape_annonce_details(page: Page, ad_url: str):
         annonce_id = parsed_url.path.split("/")[-1]
 
         # Vérification si l'annonce existe déjà en base
-        if annonce_exists(annonce_id):
+        if await asyncio.to_thread(annonce_exists, annonce_id):
             logger.info(f"🔁 L'annonce {annonce_id} existe déjà en base de données.")
             return None
 
@@ -166,7 +168,7 @@ def scrape_annonce_details(page: Page, ad_url: str):
         )
 
         # Enregistrement en base de données
-        save_annonce_to_db(annonce_data)
+        await asyncio.to_thread(save_annonce_to_db, annonce_data)
         logger.info(f"✅ Annonce enregistrée avec succès : {annonce_id}")
         
         return annonce_data
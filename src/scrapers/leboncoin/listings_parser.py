@@ -1,15 +1,20 @@
+import asyncio
 import logging
-from playwright.sync_api import Page, TimeoutError
-from src.utils.human_behavior import human_like_click_search, human_like_scroll_to_element, human_like_delay
-from src.database.realStateLbc import annonce_exists, save_annonce_to_db
-from src.database.realStateLbc import RealStateLBCModel
+import time
+from playwright.async_api import Page
+from src.utils.human_behavior import mark_api_path_available
+from src.database.models import AdRecord
+from src.database.realStateLbc import parse_surface, geo_point, price_per_m2
 from src.utils.b2_util import upload_image_to_b2
+from src.config.settings import NAVIGATION_TIMEOUT_MS, API_RESPONSE_TIMEOUT_MS, ADS_PER_PAGE
+from src.utils.tracing import traced
+from src.utils.metrics import PAGES_FETCHED, PAGE_CAPTURE_SECONDS, PAGE_CAPTURE_FAILURES
+from src.scrapers.leboncoin.search_parser import build_search_url
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 TARGET_API_URL = "https://api.leboncoin.fr/finder/search"
-total_scraped = 0
 
 def get_attr_by_label(ad: dict, label: str, default=None, get_values: bool = False):
     """Recherche dans ad["attributes"] un attribut dont key_label correspond à label."""
@@ -20,54 +25,99 @@ def get_attr_by_label(ad: dict, label: str, default=None, get_values: bool = Fal
             return attr.get("value_label", default)
     return default
 
-def wait_for_api_response(page: Page, context: str, timeout: int = 70000) -> dict | None:
-    """Attend et retourne la dernière réponse API contenant 'ads' en écoutant toutes les requêtes."""
+@traced()
+async def wait_for_api_response(page: Page, context: str, timeout: int = API_RESPONSE_TIMEOUT_MS, require_ads: bool = True) -> dict | None:
+    """Attend et retourne la dernière réponse API contenant 'ads' en écoutant toutes les requêtes.
+
+    Avec `require_ads=False`, toute réponse de recherche est acceptée (utile pour lire `total`).
+    """
     last_valid_response = None
     elapsed_time = 0
     interval = 1000  # Vérifier toutes les secondes
+    source = "api" if require_ads else "count"
+    started = time.perf_counter()
 
-    def on_response(response):
+    async def on_response(response):
         nonlocal last_valid_response
         if response.url.startswith(TARGET_API_URL) and response.status == 200:
             try:
-                json_response = response.json()
-                if "ads" in json_response and json_response["ads"]:
+                json_response = await response.json()
+                if ("ads" in json_response and json_response["ads"]) or (not require_ads and "total" in json_response):
                     last_valid_response = json_response
-                    logger.info(f"📡 {context}: API interceptée avec {len(json_response['ads'])} annonces : {response.url}")
+                    logger.info(f"📡 {context}: API interceptée avec {len(json_response.get('ads') or [])} annonces : {response.url}")
             except Exception as e:
                 logger.debug(f"⚠️ {context}: Erreur dans {response.url}: {e}")
 
     logger.debug(f"🔍 {context}: Début de l'écoute des réponses réseau...")
     page.on("response", on_response)
-    
-    # Attendre jusqu'à ce qu'une réponse valide soit trouvée ou que le timeout soit atteint
-    while elapsed_time < timeout:
-        if last_valid_response:
-            page.remove_listener("response", on_response)
-            logger.debug(f"🔍 {context}: Réponse valide trouvée, arrêt immédiat : {last_valid_response}")
-            return last_valid_response
-        page.wait_for_timeout(interval)
-        elapsed_time += interval
-    
-    logger.debug(f"🔍 {context}: Fin de l'écoute sans réponse valide après {timeout/1000} secondes.")
-    logger.warning(f"⚠️ {context}: Aucune réponse valide avec 'ads' après {timeout/1000} secondes.")
-    page.remove_listener("response", on_response)
-    return None
-
-def process_ad(ad: dict) -> None:
-    """Traite une annonce et l'enregistre dans la base de données."""
-    global total_scraped
-    annonce_id = str(ad.get("list_id"))
-    if annonce_exists(annonce_id):
-        logger.info(f"⏭ Annonce {annonce_id} déjà existante dans la base.")
-        return
-
-    logger.debug(f"📋 Traitement de l'annonce {annonce_id}...")
-    raw_images = ad.get("images", {}).get("urls", [])
-    bucketed_images = [upload_image_to_b2(url, "real_estate") for url in raw_images]
-
-    annonce_data = RealStateLBCModel(
-        id=annonce_id,
+    try:
+        # Attendre jusqu'à ce qu'une réponse valide soit trouvée ou que le timeout soit atteint
+        while elapsed_time < timeout:
+            if last_valid_response:
+                mark_api_path_available()
+                PAGES_FETCHED.labels(source).inc()
+                PAGE_CAPTURE_SECONDS.labels(source).observe(time.perf_counter() - started)
+                logger.debug(f"🔍 {context}: Réponse valide trouvée ({len(last_valid_response.get('ads') or [])} annonces), arrêt immédiat.")
+                return last_valid_response
+            await page.wait_for_timeout(interval)
+            elapsed_time += interval
+
+        logger.debug(f"🔍 {context}: Fin de l'écoute sans réponse valide après {timeout/1000} secondes.")
+        logger.warning(f"⚠️ {context}: Aucune réponse valide avec 'ads' après {timeout/1000} secondes.")
+        PAGE_CAPTURE_FAILURES.labels(source).inc()
+        return None
+    finally:
+        # Retiré aussi quand l'attente est annulée (lecture de __NEXT_DATA__ plus rapide)
+        page.remove_listener("response", on_response)
+
+def get_price(ad: dict) -> float | None:
+    price = ad.get("price", [None])[0] if isinstance(ad.get("price"), list) else ad.get("price")
+    return float(price) if price is not None else None
+
+def tracked_fields(ad: dict) -> dict:
+    """Valeurs des champs suivis (TRACKED_FIELDS), lues dans l'annonce brute avant tout traitement coûteux."""
+    return {
+        "price": get_price(ad),
+        "status": ad.get("status"),
+        "title": ad.get("subject"),
+        "description": ad.get("body"),
+        "surface": get_attr_by_label(ad, "Surface habitable"),
+        "nombreDepiece": get_attr_by_label(ad, "Nombre de pièces"),
+        "charges_incluses": get_attr_by_label(ad, "Charges incluses"),
+        "loyer_mensuel_charges": get_attr_by_label(ad, "Charges locatives"),
+        "depot_garantie": get_attr_by_label(ad, "Dépôt de garantie"),
+        "nbrImages": ad.get("images", {}).get("nb_images"),
+    }
+
+def rollup_observations(ad: dict, outcome: str, previous: dict | None) -> list[tuple[dict, int]]:
+    """Contributions d'une annonce aux statistiques pré-agrégées : ajout si nouvelle,
+    remplacement de l'ancienne valeur si son prix ou sa surface a changé."""
+    fields = tracked_fields(ad)
+    location = ad.get("location", {})
+    annonce = {
+        "departement_id": location.get("department_id"),
+        "city": location.get("city"),
+        "typeBien": get_attr_by_label(ad, "Type de bien"),
+        "publication_date": ad.get("first_publication_date"),
+        "price": fields["price"],
+        "price_m2": price_per_m2(fields["price"], parse_surface(fields["surface"])),
+    }
+    if outcome == "new":
+        return [(annonce, 1)]
+    if outcome != "changed" or not previous or previous.get("fingerprint") is None:
+        return []
+    if (previous.get("price"), previous.get("surface")) == (fields["price"], fields["surface"]):
+        return []
+    old_price = previous.get("price")
+    old_annonce = {**annonce, "price": old_price, "price_m2": price_per_m2(old_price, parse_surface(previous.get("surface")))}
+    return [(old_annonce, -1), (annonce, 1)]
+
+def annonce_values(ad: dict, fields: dict, fingerprint: str, images: list[str]) -> dict:
+    """Champs d'une nouvelle annonce (voir AD_FIELDS), `images` déjà transférées vers B2."""
+    now = datetime.utcnow()
+    surface_m2 = parse_surface(fields["surface"])
+    return dict(
+        id=str(ad.get("list_id")),
         publication_date=ad.get("first_publication_date"),
         index_date=ad.get("index_date"),
         expiration_date=ad.get("expiration_date"),
@@ -75,16 +125,17 @@ def process_ad(ad: dict) -> None:
         ad_type=ad.get("ad_type"),
         title=ad.get("subject"),
         description=ad.get("body"),
-        descrip=ad.get("body"),
         url=ad.get("url"),
         category_id=ad.get("category_id"),
         category_name=ad.get("category_name"),
-        price=(ad.get("price", [None])[0] if isinstance(ad.get("price"), list) else ad.get("price")),
+        price=fields["price"],
         nbrImages=ad.get("images", {}).get("nb_images"),
-        images=bucketed_images,
+        images=images,
         typeBien=get_attr_by_label(ad, "Type de bien"),
         meuble=get_attr_by_label(ad, "Ce bien est :"),
-        surface=get_attr_by_label(ad, "Surface habitable"),
+        surface=fields["surface"],
+        surface_m2=surface_m2,
+        price_m2=price_per_m2(fields["price"], surface_m2),
         nombreDepiece=get_attr_by_label(ad, "Nombre de pièces"),
         nombreChambres=get_attr_by_label(ad, "Nombre de chambres"),
         nombreSalleEau=get_attr_by_label(ad, "Nombre de salle d'eau"),
@@ -109,147 +160,73 @@ def process_ad(ad: dict) -> None:
         departement=ad.get("location", {}).get("department_name"),
         latitude=ad.get("location", {}).get("lat"),
         longitude=ad.get("location", {}).get("lng"),
+        location=geo_point(ad.get("location", {}).get("lat"), ad.get("location", {}).get("lng")),
         region_id=ad.get("location", {}).get("region_id"),
         departement_id=ad.get("location", {}).get("department_id"),
         agencename=ad.get("owner", {}).get("name"),
-        scraped_at=datetime.utcnow()
+        scraped_at=now,
+        fingerprint=fingerprint,
+        last_seen_at=now,
+        history=[{"at": now, "price": fields["price"], "status": fields["status"], "changed": []}],
     )
 
+async def build_annonce(ad: dict, fields: dict, fingerprint: str) -> AdRecord:
+    """Nouvelle annonce complète, images transférées vers B2."""
+    raw_images = ad.get("images", {}).get("urls", [])
+    # Transferts d'images en parallèle sur le transport HTTP commun (débit limité par hôte)
+    bucketed_images = list(await asyncio.gather(*(upload_image_to_b2(url, "real_estate") for url in raw_images)))
+    return AdRecord(**annonce_values(ad, fields, fingerprint, bucketed_images))
+
+async def read_ssr_search_data(page: Page, require_ads: bool = True) -> dict | None:
+    """Lit les annonces rendues côté serveur (__NEXT_DATA__) quand la page n'appelle pas l'API."""
     try:
-        save_annonce_to_db(annonce_data)
-        total_scraped += 1
-        logger.info(f"✅ Annonce enregistrée : {annonce_id} - Total extrait : {total_scraped}")
+        next_data = await page.evaluate("() => window.__NEXT_DATA__ || null")
+        search_data = (next_data or {}).get("props", {}).get("pageProps", {}).get("searchData")
+        if search_data and (search_data.get("ads") or (not require_ads and "total" in search_data)):
+            return search_data
     except Exception as e:
-        logger.error(f"❌ Erreur lors de l'enregistrement de {annonce_id} : {e}")
+        logger.debug(f"⚠️ __NEXT_DATA__ illisible : {e}")
+    return None
 
-def reload_filters_and_search(page: Page):
-    """Décocher puis recocher 'Maison' et cliquer sur 'Rechercher' pour forcer une nouvelle requête API."""
+async def goto_search_page(page: Page, params: dict, page_number: int, timeout: int = API_RESPONSE_TIMEOUT_MS) -> dict | None:
+    """Ouvre directement une page de résultats et retourne sa réponse API, sans repasser par les filtres."""
+    context = f"Page {page_number} (accès direct)"
+    started = time.perf_counter()
+    waiter = asyncio.create_task(wait_for_api_response(page, context, timeout=timeout))
     try:
-        logger.info("🔄 Rechargement des filtres pour forcer l'API...")
-        FILTRES_BTN = 'button[title="Afficher tous les filtres"]'
-        PRO_CHECKBOX = 'button[role="checkbox"][value="pro"]'
-        SEARCH_BTN = 'button[aria-label="Rechercher"]:visible'
-
-        # Ouvrir le dropdown des filtres
-        logger.info("🖱️ Clic sur 'Afficher tous les filtres'...")
-        filter_button = page.locator(FILTRES_BTN)
-        filter_button.wait_for(timeout=60000)
-        human_like_click_search(page, FILTRES_BTN, click_delay=0.7, move_cursor=True)
-        human_like_delay(1, 2)
-
-        # Décocher "Pro"
-        logger.info("📜 Décochage du filtre 'Pro'...")
-        maison_button = page.locator(PRO_CHECKBOX)
-        maison_button.wait_for(state="visible", timeout=10000)
-        human_like_scroll_to_element(page, maison_button, scroll_steps=4, jitter=True)
-        maison_button.click()  # Premier clic pour décocher
-        human_like_delay(1, 2)
-
-        # Recocher "Maison"
-        logger.info("📜 Recochage du filtre 'Maison'...")
-        maison_button = page.locator('button[role="checkbox"][value="pro"]')
-        maison_button.wait_for(state="visible", timeout=10000)
-        human_like_click_search(page, 'button[role="checkbox"][value="pro"]', click_delay=0.5, move_cursor=True)
-        human_like_delay(1, 2)
-
-        # Cliquer sur "Rechercher"
-        logger.info("🔄 Clic sur 'Rechercher' pour recharger l'API...")
-        search_button = page.locator(SEARCH_BTN)
-        search_button.wait_for(timeout=60000)
-        human_like_click_search(page, SEARCH_BTN, click_delay=0.5, move_cursor=True)
-        human_like_delay(2, 4)
-
-        return True
+        await page.goto(build_search_url(params, page_number), timeout=NAVIGATION_TIMEOUT_MS)
+        ssr_response = await read_ssr_search_data(page)
+        if ssr_response:
+            waiter.cancel()
+            PAGES_FETCHED.labels("ssr").inc()
+            PAGE_CAPTURE_SECONDS.labels("ssr").observe(time.perf_counter() - started)
+            logger.info(f"📄 {context}: {len(ssr_response['ads'])} annonces lues dans __NEXT_DATA__.")
+            return ssr_response
+        return await waiter
     except Exception as e:
-        logger.error(f"❌ Erreur lors du rechargement des filtres : {e}")
-        return False
-
-def scrape_listings_via_api(page: Page) -> None:
-    """Scrape les annonces des pages 1 à 5 en interceptant l'API."""
-    global total_scraped
-    current_page = 1
-    MAX_PAGES = 5
-    MAX_RETRIES = 3
+        waiter.cancel()
+        logger.error(f"⚠️ {context}: navigation impossible : {e}")
+        return None
 
-    # Attendre le bouton "Rechercher"
+async def count_search_results(page: Page, params: dict, timeout: int = 30000) -> int | None:
+    """Retourne le nombre total d'annonces d'une recherche (None si la page n'a pas pu être lue)."""
+    waiter = asyncio.create_task(wait_for_api_response(page, "Comptage", timeout=timeout, require_ads=False))
     try:
-        expect_search = page.locator('button[aria-label="Rechercher"]:visible')
-        expect_search.wait_for(timeout=60000)
-    except TimeoutError:
-        logger.error("❌ Bouton 'Rechercher' non trouvé.")
-        return
-
-    # Page 1 : Utiliser l'API
-    logger.info("🔄 Clic sur 'Rechercher' pour charger la page 1...")
-    human_like_click_search(page, 'button[aria-label="Rechercher"]:visible', move_cursor=True, click_delay=0.5)
-    response = wait_for_api_response(page, "Page 1", timeout=70000)
-
-    if response and "ads" in response and response["ads"]:
-        logger.info(f"✅ Page 1: {len(response['ads'])} annonces interceptées via API.")
-        for ad in response["ads"]:
-            process_ad(ad)
-    else:
-        logger.warning("⚠️ Page 1: Aucune réponse avec annonces via API. Rechargement des filtres...")
-        if reload_filters_and_search(page):
-            response = wait_for_api_response(page, "Page 1 (après rechargement)", timeout=70000)
-            if response and "ads" in response and response["ads"]:
-                logger.info(f"✅ Page 1: {len(response['ads'])} annonces interceptées via API après rechargement.")
-                for ad in response["ads"]:
-                    process_ad(ad)
-            else:
-                logger.error("❌ Échec du scraping de la page 1 même après rechargement.")
-                return
-        else:
-            logger.error("❌ Échec du rechargement des filtres pour la page 1.")
-            return
-
-    # Pagination : Pages 2 à 5
-    while current_page < MAX_PAGES:
-        retries = 0
-        next_button = page.locator('a[aria-label="Page suivante"]')
-        if not next_button.is_visible(timeout=5000):
-            logger.info(f"🏁 Fin de la pagination à la page {current_page}.")
-            break
-
-        while retries < MAX_RETRIES:
-            logger.info(f"🌀 Passage à la page {current_page + 1} (Tentative {retries + 1}/{MAX_RETRIES})...")
-            try:
-                human_like_scroll_to_element(page, next_button, scroll_steps=2, jitter=True)
-                human_like_click_search(page, 'a[aria-label="Page suivante"]', move_cursor=True, click_delay=0.5)
-                response = wait_for_api_response(page, f"Page {current_page + 1}", timeout=70000)
-
-                if response and "ads" in response and response["ads"]:
-                    logger.info(f"✅ Page {current_page + 1}: {len(response['ads'])} annonces interceptées via API.")
-                    for ad in response["ads"]:
-                        process_ad(ad)
-                    break
-                else:
-                    logger.warning(f"⚠️ Page {current_page + 1}: Aucune réponse avec annonces via API. Rechargement des filtres...")
-                    if reload_filters_and_search(page):
-                        response = wait_for_api_response(page, f"Page {current_page + 1} (après rechargement)", timeout=70000)
-                        if response and "ads" in response and response["ads"]:
-                            logger.info(f"✅ Page {current_page + 1}: {len(response['ads'])} annonces interceptées via API après rechargement.")
-                            for ad in response["ads"]:
-                                process_ad(ad)
-                            break
-                        else:
-                            logger.warning(f"⚠️ Échec après rechargement, nouvelle tentative...")
-                            retries += 1
-                            human_like_delay(1, 3)
-                    else:
-                        logger.error(f"❌ Échec du rechargement des filtres pour la page {current_page + 1}.")
-                        retries += 1
-                        human_like_delay(1, 3)
-            except Exception as e:
-                logger.error(f"⚠️ Erreur lors de la navigation vers page {current_page + 1}: {e}")
-                retries += 1
-                human_like_delay(1, 3)
-
-        if retries >= MAX_RETRIES:
-            logger.error(f"❌ Page {current_page + 1}: Échec après {MAX_RETRIES} tentatives, arrêt.")
-            break
-
-        current_page += 1
-        human_like_delay(2, 4)
-
-    logger.info(f"🏁 Scraping terminé - Total annonces extraites : {total_scraped}")
+        await page.goto(build_search_url(params), timeout=NAVIGATION_TIMEOUT_MS)
+        search_data = await read_ssr_search_data(page, require_ads=False) or await waiter
+    except Exception as e:
+        logger.error(f"⚠️ Comptage impossible pour {params}: {e}")
+        search_data = None
+    finally:
+        waiter.cancel()
+    if not search_data or search_data.get("total") is None:
+        return None
+    return int(search_data["total"])
+
+def is_last_page(response: dict | None, page_number: int) -> bool:
+    """La réponse de l'API est la dernière page de la recherche : page incomplète ou total couvert."""
+    if not response:
+        return False
+    ads = response.get("ads") or []
+    total = response.get("total")
+    return len(ads) < ADS_PER_PAGE or (total is not None and page_number * ADS_PER_PAGE >= int(total))
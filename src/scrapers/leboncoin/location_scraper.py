@@ -1,66 +1,126 @@
+import asyncio
 import logging
-import time
 import multiprocessing
-from src.config.browser_config import setup_browser
-from src.scrapers.leboncoin.search_parser import (
-    close_cookies_popup, wait_for_page_load,
-    navigate_to_locations, apply_filters
-)
-from src.scrapers.leboncoin.listings_parser import scrape_listings_via_api
-
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+import platform
+from playwright.async_api import async_playwright, Browser
+from src.config.browser_config import launch_browser, create_context, install_resource_policy
+from src.config.settings import SCRAPER_CONCURRENCY
+from src.config.logging_config import setup_logging
+from src.scrapers.engine import run_plugin_job
+from src.scrapers.plugin import get_plugin
+from src.database.crawl_state import save_shard_plan, load_shard_plan
+from src.scrapers.leboncoin.listings_parser import count_search_results
+from src.scrapers.leboncoin.sharding import plan_shards, shard_queries
+from src.utils.human_behavior import start_behavior_session
+from src.utils.metrics import mark_process_dead
+
 logger = logging.getLogger(__name__)
 
-def open_leboncoin():
-    """Ouvre Leboncoin avec Playwright et un proxy IP Royal dans un processus séparé."""
-    logger.info("🚀 Démarrage du navigateur Playwright avec IP Royal...")
+async def open_session_page(browser: Browser, session_index: int):
+    """Crée un contexte dédié, ouvre l'accueil mobile et ferme la popup des cookies."""
+    context = await create_context(browser)
+    route_stats = await install_resource_policy(context)
+    behavior = start_behavior_session()
+    page = await context.new_page()
+
+    logger.info(f"🌍 [Session {session_index}] Accès à https://mobile.leboncoin.fr/ ...")
+    await get_plugin("leboncoin").bootstrap_session(page)
+    return context, page, behavior, route_stats
+
+async def close_session(context, session_index: int, behavior):
+    report = behavior.report()
+    logger.info(
+        f"⏱️ [Session {session_index}] Attentes volontaires ({report['profile']}) : "
+        f"{report['waited_seconds']}s sur {report['waits']} pauses, "
+        f"{report['skipped_cosmetic']} actions décoratives ignorées"
+    )
+    await context.close()
+
+async def plan_leboncoin_shards(browser: Browser, concurrency: int = SCRAPER_CONCURRENCY) -> list[dict]:
+    """Calcule et enregistre le plan de shards en comptant les résultats avec `concurrency` pages."""
+    sessions = [await open_session_page(browser, index) for index in range(concurrency)]
+    pages = asyncio.Queue()
+    for _, page, _, _ in sessions:
+        pages.put_nowait(page)
+
+    async def count_with_pool(params: dict):
+        page = await pages.get()
+        try:
+            return await count_search_results(page, params)
+        finally:
+            pages.put_nowait(page)
 
     try:
-        browser, context = setup_browser()
-
-        if browser is None or context is None:
-            logger.error("⚠️ ERREUR: Impossible d'ouvrir le navigateur, vérifiez `setup_browser()`.")
+        shard_plan = await plan_shards(count_with_pool, concurrency=concurrency)
+        await asyncio.to_thread(save_shard_plan, shard_plan)
+        return shard_plan
+    finally:
+        for index, (context, _, behavior, _) in enumerate(sessions):
+            await close_session(context, index, behavior)
+
+async def run_leboncoin_job(browser: Browser, concurrency: int = SCRAPER_CONCURRENCY, mode: str = "full",
+                            sharded: bool = False, plan: bool = False, shards: list[dict] | None = None):
+    """Exécute un scraping sur un navigateur déjà lancé, avec `concurrency` contextes.
+
+    `plan` recalcule le plan de shards ; `sharded` répartit les shards du dernier plan entre les contextes ;
+    `shards` restreint le parcours à une liste de shards donnée. Les recherches passent par le moteur
+    commun (src/scrapers/engine.py) avec le plugin Leboncoin.
+    """
+    if plan:
+        shard_plan = await plan_leboncoin_shards(browser, concurrency)
+        return {"status": "success", "shards": len(shard_plan)}
+
+    queries = None
+    if shards:
+        queries = shard_queries(shards)
+    elif sharded:
+        shard_plan = await asyncio.to_thread(load_shard_plan)
+        if not shard_plan:
+            return {"status": "error", "message": "Aucun plan de shards, lancez d'abord la planification"}
+        queries = shard_queries(shard_plan)
+    elif concurrency > 1:
+        # Une seule recherche à parcourir : plusieurs contextes feraient le même travail sur le même état
+        logger.info(f"ℹ️ Recherche non découpée : un seul contexte au lieu de {concurrency}.")
+    return await run_plugin_job(browser, "leboncoin", queries, mode, concurrency)
+
+async def open_leboncoin(concurrency: int = SCRAPER_CONCURRENCY, mode: str = "full", sharded: bool = False,
+                         plan: bool = False, shards: list[dict] | None = None):
+    """Ouvre Leboncoin avec Playwright et pilote `concurrency` contextes sur une même boucle d'événements."""
+    logger.info(f"🚀 Démarrage du navigateur Playwright avec IP Royal ({concurrency} contexte(s))...")
+
+    async with async_playwright() as playwright:
+        try:
+            browser = await launch_browser(playwright)
+        except Exception as e:
+            logger.error(f"❌ Erreur lors du lancement du navigateur : {e}")
+            browser = None
+
+        if browser is None:
+            logger.error("⚠️ ERREUR: Impossible d'ouvrir le navigateur, vérifiez `launch_browser()`.")
             return {"status": "error", "message": "Impossible d'ouvrir le navigateur"}
 
-        page = context.new_page()
-
-        logger.info("🌍 Accès à https://mobile.leboncoin.fr/ ...")
-        page.goto("https://mobile.leboncoin.fr/", timeout=60000)
-
-        # Attendre le chargement complet de la page
-        wait_for_page_load(page)
-
-        # Fermer la popup des cookies
-        close_cookies_popup(page)
-
-        # Naviguer vers Locations
-        navigate_to_locations(page)
-
-        # Appliquer les filtres
-        apply_filters(page)
-
-        # Extraire les annonces
-        # scrape_listings_via_api(page)
-        scrape_listings_via_api(page)
-
-
-        # # Lancer la recherche
-
-        title = page.title()
-        logger.info(f"✅ Page ouverte - Titre : {title}")
-
-        # Maintenir le navigateur ouvert pour test
-        time.sleep(60)
-
-        return {"status": "success", "title": title}
-
-    except Exception as e:
-        logger.error(f"⚠️ Erreur lors de l'accès à Leboncoin : {e}")
-        return {"status": "error", "message": str(e)}
-
-def access_leboncoin():
-    """Lance Playwright dans un processus séparé et attend indéfiniment la fin du scraping."""
-    process = multiprocessing.Process(target=open_leboncoin)
+        try:
+            return await run_leboncoin_job(browser, concurrency, mode, sharded, plan, shards)
+        finally:
+            await browser.close()
+
+def run_leboncoin(concurrency: int = SCRAPER_CONCURRENCY, mode: str = "full", sharded: bool = False,
+                  plan: bool = False, shards: list[dict] | None = None):
+    """Point d'entrée synchrone du processus de scraping."""
+    setup_logging()
+    if platform.system() == "Windows":
+        # Playwright a besoin de la boucle Proactor pour lancer ses sous-processus
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    return asyncio.run(open_leboncoin(concurrency, mode, sharded, plan, shards))
+
+def access_leboncoin(concurrency: int = SCRAPER_CONCURRENCY, mode: str = "full", sharded: bool = False,
+                     plan: bool = False, shards: list[dict] | None = None):
+    """Lance Playwright dans un processus séparé et attend indéfiniment la fin du scraping.
+
+    Exécution locale ponctuelle : l'API et le planificateur passent par la file de jobs (`src.workers.worker`).
+    """
+    process = multiprocessing.Process(target=run_leboncoin, args=(concurrency, mode, sharded, plan, shards))
     process.start()
     process.join()  # Attend la fin du processus sans timeout
+    mark_process_dead(process.pid)
     return {"status": "success", "message": "Scraping terminé."}
@@ -0,0 +1,59 @@
+from playwright.async_api import Page
+from src.config.settings import SHARD_MAX_PAGES, NAVIGATION_TIMEOUT_MS
+from src.database.realStateLbc import compute_fingerprint
+from src.scrapers.plugin import ScraperPlugin, register_plugin
+from src.scrapers.leboncoin.listings_parser import (
+    goto_search_page, tracked_fields, build_annonce, rollup_observations, is_last_page
+)
+from src.scrapers.leboncoin.search_parser import (
+    DEFAULT_SEARCH_PARAMS, INCREMENTAL_SORT_PARAMS, search_query_key, wait_for_page_load, close_cookies_popup
+)
+
+
+@register_plugin
+class LeboncoinPlugin(ScraperPlugin):
+    """Leboncoin sur le moteur commun : pages de résultats ouvertes par URL (API finder/search ou __NEXT_DATA__)."""
+
+    name = "leboncoin"
+    collection = "realStateLbc"
+    home_url = "https://mobile.leboncoin.fr/"
+    default_params = DEFAULT_SEARCH_PARAMS
+    max_pages = SHARD_MAX_PAGES
+
+    async def bootstrap_session(self, page: Page):
+        await page.goto(self.home_url, timeout=NAVIGATION_TIMEOUT_MS)
+        await wait_for_page_load(page)
+        await close_cookies_popup(page)
+
+    async def fetch_search_page(self, page: Page, params: dict, page_number: int) -> dict | None:
+        return await goto_search_page(page, params, page_number)
+
+    def is_last_page(self, response: dict, page_number: int) -> bool:
+        return is_last_page(response, page_number)
+
+    def ad_id(self, raw: dict) -> str:
+        return str(raw.get("list_id"))
+
+    def publication_date(self, raw: dict) -> str | None:
+        return raw.get("first_publication_date")
+
+    def tracked_fields(self, raw: dict) -> dict:
+        return tracked_fields(raw)
+
+    async def normalize_ad(self, raw: dict, fields: dict, detail: dict | None = None) -> dict:
+        annonce = await build_annonce(raw, fields, compute_fingerprint(fields))
+        return annonce.to_document()
+
+    def departement_id(self, raw: dict) -> str | None:
+        return raw.get("location", {}).get("department_id")
+
+    def rollup_observations(self, raw: dict, outcome: str, previous: dict | None) -> list[tuple[dict, int]]:
+        return rollup_observations(raw, outcome, previous)
+
+    def search_params(self, params: dict, mode: str) -> dict:
+        # Le mode incrémental trie par date de publication : les nouveautés arrivent en premier
+        return {**params, **INCREMENTAL_SORT_PARAMS} if mode == "incremental" else params
+
+    def query_key(self, params: dict) -> str:
+        # Clés de search_parser : plan de shards, reprise, présence et balayage d'expiration partagent les mêmes
+        return search_query_key(params)
@@ -0,0 +1,23 @@
+import hashlib
+import json
+from urllib.parse import urlencode
+
+SEARCH_BASE_URL = "https://www.leboncoin.fr/recherche"
+
+# Recherche obtenue par navigate_to_locations + apply_filters : locations, maisons et appartements, professionnels
+DEFAULT_SEARCH_PARAMS = {"category": "10", "real_estate_type": "1,2", "owner_type": "pro"}
+
+# Tri des résultats du plus récent au plus ancien, utilisé par le mode incrémental
+INCREMENTAL_SORT_PARAMS = {"sort": "time", "order": "desc"}
+
+def build_search_url(params: dict, page_number: int = 1) -> str:
+    """Construit l'URL de recherche correspondant aux paramètres, pour une page donnée."""
+    query = dict(params)
+    if page_number > 1:
+        query["page"] = str(page_number)
+    return f"{SEARCH_BASE_URL}?{urlencode(query, safe=',-')}"
+
+def search_query_key(params: dict) -> str:
+    """Identifiant stable d'une recherche, indépendant de l'ordre des paramètres."""
+    canonical = json.dumps({k: str(v) for k, v in params.items()}, sort_keys=True)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:16]
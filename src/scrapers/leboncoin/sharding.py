@@ -0,0 +1,210 @@
+import asyncio
+import logging
+from dataclasses import dataclass, replace
+from typing import Awaitable, Callable
+from src.config.settings import SHARD_RESULT_CAP
+from src.scrapers.leboncoin.search_params import DEFAULT_SEARCH_PARAMS, search_query_key
+
+logger = logging.getLogger(__name__)
+
+# Régions Leboncoin (identifiants `region_id` de l'API) et leurs départements (`department_id`)
+LEBONCOIN_REGIONS = {
+    "1": ["67", "68"],                                      # Alsace
+    "2": ["24", "33", "40", "47", "64"],                    # Aquitaine
+    "3": ["3", "15", "43", "63"],                           # Auvergne
+    "4": ["14", "50", "61"],                                # Basse-Normandie
+    "5": ["21", "58", "71", "89"],                          # Bourgogne
+    "6": ["22", "29", "35", "56"],                          # Bretagne
+    "7": ["18", "28", "36", "37", "41", "45"],              # Centre
+    "8": ["8", "10", "51", "52"],                           # Champagne-Ardenne
+    "9": ["20"],                                            # Corse
+    "10": ["25", "39", "70", "90"],                         # Franche-Comté
+    "11": ["27", "76"],                                     # Haute-Normandie
+    "12": ["75", "77", "78", "91", "92", "93", "94", "95"], # Ile-de-France
+    "13": ["11", "30", "34", "48", "66"],                   # Languedoc-Roussillon
+    "14": ["19", "23", "87"],                               # Limousin
+    "15": ["54", "55", "57", "88"],                         # Lorraine
+    "16": ["9", "12", "31", "32", "46", "65", "81", "82"],  # Midi-Pyrénées
+    "17": ["59", "62"],                                     # Nord-Pas-de-Calais
+    "18": ["44", "49", "53", "72", "85"],                   # Pays de la Loire
+    "19": ["2", "60", "80"],                                # Picardie
+    "20": ["16", "17", "79", "86"],                         # Poitou-Charentes
+    "21": ["4", "5", "6", "13", "83", "84"],                # Provence-Alpes-Côte d'Azur
+    "22": ["1", "7", "26", "38", "42", "69", "73", "74"],   # Rhône-Alpes
+    "23": ["971"],                                          # Guadeloupe
+    "24": ["972"],                                          # Martinique
+    "25": ["973"],                                          # Guyane
+    "26": ["974"],                                          # Réunion
+}
+
+# Premier découpage d'un département : tranches de loyer (€), puis de surface (m²), semi-ouvertes
+# [low, high) et contiguës pour couvrir toute la droite (19,5 m², 499,5 €). Leboncoin inclut les deux
+# bornes d'un filtre : la recherche "500-800" renvoie aussi les annonces à 800 €, parcourues par deux
+# shards mais rattachées au seul shard [800, 1100) pour l'expiration (voir shard_filter)
+PRICE_BANDS = [(0, 500), (500, 800), (800, 1100), (1100, 1500), (1500, 2500), (2500, None)]
+SURFACE_BANDS = [(0, 20), (20, 35), (35, 50), (50, 70), (70, 100), (100, 150), (150, None)]
+
+# Largeurs minimales en dessous desquelles une tranche n'est plus coupée en deux
+MIN_PRICE_WIDTH = 25
+MIN_SURFACE_WIDTH = 5
+
+
+@dataclass(frozen=True)
+class Shard:
+    """Sous-ensemble de la recherche : zone géographique, tranche de prix et tranche de surface."""
+    region_id: str | None = None
+    departement_id: str | None = None
+    price: tuple[int, int | None] | None = None
+    surface: tuple[int, int | None] | None = None
+
+    def search_params(self, base_params: dict = DEFAULT_SEARCH_PARAMS) -> dict:
+        params = dict(base_params)
+        if self.departement_id:
+            params["locations"] = f"d_{self.departement_id}"
+        elif self.region_id:
+            params["locations"] = f"r_{self.region_id}"
+        if self.price:
+            params["price"] = _format_range(self.price)
+        if self.surface:
+            params["square"] = _format_range(self.surface)
+        return params
+
+    def key(self, base_params: dict = DEFAULT_SEARCH_PARAMS) -> str:
+        return search_query_key(self.search_params(base_params))
+
+    def label(self) -> str:
+        parts = [f"d_{self.departement_id}" if self.departement_id else f"r_{self.region_id}" if self.region_id else "france"]
+        if self.price:
+            parts.append(f"prix {_format_range(self.price)}")
+        if self.surface:
+            parts.append(f"surface {_format_range(self.surface)}")
+        return " / ".join(parts)
+
+
+def _format_range(bounds: tuple[int, int | None]) -> str:
+    low, high = bounds
+    return f"{low}-{high if high is not None else 'max'}"
+
+def _bisect(bounds: tuple[int, int | None], min_width: int) -> list[tuple[int, int | None]]:
+    """Coupe une tranche [low, high) en deux moitiés contiguës ; une tranche ouverte est coupée à deux fois sa borne basse."""
+    low, high = bounds
+    if high is None:
+        middle = max(low * 2, low + min_width * 4)
+        return [(low, middle), (middle, None)]
+    if high - low < 2 * min_width:
+        return []
+    middle = (low + high) // 2
+    return [(low, middle), (middle, high)]
+
+def subdivide(shard: Shard) -> list[Shard]:
+    """Découpe un shard trop volumineux selon la dimension suivante (région → département → prix → surface)."""
+    if shard.departement_id is None and shard.region_id is not None:
+        return [replace(shard, departement_id=d) for d in LEBONCOIN_REGIONS.get(shard.region_id, [])]
+    if shard.departement_id is None:
+        return [Shard(region_id=region_id) for region_id in LEBONCOIN_REGIONS]
+    if shard.price is None:
+        return [replace(shard, price=band) for band in PRICE_BANDS]
+    price_halves = _bisect(shard.price, MIN_PRICE_WIDTH) if shard.surface is None else []
+    if price_halves:
+        return [replace(shard, price=band) for band in price_halves]
+    if shard.surface is None:
+        return [replace(shard, surface=band) for band in SURFACE_BANDS]
+    return [replace(shard, surface=band) for band in _bisect(shard.surface, MIN_SURFACE_WIDTH)]
+
+def _parse_range(value: str | None) -> tuple[float, float | None] | None:
+    """Tranche "low-high" ou "low-max" des paramètres de recherche → bornes [low, high)."""
+    if not value:
+        return None
+    low, _, high = str(value).partition("-")
+    return float(low or 0), None if high in ("", "max") else float(high)
+
+def _parse_location(value: str | None) -> tuple[str, str] | None:
+    """"d_75" → ("departement_id", "75"), "r_12" → ("region_id", "12")."""
+    if not value:
+        return None
+    kind, _, identifier = str(value).partition("_")
+    return ("departement_id" if kind == "d" else "region_id", identifier)
+
+def _departements(location: tuple[str, str] | None) -> set[str] | None:
+    if location is None:
+        return None
+    field, identifier = location
+    return {identifier} if field == "departement_id" else set(LEBONCOIN_REGIONS.get(identifier, []))
+
+def _ranges_overlap(a: tuple | None, b: tuple | None) -> bool:
+    if a is None or b is None:
+        return True
+    (a_low, a_high), (b_low, b_high) = a, b
+    return (a_high is None or b_low < a_high) and (b_high is None or a_low < b_high)
+
+def shard_filter(params: dict) -> dict:
+    """Filtre MongoDB des annonces couvertes par une recherche (zone, loyer, surface)."""
+    query = {}
+    location = _parse_location(params.get("locations"))
+    if location:
+        query[location[0]] = location[1]
+    for param, field in (("price", "price"), ("square", "surface_m2")):
+        bounds = _parse_range(params.get(param))
+        if bounds:
+            low, high = bounds
+            query[field] = {"$gte": low, **({"$lt": high} if high is not None else {})}
+    return query
+
+def shards_overlap(a: dict, b: dict) -> bool:
+    """Deux recherches peuvent-elles renvoyer une même annonce ?"""
+    a_deps = _departements(_parse_location(a.get("locations")))
+    b_deps = _departements(_parse_location(b.get("locations")))
+    if a_deps is not None and b_deps is not None and not a_deps & b_deps:
+        return False
+    return all(_ranges_overlap(_parse_range(a.get(p)), _parse_range(b.get(p))) for p in ("price", "square"))
+
+async def plan_shards(
+    count_results: Callable[[dict], Awaitable[int | None]],
+    base_params: dict = DEFAULT_SEARCH_PARAMS,
+    cap: int = SHARD_RESULT_CAP,
+    concurrency: int = 1,
+) -> list[dict]:
+    """Construit la liste des shards dont le volume tient sous `cap`, en subdivisant adaptativement.
+
+    `count_results` reçoit les paramètres de recherche d'un shard et retourne son nombre total
+    d'annonces (None si le comptage a échoué : le shard est alors conservé tel quel).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    planned = []
+
+    async def count(shard: Shard):
+        async with semaphore:
+            return shard, await count_results(shard.search_params(base_params))
+
+    frontier = [Shard(region_id=region_id) for region_id in LEBONCOIN_REGIONS]
+    while frontier:
+        next_frontier = []
+        for shard, total in await asyncio.gather(*(count(shard) for shard in frontier)):
+            if total is not None and total <= cap:
+                if total > 0:
+                    planned.append({"shard": shard, "total": total})
+                continue
+            children = subdivide(shard) if total is not None else []
+            if not children:
+                if total is not None:
+                    logger.warning(f"⚠️ Shard {shard.label()} indivisible malgré {total} annonces (plafond {cap}).")
+                planned.append({"shard": shard, "total": total})
+                continue
+            logger.info(f"✂️ Shard {shard.label()} : {total} annonces > {cap}, découpage en {len(children)}.")
+            next_frontier.extend(children)
+        frontier = next_frontier
+
+    logger.info(f"🗺️ Plan de shards : {len(planned)} requêtes pour {sum(p['total'] or 0 for p in planned)} annonces.")
+    return [
+        {
+            "key": item["shard"].key(base_params),
+            "label": item["shard"].label(),
+            "params": item["shard"].search_params(base_params),
+            "total": item["total"],
+        }
+        for item in planned
+    ]
+
+def shard_queries(shard_plan: list[dict]) -> list[dict]:
+    """Recherches des shards, les plus volumineuses en premier pour équilibrer les sessions."""
+    return [item["params"] for item in sorted(shard_plan, key=lambda item: item["total"] or 0, reverse=True)]
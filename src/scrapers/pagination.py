@@ -0,0 +1,102 @@
+import logging
+import math
+from typing import Callable
+from src.config.settings import ADS_PER_PAGE, PAGINATION_MAX_REPEATS, PAGINATION_MAX_REFETCH
+
+logger = logging.getLogger(__name__)
+
+# 🔹 Suivi des identifiants d'une recherche d'une page à l'autre. Les résultats bougent pendant
+# le parcours : une annonce publiée en tête repousse la fin de chaque page sur la suivante
+# (doublons), une annonce retirée remonte le début de la page suivante sur la précédente
+# (annonces manquées). Le total renvoyé avec chaque page mesure ce décalage :
+#   - total en hausse : les annonces déjà vues qui reviennent sont écartées ;
+#   - total en baisse de n : les n annonces ont glissé sur la ou les pages précédentes,
+#     seules ces pages sont re-parcourues (PAGINATION_MAX_REFETCH au plus) ;
+#   - pages sans aucune annonce nouvelle (PAGINATION_MAX_REPEATS d'affilée) : le site renvoie
+#     la même fenêtre, inutile de continuer.
+# Commun à tous les sites : l'identifiant d'une annonce est fourni par l'appelant (plugin.ad_id…).
+#   tracker = PaginationTracker(lambda ad: str(ad["list_id"]))
+#   window = tracker.observe(page_number, response)
+#   for gap_page in window.gap_pages:
+#       window.fresh += tracker.observe_refetch(gap_page, await fetch(gap_page))
+
+
+class PageWindow:
+    """Résultat de l'observation d'une page de résultats."""
+
+    __slots__ = ("page_number", "fresh", "duplicates", "shift", "gap_pages")
+
+    def __init__(self, page_number: int, fresh: list[dict], duplicates: int, shift: int, gap_pages: list[int]):
+        self.page_number = page_number
+        self.fresh = fresh              # Annonces jamais vues dans cette recherche, dans l'ordre de la page
+        self.duplicates = duplicates    # Annonces déjà vues (chevauchement avec les pages précédentes)
+        self.shift = shift              # Baisse du total depuis la page précédente (annonces remontées)
+        self.gap_pages = gap_pages      # Pages à re-parcourir pour récupérer les annonces remontées
+
+
+class PaginationTracker:
+    """Identifiants vus et total de la recherche au fil des pages d'un parcours."""
+
+    def __init__(self, ad_id: Callable[[dict], str], page_size: int = ADS_PER_PAGE):
+        self.ad_id = ad_id
+        self.page_size = page_size
+        self.seen: set[str] = set()
+        self.total: int | None = None
+        self.repeats = 0
+        self.refetched: set[int] = set()
+        self.stats = {"pages": 0, "duplicates": 0, "refetched": 0, "recovered": 0}
+
+    def _fresh(self, ads: list[dict]) -> list[dict]:
+        fresh = []
+        for ad in ads:
+            ad_id = self.ad_id(ad)
+            if ad_id not in self.seen:
+                self.seen.add(ad_id)
+                fresh.append(ad)
+        return fresh
+
+    def _update_total(self, response: dict) -> int:
+        """Enregistre le total de la réponse ; retourne sa baisse depuis la réponse précédente."""
+        total = response.get("total")
+        if total is None:
+            return 0
+        shift = self.total - int(total) if self.total is not None else 0
+        self.total = int(total)
+        return max(shift, 0)
+
+    def observe(self, page_number: int, response: dict) -> PageWindow:
+        ads = response.get("ads") or []
+        fresh = self._fresh(ads)
+        shift = self._update_total(response)
+        self.repeats = self.repeats + 1 if ads and not fresh else 0
+        self.stats["pages"] += 1
+        self.stats["duplicates"] += len(ads) - len(fresh)
+
+        gap_pages = []
+        if shift and page_number > 1:
+            span = min(math.ceil(shift / self.page_size), PAGINATION_MAX_REFETCH)
+            gap_pages = [number for number in range(max(page_number - span, 1), page_number) if number not in self.refetched]
+            logger.info(f"↕️ Page {page_number} : {shift} annonce(s) retirée(s) depuis la page précédente, "
+                        f"pages {gap_pages} re-parcourues.")
+        elif len(ads) > len(fresh):
+            logger.debug(f"↕️ Page {page_number} : {len(ads) - len(fresh)} annonce(s) déjà vue(s) écartée(s).")
+        return PageWindow(page_number, fresh, len(ads) - len(fresh), shift, gap_pages)
+
+    def observe_refetch(self, page_number: int, response: dict) -> list[dict]:
+        """Annonces nouvelles d'une page re-parcourue (celles qui avaient glissé hors de la fenêtre)."""
+        self.refetched.add(page_number)
+        self._update_total(response)
+        fresh = self._fresh(response.get("ads") or [])
+        self.stats["refetched"] += 1
+        self.stats["recovered"] += len(fresh)
+        if fresh:
+            logger.info(f"🧩 Page {page_number} re-parcourue : {len(fresh)} annonce(s) récupérée(s).")
+        return fresh
+
+    @property
+    def exhausted(self) -> bool:
+        """Plusieurs pages d'affilée sans annonce nouvelle : la suite de la recherche se répète."""
+        return self.repeats >= PAGINATION_MAX_REPEATS
+
+    def report(self) -> dict:
+        return {**self.stats, "unique_ads": len(self.seen)}
@@ -0,0 +1,101 @@
+import hashlib
+import importlib
+import json
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+from src.config.settings import NAVIGATION_TIMEOUT_MS, PLUGIN_NORMALIZE_CONCURRENCY
+
+if TYPE_CHECKING:  # Playwright n'est chargé que par les workers
+    from playwright.async_api import Page
+
+# 🔹 Interface des scrapers de sites. Un plugin ne contient que ce qui est propre à son site :
+# ouverture de session, lecture d'une page de résultats, normalisation d'une annonce et,
+# si besoin, récupération de son détail. Pool de contextes, limitation de débit, dédoublonnage,
+# suivi des changements et écritures groupées sont fournis par le moteur (src/scrapers/engine.py).
+
+# Plugins disponibles : nom → module qui l'enregistre, importé seulement à la première utilisation
+PLUGIN_MODULES = {
+    "leboncoin": "src.scrapers.leboncoin.plugin",
+    # "site_x": "src.scrapers.autres_sites.site_x_scraper",  # Exemple : domaine fictif, à adapter avant activation
+}
+
+_registry: dict[str, type["ScraperPlugin"]] = {}
+
+
+class ScraperPlugin(ABC):
+    """Scraper d'un site d'annonces, exécuté par le moteur commun."""
+
+    name: str                               # Identifiant du site (clé de PLUGIN_MODULES)
+    collection: str                         # Collection MongoDB des annonces normalisées
+    home_url: str                           # Page ouverte à la création de chaque session
+    default_params: dict = {}               # Recherche parcourue quand le job n'en précise pas
+    max_pages: int = 100                    # Pages parcourues au plus par recherche
+    requests_per_minute: float = 30         # Débit maximal du site, toutes sessions confondues
+    normalize_concurrency: int = PLUGIN_NORMALIZE_CONCURRENCY  # Nouvelles annonces normalisées en parallèle (images…)
+
+    async def bootstrap_session(self, page: "Page"):
+        """Prépare une session neuve (page d'accueil, cookies…) avant la première recherche."""
+        await page.goto(self.home_url, timeout=NAVIGATION_TIMEOUT_MS)
+
+    @abstractmethod
+    async def fetch_search_page(self, page: "Page", params: dict, page_number: int) -> dict | None:
+        """Page de résultats : {"ads": [annonces brutes], "total": nombre ou None}, None si illisible."""
+
+    @abstractmethod
+    def ad_id(self, raw: dict) -> str:
+        """Identifiant stable de l'annonce sur le site (devient `_id` en base)."""
+
+    @abstractmethod
+    def tracked_fields(self, raw: dict) -> dict:
+        """Champs suivis dont l'empreinte détecte une modification (voir TRACKED_FIELDS)."""
+
+    @abstractmethod
+    async def normalize_ad(self, raw: dict, fields: dict, detail: dict | None = None) -> dict:
+        """Document à insérer pour une nouvelle annonce."""
+
+    def is_last_page(self, response: dict, page_number: int) -> bool:
+        """La page `page_number` est la dernière de la recherche (page incomplète…) ; sinon le parcours
+        s'arrête sur une page vide ou quand `total` annonces ont été vues."""
+        return False
+
+    def publication_date(self, raw: dict) -> str | None:
+        """Date de publication (ISO) : arrêt du mode incrémental sous la date du dernier parcours terminé."""
+        return None
+
+    async def fetch_detail(self, page: "Page", raw: dict) -> dict | None:
+        """Détail d'une nouvelle annonce quand la page de résultats ne suffit pas (rien par défaut)."""
+        return None
+
+    def departement_id(self, raw: dict) -> str | None:
+        """Département de l'annonce, pour invalider le cache de l'API."""
+        return None
+
+    def rollup_observations(self, raw: dict, outcome: str, previous: dict | None) -> list[tuple[dict, int]]:
+        """Contributions aux statistiques de marché (src/database/rollups.py), aucune par défaut."""
+        return []
+
+    def search_params(self, params: dict, mode: str) -> dict:
+        """Paramètres effectivement recherchés selon le mode ("full" ou "incremental")."""
+        return params
+
+    def query_key(self, params: dict) -> str:
+        """Clé de l'état de pagination d'une recherche."""
+        canonical = json.dumps({k: str(v) for k, v in params.items()}, sort_keys=True)
+        return f"{self.name}:{hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:16]}"
+
+
+def register_plugin(plugin_class: type[ScraperPlugin]) -> type[ScraperPlugin]:
+    _registry[plugin_class.name] = plugin_class
+    return plugin_class
+
+
+def available_plugins() -> list[str]:
+    return sorted(PLUGIN_MODULES)
+
+
+def get_plugin(name: str) -> ScraperPlugin:
+    if name not in _registry:
+        if name not in PLUGIN_MODULES:
+            raise ValueError(f"Site inconnu : {name}")
+        importlib.import_module(PLUGIN_MODULES[name])
+    return _registry[name]()
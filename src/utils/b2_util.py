@@ -1,80 +1,169 @@
-import os
-import requests
-import boto3
-from botocore.client import Config
-from urllib.parse import urlparse
-import logging
-from botocore.handlers import disable_signing
-import os
-import requests
-from b2sdk.v2 import InMemoryAccountInfo, B2Api
-from urllib.parse import urlparse
+import asyncio
+import hashlib
 import logging
+import weakref
+from urllib.parse import urlparse, quote
+import httpx
+from src.utils.metrics import IMAGE_BYTES, IMAGE_SECONDS, IMAGE_FAILURES, observe_seconds
+from src.utils.request_manager import get_request_manager, retry_delay
+from src.utils.tracing import traced
+from src.config.logging_config import ad_log_sampled
+from src.config.settings import B2_REALM, B2_KEY_ID, B2_APPLICATION_KEY, B2_BUCKET_NAME, HTTP_MAX_RETRIES
 logger = logging.getLogger(__name__)
 
+# Realms nommés de l'API native B2 ; toute autre valeur de B2_REALM est une URL (serveur de substitution)
+B2_REALMS = {
+    "production": "https://api.backblazeb2.com",
+    "staging": "https://api.backblaze.net",
+}
+
+
+class B2Uploader:
+    """Envoi de fichiers via l'API native B2, sur le transport commun (src/utils/request_manager.py).
+
+    L'autorisation du compte et l'identifiant du bucket sont obtenus une fois, puis renouvelés
+    seulement à l'expiration du jeton ; les URL d'envoi sont réutilisées d'un fichier à l'autre.
+    """
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.account = None
+        self.bucket_id = None
+        self.upload_targets: list[dict] = []
+
+    async def _post(self, account: dict, endpoint: str, payload: dict) -> httpx.Response:
+        return await get_request_manager().post(
+            f"{account['apiUrl']}/b2api/v3/{endpoint}", json=payload,
+            headers={"Authorization": account["authorizationToken"]}
+        )
+
+    async def _api(self, endpoint: str, payload: dict) -> dict:
+        account = await self.authorize()
+        response = await self._post(account, endpoint, payload)
+        if response.status_code == 401:
+            # Jeton du compte expiré : une seule nouvelle autorisation, partagée par les tâches concurrentes
+            account = await self.authorize(expired_token=account["authorizationToken"])
+            response = await self._post(account, endpoint, payload)
+        response.raise_for_status()
+        return response.json()
+
+    async def authorize(self, expired_token: str | None = None) -> dict:
+        """Autorisation du compte en cours ; renouvelée si absente ou si son jeton est `expired_token`."""
+        async with self.lock:
+            account = self.account
+            if account is not None and account["authorizationToken"] != expired_token:
+                return account  # Déjà valide, ou renouvelée entre-temps par une autre tâche
+            if not (B2_KEY_ID and B2_APPLICATION_KEY and B2_BUCKET_NAME):
+                raise RuntimeError("B2_KEY_ID, B2_APPLICATION_KEY et B2_BUCKET_NAME doivent être définis")
+            realm = B2_REALMS.get(B2_REALM, B2_REALM).rstrip("/")
+            response = await get_request_manager().get(
+                f"{realm}/b2api/v3/b2_authorize_account", auth=(B2_KEY_ID, B2_APPLICATION_KEY)
+            )
+            response.raise_for_status()
+            authorization = response.json()
+            account = {**authorization["apiInfo"]["storageApi"], "authorizationToken": authorization["authorizationToken"],
+                       "accountId": authorization["accountId"]}
+            if self.bucket_id is None:
+                buckets = await self._post(account, "b2_list_buckets", {"accountId": account["accountId"], "bucketName": B2_BUCKET_NAME})
+                buckets.raise_for_status()
+                self.bucket_id = buckets.json()["buckets"][0]["bucketId"]
+            # Remplacement en une fois : les autres tâches voient l'ancien compte complet ou le nouveau
+            self.account = account
+            logger.info("🔑 Compte B2 autorisé")
+            return account
+
+    async def _upload_target(self) -> dict:
+        if self.upload_targets:
+            return self.upload_targets.pop()
+        return await self._api("b2_get_upload_url", {"bucketId": self.bucket_id})
+
+    async def upload(self, data: bytes, file_name: str, content_type: str) -> str:
+        headers = {
+            "X-Bz-File-Name": quote(file_name, safe="/"),
+            "Content-Type": content_type,
+            "X-Bz-Content-Sha1": hashlib.sha1(data).hexdigest(),
+        }
+        for attempt in range(HTTP_MAX_RETRIES + 1):
+            account = await self.authorize()
+            target = await self._upload_target()
+            try:
+                # Pas de nouvelle tentative sur la même URL : B2 demande d'en obtenir une autre
+                response = await get_request_manager().post(
+                    target["uploadUrl"], content=data, retries=0,
+                    headers={**headers, "Authorization": target["authorizationToken"]}
+                )
+            except httpx.TransportError as e:
+                response, error = None, str(e)
+            else:
+                if response.status_code == 200:
+                    self.upload_targets.append(target)
+                    return f"{account['downloadUrl']}/file/{B2_BUCKET_NAME}/{file_name}"
+                error = f"{response.status_code} {response.text[:200]}"
+            if attempt >= HTTP_MAX_RETRIES:
+                raise RuntimeError(f"Envoi B2 impossible : {error}")
+            # URL abandonnée ; sur 401 (jeton de l'URL expiré), une nouvelle URL suffit, sans attente
+            if response is None or response.status_code != 401:
+                await asyncio.sleep(retry_delay(attempt, response))
+
 
-def get_b2_api():
-    info = InMemoryAccountInfo()
-    b2_api = B2Api(info)
-    b2_api.authorize_account("production", "003a8db8fe4620d0000000001", "K003ytmOR03jy31uqTleH8u6xPGYfN0")
-    return b2_api
+# Un envoyeur par boucle d'événements, comme les clients HTTP qu'il utilise
+_uploaders: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, B2Uploader]" = weakref.WeakKeyDictionary()
 
-def upload_buffer_into_bucket(buffer: bytes, filename: str, target: str) -> str:
+def get_b2_uploader() -> B2Uploader:
+    loop = asyncio.get_running_loop()
+    uploader = _uploaders.get(loop)
+    if uploader is None:
+        uploader = _uploaders[loop] = B2Uploader()
+    return uploader
+
+
+async def upload_buffer_into_bucket(buffer: bytes, filename: str, target: str) -> str:
     try:
-        b2_api = get_b2_api()
-        bucket = b2_api.get_bucket_by_name("cercina-real-estate-files")
-        
         target_name = f"{target}/{filename}"
-        
-        file_info = bucket.upload_bytes(
-            data_bytes=buffer,
-            file_name=target_name,
-            content_type='image/jpeg'
-        )
-        
-        return f"https://f003.backblazeb2.com/file/cercina-real-estate-files/{target_name}"
-    
+        with observe_seconds(IMAGE_SECONDS, direction="upload"):
+            url = await get_b2_uploader().upload(buffer, target_name, "image/jpeg")
+        IMAGE_BYTES.labels("upload").inc(len(buffer))
+        return url
+
     except Exception as e:
+        IMAGE_FAILURES.labels("upload").inc()
         logger.error(f"Erreur B2: {str(e)}")
         raise
 
-# The rest of your code (sanitize_filename, upload_image_to_b2) can remain the same
-
-
-
 
 def sanitize_filename(filename: str) -> str:
     """Nettoie le nom du fichier pour éviter les erreurs"""
     if not filename:
         filename = "default_image.jpg"
     return "".join(c if c.isalnum() or c in "-_." else "_" for c in filename)
-def upload_image_to_b2(image_url: str, target: str = "real_estate") -> str:
-    """Version finale avec vérifications"""
+@traced()
+async def upload_image_to_b2(image_url: str, target: str = "real_estate") -> str:
+    """Télécharge l'image puis la transfère vers B2 ; retourne son URL B2, ou "N/A" en cas d'échec."""
     try:
         # Vérification URL valide
         if not image_url.startswith('http'):
             raise ValueError("URL invalide")
 
-        logger.info(f"📥 Téléchargement de l'image : {image_url}")
+        if ad_log_sampled():
+            logger.debug(f"📥 Téléchargement de l'image : {image_url}")
         parsed_url = urlparse(image_url)
         filename = sanitize_filename(parsed_url.path.split('/')[-1])
-        response = requests.get(
-            image_url,
-            headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, comme Gecko) Chrome/91.0.4472.124 Safari/537.36"},
-            timeout=10
-        )
-        response.raise_for_status()
+        try:
+            with observe_seconds(IMAGE_SECONDS, direction="download"):
+                response = await get_request_manager().get(image_url)
+                response.raise_for_status()
+        except httpx.HTTPError as e:
+            IMAGE_FAILURES.labels("download").inc()
+            logger.error(f"❌ Erreur HTTP lors du téléchargement : {str(e)}")
+            return "N/A"
+        IMAGE_BYTES.labels("download").inc(len(response.content))
 
         if not response.content or len(response.content) == 0:
             logger.error(f"⚠️ Image vide après téléchargement : {image_url}")
             return "N/A"
 
-        return upload_buffer_into_bucket(response.content, filename, target)
+        return await upload_buffer_into_bucket(response.content, filename, target)
 
-    except requests.exceptions.RequestException as e:
-        logger.error(f"❌ Erreur HTTP lors du téléchargement : {str(e)}")
-        return "N/A"
     except Exception as e:
         logger.error(f"❌ Erreur générale : {str(e)}")
         return "N/A"
-
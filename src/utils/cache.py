@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable
+from fastapi import Request, Response
+from loguru import logger
+from src.config.settings import CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES, CACHE_SHARED_BACKEND, CACHE_SHARED_DIR
+from src.database.database import get_collection
+from src.database.realStateLbc import CACHE_GLOBAL_SCOPE, cache_scope
+
+# 🔹 Cache des réponses de lecture de l'API.
+# La clé d'une entrée combine la route, les paramètres normalisés et les versions des périmètres
+# (tout le jeu d'annonces, ou un département) dont dépend la réponse. Le pipeline d'ingestion
+# incrémente ces versions (realStateLbc.bump_cache_versions) à chaque écriture : les entrées
+# périmées ne sont plus jamais adressées et disparaissent par expiration ou éviction.
+# La même clé sert d'ETag : un client à jour reçoit un 304 sans aucune requête sur les annonces.
+
+def request_scopes(departement_id: str | None = None, zipcode: str | None = None) -> list[str]:
+    """Périmètres d'invalidation d'une requête : ses départements si elle en est restreinte, sinon le global."""
+    departements = set()
+    if departement_id:
+        departements.update(value.strip() for value in departement_id.split(",") if value.strip())
+    if zipcode:
+        # Leboncoin numérote la Corse 20 ; les départements d'outre-mer ont trois chiffres (971…)
+        departements.update(code[:3] if code.startswith("97") else code[:2]
+                            for code in (value.strip() for value in zipcode.split(",")) if code)
+    return sorted(cache_scope(value) for value in departements) or [CACHE_GLOBAL_SCOPE]
+
+
+def normalize_params(request: Request) -> list[tuple[str, str]]:
+    """Paramètres de requête triés, valeurs multiples (séparées par des virgules) dédupliquées et triées."""
+    normalized = []
+    for name in sorted(set(request.query_params.keys())):
+        values = set()
+        for raw in request.query_params.getlist(name):
+            values.update(value.strip() for value in raw.split(",") if value.strip())
+        if values:
+            normalized.append((name, ",".join(sorted(values))))
+    return normalized
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class LocalResponseCache:
+    """Cache LRU en mémoire du processus, avec durée de vie par entrée."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    def get(self, key: str) -> bytes | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, body = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return body
+
+    def put(self, key: str, body: bytes):
+        self.entries[key] = (time.monotonic() + self.ttl_seconds, body)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+class MongoResponseCacheStore:
+    """Niveau partagé entre réplicas : collection `apiCache`, purgée par un index TTL."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.collection = get_collection("apiCache")
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def get(self, key: str) -> bytes | None:
+        entry = await self.collection.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+        return bytes(entry["body"]) if entry else None
+
+    async def put(self, key: str, body: bytes):
+        expires_at = datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+        await self.collection.replace_one({"_id": key}, {"_id": key, "body": body, "expires_at": expires_at}, upsert=True)
+
+
+class FileResponseCacheStore:
+    """Substitut local du niveau partagé : un fichier par entrée, partagé par les processus de la machine."""
+
+    def __init__(self, directory: str, ttl_seconds: float):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    async def ensure_indexes(self):
+        pass
+
+    def _read(self, key: str) -> bytes | None:
+        path = os.path.join(self.directory, key)
+        try:
+            if os.path.getmtime(path) + self.ttl_seconds < time.time():
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key: str, body: bytes):
+        # Écriture atomique : un lecteur concurrent ne voit jamais une entrée tronquée
+        tmp_path = os.path.join(self.directory, f"{key}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, os.path.join(self.directory, key))
+
+    async def get(self, key: str) -> bytes | None:
+        return await asyncio.to_thread(self._read, key)
+
+    async def put(self, key: str, body: bytes):
+        await asyncio.to_thread(self._write, key, body)
+
+
+_local_cache = LocalResponseCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+_shared_store = None
+
+async def init_response_cache():
+    """Ouvre le niveau partagé configuré (à appeler après init_db)."""
+    global _shared_store
+    if not CACHE_TTL_SECONDS or not CACHE_SHARED_BACKEND:
+        return
+    if CACHE_SHARED_BACKEND == "file":
+        _shared_store = FileResponseCacheStore(CACHE_SHARED_DIR, CACHE_TTL_SECONDS)
+    else:
+        _shared_store = MongoResponseCacheStore(CACHE_TTL_SECONDS)
+    await _shared_store.ensure_indexes()
+    logger.info(f"🗄️ Cache partagé des réponses : {CACHE_SHARED_BACKEND}")
+
+
+async def load_cache_versions(scopes: list[str]) -> dict[str, int]:
+    documents = await get_collection("cacheVersions").find({"_id": {"$in": scopes}}).to_list(length=len(scopes))
+    versions = {document["_id"]: document.get("v", 0) for document in documents}
+    return {scope: versions.get(scope, 0) for scope in scopes}
+
+
+async def cached_json(request: Request, scopes: list[str], compute: Callable[[], Awaitable[Any]],
+                      cacheable: bool = True) -> Response:
+    """Réponse JSON servie depuis le cache local, puis partagé, sinon calculée par `compute` et mise en cache.
+
+    Avec `cacheable=False` (réponse qui dépend de champs non versionnés), `compute` est appelée à chaque requête.
+    """
+    if not cacheable:
+        body = json.dumps(await compute(), default=_json_default, ensure_ascii=False).encode("utf-8")
+        return Response(content=body, media_type="application/json", headers={"Cache-Control": "no-store", "X-Cache": "bypass"})
+    versions = await load_cache_versions(scopes)
+    fingerprint = json.dumps([request.url.path, normalize_params(request), sorted(versions.items())])
+    key = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()
+    headers = {"ETag": f'"{key}"', "Cache-Control": "no-cache"}
+
+    # Le client détient déjà cette version : rien à relire ni à renvoyer
+    if_none_match = request.headers.get("if-none-match", "")
+    if headers["ETag"] in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    origin = "miss"
+    body = _local_cache.get(key) if CACHE_TTL_SECONDS else None
+    if body is not None:
+        origin = "hit"
+    elif _shared_store is not None:
+        body = await _shared_store.get(key)
+        if body is not None:
+            origin = "shared"
+            _local_cache.put(key, body)
+    if body is None:
+        body = json.dumps(await compute(), default=_json_default, ensure_ascii=False).encode("utf-8")
+        if CACHE_TTL_SECONDS:
+            _local_cache.put(key, body)
+            if _shared_store is not None:
+                await _shared_store.put(key, body)
+    return Response(content=body, media_type="application/json", headers={**headers, "X-Cache": origin})
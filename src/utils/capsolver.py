@@ -2,9 +2,9 @@ import os
 import time
 import aiohttp
 import logging
-import json
 import asyncio
 from playwright.async_api import Page
+from src.utils.metrics import CAPTCHA_SOLVES, CAPTCHA_SOLVE_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -52,13 +52,12 @@ async def bypass_datadome_captcha_by_capsolver(page: Page, captcha_url: str, pro
         }
     }
 
-    logger.info(f"🔧 Création de la tâche CapSolver pour {page.url} avec proxy {proxy_str}...")
-    logger.debug(f"Payload CapSolver : {json.dumps(payload, indent=2)}")
+    logger.info(f"🔧 Création de la tâche CapSolver pour {page.url} avec proxy {proxy_info['server']}...")
     try:
         async with aiohttp.ClientSession() as session:
             async with session.post("https://api.capsolver.com/createTask", json=payload, timeout=aiohttp.ClientTimeout(total=10)) as response:
                 create_task_data = await response.json()
-                logger.debug(f"Réponse CapSolver : {json.dumps(create_task_data, indent=2)}")
+                logger.debug(f"Réponse CapSolver : errorId={create_task_data.get('errorId')} taskId={create_task_data.get('taskId')}")
     except Exception as e:
         logger.error(f"❌ Erreur lors de la création de la tâche CapSolver : {e}")
         raise
@@ -78,7 +77,7 @@ async def bypass_datadome_captcha_by_capsolver(page: Page, captcha_url: str, pro
             async with aiohttp.ClientSession() as session:
                 async with session.post("https://api.capsolver.com/getTaskResult", json=result_payload, timeout=aiohttp.ClientTimeout(total=10)) as response:
                     result_data = await response.json()
-                    logger.debug(f"Réponse getTaskResult CapSolver (tentative {attempt+1}) : {json.dumps(result_data, indent=2)}")
+                    logger.debug(f"Réponse getTaskResult CapSolver (tentative {attempt+1}) : status={result_data.get('status')}")
         except Exception as e:
             logger.warning(f"⚠️ Erreur lors de la vérification : {e}")
             continue
@@ -123,12 +122,11 @@ async def bypass_datadome_captcha_by_2captcha(page: Page, captcha_url: str, prox
     }
 
     logger.info(f"🔧 Création de la tâche 2Captcha pour {page.url} avec proxy {proxy_host}:{proxy_port}...")
-    logger.debug(f"Payload 2Captcha : {json.dumps(payload, indent=2)}")
     try:
         async with aiohttp.ClientSession() as session:
             async with session.post("https://api.2captcha.com/in.php", json=payload, timeout=aiohttp.ClientTimeout(total=10)) as response:
                 create_task_data = await response.json()
-                logger.debug(f"Réponse 2Captcha : {json.dumps(create_task_data, indent=2)}")
+                logger.debug(f"Réponse 2Captcha : errorId={create_task_data.get('errorId')}")
     except Exception as e:
         logger.error(f"❌ Erreur lors de la création de la tâche 2Captcha : {e}")
         raise
@@ -156,7 +154,7 @@ async def bypass_datadome_captcha_by_2captcha(page: Page, captcha_url: str, prox
             async with aiohttp.ClientSession() as session:
                 async with session.post("https://api.2captcha.com/res.php", json=result_payload, timeout=aiohttp.ClientTimeout(total=10)) as response:
                     result_data = await response.json()
-                    logger.debug(f"Réponse getTaskResult 2Captcha (tentative {attempt+1}) : {json.dumps(result_data, indent=2)}")
+                    logger.debug(f"Réponse getTaskResult 2Captcha (tentative {attempt+1}) : status={result_data.get('status')}")
         except Exception as e:
             logger.warning(f"⚠️ Erreur lors de la vérification : {e}")
             continue
@@ -182,14 +180,27 @@ async def bypass_datadome_captcha_by_2captcha(page: Page, captcha_url: str, prox
     logger.error(f"❌ Timeout après {max_attempts * 5} secondes.")
     raise Exception("Timeout 2Captcha")
 
+async def _measured_solve(provider: str, solver, page: Page, captcha_url: str, proxy_info: dict, user_agent: str) -> bool:
+    """Exécute un fournisseur en mesurant sa durée et son résultat."""
+    start = time.perf_counter()
+    try:
+        solved = await solver(page, captcha_url, proxy_info, user_agent)
+        CAPTCHA_SOLVES.labels(provider, "solved").inc()
+        return solved
+    except Exception:
+        CAPTCHA_SOLVES.labels(provider, "failed").inc()
+        raise
+    finally:
+        CAPTCHA_SOLVE_SECONDS.labels(provider).observe(time.perf_counter() - start)
+
 async def solve_captcha(page: Page, captcha_url: str, proxy_info: dict, user_agent: str) -> bool:
     """Tente de résoudre le CAPTCHA avec CapSolver, puis 2Captcha."""
     try:
-        return await bypass_datadome_captcha_by_capsolver(page, captcha_url, proxy_info, user_agent)
+        return await _measured_solve("capsolver", bypass_datadome_captcha_by_capsolver, page, captcha_url, proxy_info, user_agent)
     except Exception as e:
         logger.warning(f"⚠️ Échec de CapSolver : {e}. Passage à 2Captcha...")
         try:
-            return await bypass_datadome_captcha_by_2captcha(page, captcha_url, proxy_info, user_agent)
+            return await _measured_solve("2captcha", bypass_datadome_captcha_by_2captcha, page, captcha_url, proxy_info, user_agent)
         except Exception as e2:
             logger.error(f"❌ Échec de 2Captcha : {e2}. Résolution impossible.")
             raise
\ No newline at end of file
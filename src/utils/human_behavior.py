@@ -1,19 +1,115 @@
 import random
-import time
+import asyncio
 import logging
-from playwright.sync_api import Page, Locator
+from contextvars import ContextVar
+from dataclasses import dataclass
+from playwright.async_api import Page, Locator
+from src.config.settings import HUMAN_BEHAVIOR_PROFILE, HUMAN_BEHAVIOR_BUDGET
 
 logger = logging.getLogger(__name__)
 
-def human_like_delay(min_time=1, max_time=3):
-    """Simule un délai aléatoire avec une distribution humaine plus réaliste."""
-    delay = random.uniform(min_time, max_time) * (1 + random.random() * 0.3)
-    if random.random() < 0.15:  # 15% de chance d'une pause plus longue (hésitation)
-        delay += random.uniform(1.5, 3)
-    logger.info(f"⏳ Attente aléatoire de {delay:.2f} secondes...")
-    time.sleep(delay)
+# Durée d'attente appliquée une fois le budget de la session épuisé
+EXHAUSTED_DELAY = 0.05
 
-def human_like_scroll_to_element(page: Page, element: str | Locator, scroll_steps=6, jitter=True, reverse=False):
+@dataclass(frozen=True)
+class BehaviorProfile:
+    """Paramètres d'un profil de vitesse du moteur de comportement humain."""
+    name: str
+    delay_scale: float                       # Multiplicateur des bornes min/max demandées
+    jitter: float                            # Allongement aléatoire maximal (0.3 = +30 %)
+    hesitation_probability: float            # Probabilité d'une pause d'hésitation
+    hesitation_range: tuple[float, float]    # Durée de l'hésitation (secondes)
+    cosmetic_actions: bool                   # Scrolls et mouvements de souris purement décoratifs
+    session_budget: float | None             # Attente volontaire maximale par session (None = illimitée)
+
+PROFILES = {
+    # Comportement historique : délais complets, aucune limite
+    "stealth": BehaviorProfile("stealth", 1.0, 0.3, 0.15, (1.5, 3.0), True, None),
+    "balanced": BehaviorProfile("balanced", 0.5, 0.2, 0.05, (0.5, 1.5), True, 180.0),
+    "fast": BehaviorProfile("fast", 0.15, 0.1, 0.0, (0.0, 0.0), False, 30.0),
+}
+
+class BehaviorSession:
+    """État du moteur pour une session de scraping : budget restant et temps passé en attentes volontaires."""
+
+    def __init__(self, profile: BehaviorProfile, budget: float | None = None):
+        self.profile = profile
+        self.budget = profile.session_budget if budget is None else budget
+        self.waited = 0.0
+        self.waits = 0
+        self.budget_clamped = 0
+        self.skipped_cosmetic = 0
+        self.api_path_available = False
+
+    def remaining_budget(self) -> float | None:
+        if self.budget is None:
+            return None
+        return max(self.budget - self.waited, 0.0)
+
+    def draw_delay(self, min_time: float, max_time: float) -> float:
+        """Tire un délai selon le profil puis le borne au budget restant."""
+        profile = self.profile
+        delay = random.uniform(min_time, max_time) * profile.delay_scale * (1 + random.random() * profile.jitter)
+        if random.random() < profile.hesitation_probability:
+            delay += random.uniform(*profile.hesitation_range)
+        remaining = self.remaining_budget()
+        if remaining is not None and delay > remaining:
+            self.budget_clamped += 1
+            delay = max(remaining, EXHAUSTED_DELAY)
+        return delay
+
+    def allows_cosmetic(self) -> bool:
+        """Les actions décoratives sont ignorées en profil rapide ou dès qu'un accès API direct existe."""
+        return self.profile.cosmetic_actions and not self.api_path_available
+
+    def skip_cosmetic(self, action: str):
+        self.skipped_cosmetic += 1
+        logger.debug(f"⏭ Action décorative ignorée ({self.profile.name}) : {action}")
+
+    def report(self) -> dict:
+        return {
+            "profile": self.profile.name,
+            "waited_seconds": round(self.waited, 2),
+            "waits": self.waits,
+            "budget_seconds": self.budget,
+            "budget_clamped": self.budget_clamped,
+            "skipped_cosmetic": self.skipped_cosmetic,
+        }
+
+_current_session: ContextVar[BehaviorSession | None] = ContextVar("behavior_session", default=None)
+
+def start_behavior_session(profile: str | None = None, budget: float | None = None) -> BehaviorSession:
+    """Démarre une session pour la tâche asyncio courante (chaque contexte Playwright a la sienne)."""
+    name = profile or HUMAN_BEHAVIOR_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Profil de comportement inconnu : {name} (attendu : {', '.join(PROFILES)})")
+    session = BehaviorSession(PROFILES[name], HUMAN_BEHAVIOR_BUDGET if budget is None else budget)
+    _current_session.set(session)
+    return session
+
+def get_behavior_session() -> BehaviorSession:
+    session = _current_session.get()
+    if session is None:
+        session = start_behavior_session()
+    return session
+
+def mark_api_path_available():
+    """Signale que les données arrivent directement par l'API : les gestes décoratifs deviennent inutiles."""
+    get_behavior_session().api_path_available = True
+
+async def human_like_delay(min_time=1, max_time=3):
+    """Simule un délai aléatoire selon le profil de la session, dans la limite de son budget.
+
+    Non tracé (un span par pause noierait jobSpans) : le total est dans BehaviorSession.report().
+    """
+    session = get_behavior_session()
+    delay = session.draw_delay(min_time, max_time)
+    logger.debug(f"⏳ Attente aléatoire de {delay:.2f} secondes...")
+    await asyncio.sleep(delay)
+    session.waited += delay
+    session.waits += 1
+
+async def human_like_scroll_to_element(page: Page, element: str | Locator, scroll_steps=6, jitter=True, reverse=False):
     """Défilement progressif avec variabilité humaine, adapté au navigateur."""
     try:
         if isinstance(element, str):
@@ -23,16 +119,23 @@ def human_like_scroll_to_element(page: Page, element: str | Locator, scroll_step
         else:
             raise ValueError("L'élément doit être un sélecteur string ou un Locator")
 
-        if not locator.is_visible(timeout=5000):
+        if not await locator.is_visible(timeout=5000):
             logger.warning(f"⚠️ Élément {element} introuvable ou non visible.")
             return
 
-        logger.info(f"🌀 Défilement humain vers {element} ({scroll_steps} étapes)...")
-        viewport_height = page.evaluate("window.innerHeight")
-        current_scroll = page.evaluate("window.scrollY")
+        session = get_behavior_session()
+        if not session.allows_cosmetic():
+            # Seul compte le fait que l'élément soit dans le viewport pour le clic
+            session.skip_cosmetic("scroll")
+            await locator.scroll_into_view_if_needed(timeout=2000)
+            return
+
+        logger.debug(f"🌀 Défilement humain vers {element} ({scroll_steps} étapes)...")
+        viewport_height = await page.evaluate("window.innerHeight")
+        current_scroll = await page.evaluate("window.scrollY")
 
         # Calculer la position cible
-        box = locator.bounding_box()
+        box = await locator.bounding_box()
         if not box:
             logger.warning(f"⚠️ Impossible de calculer la position de {element}.")
             return
@@ -46,25 +149,25 @@ def human_like_scroll_to_element(page: Page, element: str | Locator, scroll_step
             if reverse:
                 step_size = -abs(step_size)
 
-            page.mouse.wheel(0, int(step_size))  # Utilisation de wheel pour simuler le scroll
-            human_like_delay(0.2, 0.6)
+            await page.mouse.wheel(0, int(step_size))  # Utilisation de wheel pour simuler le scroll
+            await human_like_delay(0.2, 0.6)
             current_scroll += step_size
 
         # Ajustement final
-        locator.scroll_into_view_if_needed(timeout=2000)
+        await locator.scroll_into_view_if_needed(timeout=2000)
 
         # Simuler un léger overscroll ou ajustement
         if random.random() < 0.35:
             overscroll = random.uniform(-120, -40) if not reverse else random.uniform(40, 120)
-            page.mouse.wheel(0, int(overscroll))
-            human_like_delay(0.3, 0.8)
+            await page.mouse.wheel(0, int(overscroll))
+            await human_like_delay(0.3, 0.8)
 
-        human_like_delay(0.5, 1.5)  # Pause naturelle après arrivée
+        await human_like_delay(0.5, 1.5)  # Pause naturelle après arrivée
 
     except Exception as e:
         logger.error(f"⚠️ Erreur défilement : {e}")
 
-def human_like_click(page: Page, element: str | Locator, move_cursor=False, click_delay=0.3, click_variance=20, precision=0.95, retries=1):
+async def human_like_click(page: Page, element: str | Locator, move_cursor=False, click_delay=0.3, click_variance=20, precision=0.95, retries=1):
     """Clic réaliste avec micro-mouvements, compatible avec mobile et desktop."""
     for attempt in range(retries + 1):
         try:
@@ -75,11 +178,11 @@ def human_like_click(page: Page, element: str | Locator, move_cursor=False, clic
             else:
                 raise ValueError("L'élément doit être un sélecteur string ou un Locator")
 
-            if not locator.is_visible(timeout=5000):
+            if not await locator.is_visible(timeout=5000):
                 logger.warning(f"⚠️ Élément {element} introuvable ou non visible.")
                 return
 
-            box = locator.bounding_box()
+            box = await locator.bounding_box()
             if not box:
                 logger.warning(f"⚠️ Impossible d'obtenir la position de {element}.")
                 return
@@ -88,69 +191,79 @@ def human_like_click(page: Page, element: str | Locator, move_cursor=False, clic
             x = box['x'] + box['width'] * random.uniform(0.25, 0.75)
             y = box['y'] + box['height'] * random.uniform(0.25, 0.75)
 
+            session = get_behavior_session()
+            cosmetic = session.allows_cosmetic()
+            if not cosmetic:
+                session.skip_cosmetic("click")
+
             # Simuler un déplacement du curseur avant clic
-            if move_cursor and random.random() < precision:
-                page.mouse.move(
+            if cosmetic and move_cursor and random.random() < precision:
+                await page.mouse.move(
                     x + random.randint(-click_variance, click_variance),
                     y + random.randint(-click_variance, click_variance),
                     steps=random.randint(15, 35)
                 )
-                human_like_delay(0.1, click_delay)
+                await human_like_delay(0.1, click_delay)
 
             # Hésitation avant clic
-            if random.random() < 0.25:
-                human_like_delay(0.4, 1.0)
+            if cosmetic and random.random() < 0.25:
+                await human_like_delay(0.4, 1.0)
 
             # Clic avec légère variation
-            page.mouse.click(
+            await page.mouse.click(
                 x + random.randint(-5, 5),
                 y + random.randint(-5, 5),
                 delay=random.randint(50, 200)
             )
 
             # Micro-mouvement post-clic
-            if random.random() < 0.7:
-                page.mouse.move(
+            if cosmetic and random.random() < 0.7:
+                await page.mouse.move(
                     x + random.randint(-15, 15),
                     y + random.randint(-15, 15),
                     steps=random.randint(3, 8)
                 )
-                human_like_delay(0.05, 0.25)
+                await human_like_delay(0.05, 0.25)
 
             break
 
         except Exception as e:
             if attempt < retries:
                 logger.warning(f"⚠️ Réessai du clic ({attempt+1}/{retries})...")
-                human_like_delay(0.5, 1.2)
+                await human_like_delay(0.5, 1.2)
                 continue
             logger.error(f"⚠️ Erreur clic : {e}")
             raise
 
 # Fonctions "_search" conservées avec les mêmes paramètres
-def human_like_delay_search(min_time=1, max_time=3):
+async def human_like_delay_search(min_time=1, max_time=3):
     """Wrapper pour human_like_delay avec les mêmes paramètres."""
-    human_like_delay(min_time, max_time)
+    await human_like_delay(min_time, max_time)
 
-def human_like_scroll_to_element_search(page: Page, selector: str, scroll_steps=6, jitter=True, reverse=False):
+async def human_like_scroll_to_element_search(page: Page, selector: str, scroll_steps=6, jitter=True, reverse=False):
     """Wrapper pour human_like_scroll_to_element avec selector string."""
-    human_like_scroll_to_element(page, selector, scroll_steps, jitter, reverse)
+    await human_like_scroll_to_element(page, selector, scroll_steps, jitter, reverse)
 
-def human_like_click_search(page: Page, selector: str, move_cursor=False, click_delay=0.3, click_variance=20, precision=0.95):
+async def human_like_click_search(page: Page, selector: str, move_cursor=False, click_delay=0.3, click_variance=20, precision=0.95):
     """Wrapper pour human_like_click avec selector string."""
-    human_like_click(page, selector, move_cursor, click_delay, click_variance, precision, retries=1)
+    await human_like_click(page, selector, move_cursor, click_delay, click_variance, precision, retries=1)
 
-def human_like_mouse_pattern(page: Page):
+async def human_like_mouse_pattern(page: Page):
     """Simule des mouvements aléatoires réalistes adaptés au viewport."""
+    session = get_behavior_session()
+    if not session.allows_cosmetic():
+        session.skip_cosmetic("mouse_pattern")
+        return
+
     width, height = page.viewport_size["width"], page.viewport_size["height"]
 
-    logger.info("🖱️ Simulation de mouvements humains aléatoires...")
+    logger.debug("🖱️ Simulation de mouvements humains aléatoires...")
     for _ in range(random.randint(3, 7)):  # Variation du nombre de mouvements
         target_x = random.randint(int(width * 0.15), int(width * 0.85))
         target_y = random.randint(int(height * 0.15), int(height * 0.85))
 
         # Mouvement fluide avec courbe naturelle
-        page.mouse.move(
+        await page.mouse.move(
             target_x + random.randint(-25, 25),
             target_y + random.randint(-25, 25),
             steps=random.randint(20, 50)
@@ -158,11 +271,11 @@ def human_like_mouse_pattern(page: Page):
 
         # Pause avec probabilité d'hésitation
         if random.random() < 0.5:
-            human_like_delay(0.4, 1.2)
+            await human_like_delay(0.4, 1.2)
         else:
-            human_like_delay(0.1, 0.5)
+            await human_like_delay(0.1, 0.5)
 
     # Simuler un ajustement final
     if random.random() < 0.6:
-        page.mouse.wheel(0, random.randint(-80, 80))
-        human_like_delay(0.3, 0.8)
\ No newline at end of file
+        await page.mouse.wheel(0, random.randint(-80, 80))
+        await human_like_delay(0.3, 0.8)
\ No newline at end of file
@@ -0,0 +1,104 @@
+import os
+import time
+from contextlib import contextmanager
+from src.config.settings import PROMETHEUS_MULTIPROC_DIR
+
+# 🔹 Métriques du pipeline de scraping, exposées au format Prometheus sur /metrics.
+# Avec PROMETHEUS_MULTIPROC_DIR, chaque processus (API, workers, processus de scraping) écrit
+# ses valeurs dans ce répertoire et /metrics agrège l'ensemble. Le répertoire doit exister
+# avant l'import de prometheus_client et être vidé au redéploiement, pas à chaque démarrage.
+if PROMETHEUS_MULTIPROC_DIR:
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = PROMETHEUS_MULTIPROC_DIR
+
+from prometheus_client import (  # noqa: E402
+    CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST,
+    generate_latest, multiprocess, start_http_server,
+)
+
+# Latences : de quelques millisecondes (Mongo) à plus d'une minute (attente de l'API Leboncoin)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 70, 120)
+BYTES_BUCKETS = (1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000)
+
+# Pages de résultats
+PAGES_FETCHED = Counter("xtractify_pages_fetched_total", "Pages de résultats obtenues", ["source"])
+PAGE_CAPTURE_SECONDS = Histogram(
+    "xtractify_page_capture_seconds", "Durée d'obtention d'une page de résultats", ["source"], buckets=LATENCY_BUCKETS
+)
+PAGE_CAPTURE_FAILURES = Counter("xtractify_page_capture_failures_total", "Pages de résultats non obtenues", ["source"])
+
+# Annonces : new, changed, unchanged (doublon), error
+ADS_PROCESSED = Counter("xtractify_ads_processed_total", "Annonces traitées par résultat", ["outcome"])
+
+# MongoDB
+MONGO_WRITE_SECONDS = Histogram(
+    "xtractify_mongo_write_seconds", "Durée des écritures MongoDB", ["operation"], buckets=LATENCY_BUCKETS
+)
+
+# Images : direction = download (CDN Leboncoin) ou upload (B2)
+IMAGE_BYTES = Counter("xtractify_image_bytes_total", "Octets d'images transférés", ["direction"])
+IMAGE_SECONDS = Histogram(
+    "xtractify_image_transfer_seconds", "Durée des transferts d'images", ["direction"], buckets=LATENCY_BUCKETS
+)
+IMAGE_FAILURES = Counter("xtractify_image_failures_total", "Transferts d'images en échec", ["direction"])
+
+# CAPTCHA DataDome : défis rencontrés, résolutions par fournisseur et durée
+CAPTCHA_CHALLENGES = Counter("xtractify_captcha_challenges_total", "Défis CAPTCHA DataDome rencontrés")
+CAPTCHA_SOLVES = Counter("xtractify_captcha_solves_total", "Résolutions de CAPTCHA", ["provider", "outcome"])
+CAPTCHA_SOLVE_SECONDS = Histogram(
+    "xtractify_captcha_solve_seconds", "Durée de résolution d'un CAPTCHA", ["provider"], buckets=LATENCY_BUCKETS
+)
+
+# Sessions navigateur (proxy IP Royal) et jobs
+SESSIONS = Counter("xtractify_sessions_total", "Sessions de scraping par résultat", ["outcome"])
+PROXY_CHECKS = Counter("xtractify_proxy_checks_total", "Vérifications d'IP via le proxy", ["outcome"])
+JOBS = Counter("xtractify_jobs_total", "Jobs exécutés par les workers", ["kind", "outcome"])
+JOBS_IN_PROGRESS = Gauge(
+    "xtractify_jobs_in_progress", "Jobs en cours d'exécution", ["kind"], multiprocess_mode="livesum"
+)
+
+# Requêtes HTTP sortantes (src/utils/request_manager.py), par hôte
+HTTP_REQUESTS = Counter("xtractify_http_requests_total", "Requêtes HTTP sortantes par résultat", ["host", "outcome"])
+HTTP_REQUEST_SECONDS = Histogram(
+    "xtractify_http_request_seconds", "Durée des requêtes HTTP sortantes", ["host"], buckets=LATENCY_BUCKETS
+)
+HTTP_RETRIES = Counter("xtractify_http_retries_total", "Nouvelles tentatives de requêtes HTTP", ["host", "reason"])
+
+
+@contextmanager
+def observe_seconds(histogram, **labels):
+    """Mesure la durée du bloc dans `histogram` (avec ses labels)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        (histogram.labels(**labels) if labels else histogram).observe(time.perf_counter() - start)
+
+
+def _registry() -> CollectorRegistry | None:
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return None
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Corps et type de contenu de la réponse /metrics, agrégés sur tous les processus locaux."""
+    registry = _registry()
+    return (generate_latest(registry) if registry else generate_latest()), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int):
+    """Expose /metrics sur un port dédié (workers lancés sur d'autres machines que l'API)."""
+    registry = _registry()
+    if registry:
+        start_http_server(port, registry=registry)
+    else:
+        start_http_server(port)
+
+
+def mark_process_dead(pid: int):
+    """Libère les jauges d'un processus terminé en mode multiprocess."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
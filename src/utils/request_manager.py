@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import random
+import statistics
+import time
+import weakref
+from collections import deque
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import httpx
+from src.config.settings import (
+    HTTP_POOL_SIZE, HTTP_TIMEOUT_SECONDS, HTTP_MAX_RETRIES, HTTP_BACKOFF_SECONDS,
+    HTTP_DEFAULT_RATE, HTTP_HOST_RATES, HTTP_PROXY_SESSION_RATE
+)
+from src.utils.metrics import HTTP_REQUESTS, HTTP_REQUEST_SECONDS, HTTP_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# 🔹 Transport HTTP commun à toutes les requêtes sortantes hors navigateur (images, B2, proxy).
+# Un client httpx par hôte (et par session de proxy) garde ses connexions ouvertes, en HTTP/2
+# quand le serveur le propose ; chaque hôte et chaque session de proxy a son seau de jetons ;
+# les réponses 429/5xx et les erreurs réseau sont retentées avec un délai exponentiel aléatoire.
+#   manager = get_request_manager()
+#   response = await manager.get(url)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Échantillon de latences conservé par hôte pour host_stats()
+LATENCY_SAMPLE_SIZE = 1000
+
+
+class TokenBucket:
+    """Débit moyen de `rate` requêtes/s, avec des rafales jusqu'à `burst` requêtes."""
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.capacity = burst or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLE_SIZE)
+
+    def report(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+            "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1) if latencies else None,
+        }
+
+
+def retry_delay(attempt: int, response: httpx.Response | None = None) -> float:
+    """Délai avant la tentative suivante : Retry-After s'il est fourni, sinon exponentiel avec gigue."""
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return max(float(retry_after), 0)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0)
+            except (TypeError, ValueError):
+                pass
+    return random.uniform(0, HTTP_BACKOFF_SECONDS * 2 ** attempt)
+
+
+class RequestManager:
+    """Clients, limites de débit et statistiques des requêtes sortantes d'une boucle d'événements."""
+
+    def __init__(self):
+        self.clients: dict[tuple[str, str | None], httpx.AsyncClient] = {}
+        self.buckets: dict[str, TokenBucket] = {}
+        self.stats: dict[str, HostStats] = {}
+
+    def _client(self, host: str, proxy: str | None) -> httpx.AsyncClient:
+        client = self.clients.get((host, proxy))
+        if client is None:
+            from src.config.browser_config import USER_AGENTS
+            client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                proxy=proxy,
+                timeout=httpx.Timeout(HTTP_TIMEOUT_SECONDS),
+                limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE),
+                headers={"User-Agent": random.choice(USER_AGENTS)},
+                follow_redirects=True,
+            )
+            self.clients[(host, proxy)] = client
+        return client
+
+    def _bucket(self, key: str, rate: float) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(rate)
+        return bucket
+
+    async def request(self, method: str, url: str, *, proxy: str | None = None, retries: int = HTTP_MAX_RETRIES,
+                      **kwargs) -> httpx.Response:
+        """Envoie la requête au débit autorisé ; retente 429/5xx et erreurs réseau jusqu'à `retries` fois.
+
+        La dernière réponse est retournée telle quelle (statut compris) ; la dernière erreur réseau est levée.
+        """
+        host = urlparse(url).hostname or ""
+        stats = self.stats.setdefault(host, HostStats())
+        client = self._client(host, proxy)
+        for attempt in range(retries + 1):
+            await self._bucket(host, HTTP_HOST_RATES.get(host, HTTP_DEFAULT_RATE)).acquire()
+            if proxy:
+                await self._bucket(f"proxy:{proxy}", HTTP_PROXY_SESSION_RATE).acquire()
+            started = time.perf_counter()
+            stats.requests += 1
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                stats.errors += 1
+                HTTP_REQUESTS.labels(host, "network_error").inc()
+                if attempt >= retries:
+                    raise
+                reason, delay = type(e).__name__, retry_delay(attempt)
+            else:
+                elapsed = time.perf_counter() - started
+                stats.latencies.append(elapsed)
+                HTTP_REQUEST_SECONDS.labels(host).observe(elapsed)
+                HTTP_REQUESTS.labels(host, f"{response.status_code // 100}xx").inc()
+                if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                    if response.status_code >= 400:
+                        stats.errors += 1
+                    return response
+                reason, delay = str(response.status_code), retry_delay(attempt, response)
+            stats.retries += 1
+            HTTP_RETRIES.labels(host, reason).inc()
+            logger.debug(f"🔁 {method} {host} : {reason}, nouvelle tentative dans {delay:.2f}s ({attempt + 1}/{retries})")
+            await asyncio.sleep(delay)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def host_stats(self) -> dict[str, dict]:
+        """Requêtes, erreurs, nouvelles tentatives et latences p50/p95 par hôte."""
+        return {host: stats.report() for host, stats in sorted(self.stats.items())}
+
+    async def aclose(self):
+        await asyncio.gather(*(client.aclose() for client in self.clients.values()))
+        self.clients.clear()
+
+
+# Un gestionnaire par boucle d'événements : les clients httpx ne survivent pas à leur boucle
+_managers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, RequestManager]" = weakref.WeakKeyDictionary()
+
+def get_request_manager() -> RequestManager:
+    loop = asyncio.get_running_loop()
+    manager = _managers.get(loop)
+    if manager is None:
+        manager = _managers[loop] = RequestManager()
+    return manager
@@ -0,0 +1,183 @@
+import functools
+import inspect
+import os
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from loguru import logger
+from src.config.settings import TRACING_ENABLED, OTLP_ENDPOINT
+
+# 🔹 Spans légers par étape de scraping, regroupés par job.
+# Les spans sont accumulés en mémoire puis écrits en une fois dans la collection `jobSpans`
+# (à chaque battement de cœur du worker et en fin de job) ; hors job, le traçage ne coûte rien.
+
+_current_job: ContextVar[str | None] = ContextVar("trace_job_id", default=None)
+_current_span: ContextVar[str | None] = ContextVar("trace_span_id", default=None)
+
+_buffers: dict[str, list] = {}
+_buffers_lock = threading.Lock()
+
+
+def get_current_job_id() -> str | None:
+    return _current_job.get()
+
+def bind_job(job_id: str):
+    """Associe les spans du contexte courant (et des tâches créées ensuite) au job."""
+    with _buffers_lock:
+        _buffers.setdefault(job_id, [])
+    return _current_job.set(job_id)
+
+def unbind_job(token):
+    _current_job.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Mesure un bloc ; sans job associé, le bloc s'exécute sans enregistrement."""
+    job_id = _current_job.get()
+    if not TRACING_ENABLED or job_id is None:
+        yield
+        return
+
+    span_id = os.urandom(8).hex()
+    parent_id = _current_span.get()
+    token = _current_span.set(span_id)
+    start = time.time()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _current_span.reset(token)
+        end = time.time()
+        record = {
+            "job_id": job_id,
+            "span_id": span_id,
+            "parent_id": parent_id,
+            "name": name,
+            "start": start,
+            "end": end,
+            "duration": end - start,
+            "status": status,
+            "attributes": attributes,
+        }
+        with _buffers_lock:
+            _buffers.setdefault(job_id, []).append(record)
+
+
+def traced(name: str | None = None):
+    """Décorateur : enregistre chaque appel (fonction synchrone ou coroutine) comme un span."""
+    def decorator(func):
+        span_name = name or func.__name__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _spans_collection():
+    from src.database.realStateLbc import db
+    return db["jobSpans"]
+
+def flush_job_spans(job_id: str, final: bool = False) -> int:
+    """Écrit les spans en attente du job ; en fin de job, les exporte aussi vers le collecteur OTLP."""
+    with _buffers_lock:
+        pending = _buffers.get(job_id, [])
+        _buffers[job_id] = []
+        if final:
+            _buffers.pop(job_id, None)
+    if pending:
+        _spans_collection().insert_many(pending)
+    if final and OTLP_ENDPOINT:
+        export_otlp(job_id)
+    return len(pending)
+
+def load_job_spans(job_id: str) -> list[dict]:
+    return list(_spans_collection().find({"job_id": job_id}, {"_id": 0}).sort("start", 1))
+
+
+def flame_breakdown(spans: list[dict]) -> dict:
+    """Arbre {name, value, children} agrégé par chemin d'appel (format d3-flame-graph), plus totaux par étape."""
+    children_of: dict[str | None, list] = {}
+    known = {s["span_id"] for s in spans}
+    for s in spans:
+        parent = s["parent_id"] if s["parent_id"] in known else None
+        children_of.setdefault(parent, []).append(s)
+
+    def build(parent_id: str | None) -> list[dict]:
+        merged: dict[str, dict] = {}
+        for s in children_of.get(parent_id, []):
+            node = merged.setdefault(s["name"], {"name": s["name"], "value": 0.0, "count": 0, "children": []})
+            node["value"] += s["duration"]
+            node["count"] += 1
+            node["children"].extend(build(s["span_id"]))
+        # Fusion des sous-arbres de même nom sous un même nœud
+        for node in merged.values():
+            node["children"] = _merge_nodes(node["children"])
+        return list(merged.values())
+
+    roots = build(None)
+    by_stage: dict[str, dict] = {}
+    for s in spans:
+        stage = by_stage.setdefault(s["name"], {"name": s["name"], "count": 0, "total_seconds": 0.0, "errors": 0})
+        stage["count"] += 1
+        stage["total_seconds"] += s["duration"]
+        stage["errors"] += s["status"] == "error"
+    wall = (max(s["end"] for s in spans) - min(s["start"] for s in spans)) if spans else 0.0
+    return {
+        "wall_seconds": round(wall, 3),
+        "stages": sorted(by_stage.values(), key=lambda stage: stage["total_seconds"], reverse=True),
+        "flame": {"name": "job", "value": sum(node["value"] for node in roots), "children": roots},
+    }
+
+def _merge_nodes(nodes: list[dict]) -> list[dict]:
+    merged: dict[str, dict] = {}
+    for node in nodes:
+        target = merged.setdefault(node["name"], {"name": node["name"], "value": 0.0, "count": 0, "children": []})
+        target["value"] += node["value"]
+        target["count"] += node["count"]
+        target["children"].extend(node["children"])
+    for node in merged.values():
+        node["children"] = _merge_nodes(node["children"])
+    return list(merged.values())
+
+
+def to_otlp(job_id: str, spans: list[dict]) -> dict:
+    """Spans du job au format OTLP/JSON (le job_id, hexadécimal sur 32 caractères, sert de trace id)."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "xtractify"}}]},
+        "scopeSpans": [{
+            "scope": {"name": "src.utils.tracing"},
+            "spans": [{
+                "traceId": job_id,
+                "spanId": s["span_id"],
+                "parentSpanId": s["parent_id"] or "",
+                "name": s["name"],
+                "kind": 1,
+                "startTimeUnixNano": str(int(s["start"] * 1e9)),
+                "endTimeUnixNano": str(int(s["end"] * 1e9)),
+                "status": {"code": 2 if s["status"] == "error" else 1},
+                "attributes": [{"key": k, "value": {"stringValue": str(v)}} for k, v in s.get("attributes", {}).items()],
+            } for s in spans],
+        }],
+    }]}
+
+def export_otlp(job_id: str):
+    import requests  # Chargé seulement quand un collecteur est configuré
+    try:
+        response = requests.post(f"{OTLP_ENDPOINT.rstrip('/')}/v1/traces", json=to_otlp(job_id, load_job_spans(job_id)), timeout=10)
+        response.raise_for_status()
+    except Exception as e:
+        logger.warning(f"⚠️ Export OTLP impossible pour le job {job_id} : {e}")
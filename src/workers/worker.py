@@ -0,0 +1,125 @@
+import argparse
+import asyncio
+import os
+import platform
+import socket
+import uuid
+from loguru import logger
+from playwright.async_api import async_playwright, Browser
+from src.config.browser_config import launch_browser
+from src.config.logging_config import setup_logging
+from src.config.settings import (
+    SCRAPER_CONCURRENCY, JOB_LEASE_SECONDS, JOB_HEARTBEAT_SECONDS, WORKER_POLL_SECONDS, WORKER_METRICS_PORT
+)
+from src.database.job_queue import lease_job, heartbeat_job, complete_job, fail_job, release_job, ensure_job_indexes
+from src.scrapers.engine import run_plugin_job
+from src.scrapers.leboncoin.location_scraper import run_leboncoin_job
+from src.utils.metrics import JOBS, JOBS_IN_PROGRESS, start_metrics_server
+from src.utils.tracing import bind_job, unbind_job, flush_job_spans
+
+# 🔹 Worker de scraping : consomme la file de jobs MongoDB avec un navigateur partagé.
+# Pour monter en charge, lancer d'autres workers sur n'importe quelle machine :
+#   python -m src.workers.worker --slots 2
+
+JOB_RUNNERS = {
+    "leboncoin": run_leboncoin_job,
+    "site": run_plugin_job,  # Tout site enregistré (src/scrapers/plugin.py), via le moteur commun
+}
+
+
+def make_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+async def keep_lease(job_id: str, worker_id: str, job_task: asyncio.Task):
+    """Prolonge le bail du job ; l'annule si un autre worker l'a repris entre-temps."""
+    while not job_task.done():
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        if not await asyncio.to_thread(heartbeat_job, job_id, worker_id, JOB_LEASE_SECONDS):
+            logger.warning(f"💔 Bail perdu pour le job {job_id}, abandon de l'exécution")
+            job_task.cancel()
+            return
+        await asyncio.to_thread(flush_job_spans, job_id)
+
+async def run_job(browser: Browser, job: dict, worker_id: str):
+    runner = JOB_RUNNERS.get(job["kind"])
+    if runner is None:
+        await asyncio.to_thread(fail_job, job["_id"], worker_id, f"Type de job inconnu : {job['kind']}")
+        return
+
+    logger.info(f"🛠️ [{worker_id}] Job {job['_id']} ({job['kind']}, tentative {job['attempts']}) : {job['payload']}")
+    # La tâche du job hérite du contexte : tous ses spans sont rattachés au job
+    trace_token = bind_job(job["_id"])
+    job_task = asyncio.create_task(runner(browser, **job["payload"]))
+    unbind_job(trace_token)
+    heartbeat = asyncio.create_task(keep_lease(job["_id"], worker_id, job_task))
+    JOBS_IN_PROGRESS.labels(job["kind"]).inc()
+    try:
+        result = await job_task
+    except asyncio.CancelledError:
+        if heartbeat.done():
+            JOBS.labels(job["kind"], "lease_lost").inc()
+            return  # Bail perdu : le job appartient désormais à un autre worker
+        await asyncio.to_thread(release_job, job["_id"], worker_id)
+        raise
+    except Exception as e:
+        logger.error(f"⚠️ Job {job['_id']} en échec : {e}")
+        JOBS.labels(job["kind"], "error").inc()
+        await asyncio.to_thread(fail_job, job["_id"], worker_id, str(e))
+        return
+    finally:
+        heartbeat.cancel()
+        JOBS_IN_PROGRESS.labels(job["kind"]).dec()
+        try:
+            await asyncio.to_thread(flush_job_spans, job["_id"], True)
+        except Exception as e:
+            logger.warning(f"⚠️ Spans du job {job['_id']} non enregistrés : {e}")
+
+    if result.get("status") == "error":
+        JOBS.labels(job["kind"], "error").inc()
+        await asyncio.to_thread(fail_job, job["_id"], worker_id, result.get("message", "Erreur de scraping"))
+    else:
+        JOBS.labels(job["kind"], "success").inc()
+        await asyncio.to_thread(complete_job, job["_id"], worker_id, result)
+        logger.info(f"✅ Job {job['_id']} terminé")
+
+async def worker_slot(browser: Browser, worker_id: str):
+    """Boucle d'un emplacement du worker : un job à la fois."""
+    while True:
+        job = await asyncio.to_thread(lease_job, worker_id, JOB_LEASE_SECONDS)
+        if job is None:
+            await asyncio.sleep(WORKER_POLL_SECONDS)
+            continue
+        await run_job(browser, job, worker_id)
+
+async def run_worker(slots: int = SCRAPER_CONCURRENCY):
+    worker_id = make_worker_id()
+    await asyncio.to_thread(ensure_job_indexes)
+    if WORKER_METRICS_PORT:
+        start_metrics_server(WORKER_METRICS_PORT)
+        logger.info(f"📊 Métriques du worker exposées sur le port {WORKER_METRICS_PORT}")
+    logger.info(f"👷 Worker {worker_id} démarré ({slots} job(s) simultané(s))")
+
+    async with async_playwright() as playwright:
+        browser = await launch_browser(playwright)
+        try:
+            await asyncio.gather(*(worker_slot(browser, worker_id) for _ in range(slots)))
+        finally:
+            await browser.close()
+
+def main():
+    parser = argparse.ArgumentParser(prog="xtractify-worker", description="Worker de scraping Xtractify")
+    parser.add_argument("--slots", type=int, default=SCRAPER_CONCURRENCY, help="Nombre de jobs exécutés simultanément")
+    args = parser.parse_args()
+    setup_logging()
+
+    if platform.system() == "Windows":
+        # Playwright a besoin de la boucle Proactor pour lancer ses sous-processus
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    try:
+        asyncio.run(run_worker(args.slots))
+    except KeyboardInterrupt:
+        logger.info("🛑 Worker arrêté, jobs en cours rendus à la file")
+
+
+if __name__ == "__main__":
+    main()
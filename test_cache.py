@@ -0,0 +1,112 @@
+import asyncio
+import json
+from starlette.requests import Request
+from src.utils import cache
+from src.utils.cache import normalize_params, request_scopes, cached_json
+
+
+def make_request(query: str, headers: dict | None = None, path: str = "/api/v1/listings") -> Request:
+    return Request({
+        "type": "http", "method": "GET", "path": path, "query_string": query.encode("utf-8"),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+    })
+
+
+def test_normalize_params_ignores_order_duplicates_and_blanks():
+    first = make_request("typeBien=Maison,Appartement&city=Paris&departement_id=75")
+    second = make_request("departement_id=75&city=Paris&typeBien=Appartement&typeBien=Maison,&typeBien=Maison")
+    assert normalize_params(first) == normalize_params(second) == [
+        ("city", "Paris"), ("departement_id", "75"), ("typeBien", "Appartement,Maison"),
+    ]
+
+
+def test_request_scopes():
+    assert request_scopes() == ["all"]
+    assert request_scopes("75, 092") == ["dep:75", "dep:92"]
+    assert request_scopes(zipcode="75011,97411,20000") == ["dep:20", "dep:75", "dep:974"]
+
+
+def run_cached(monkeypatch, query: str, versions: dict, headers: dict | None = None):
+    calls = []
+
+    async def load_cache_versions(scopes):
+        return {scope: versions.get(scope, 0) for scope in scopes}
+
+    async def compute():
+        calls.append(query)
+        return {"items": [{"id": "1"}]}
+
+    monkeypatch.setattr(cache, "load_cache_versions", load_cache_versions)
+    monkeypatch.setattr(cache, "_local_cache", cache.LocalResponseCache(16, 60))
+    response = asyncio.run(cached_json(make_request(query, headers), ["all"], compute))
+    return response, calls
+
+
+def test_etag_is_stable_for_equivalent_queries_and_changes_with_versions(monkeypatch):
+    first, _ = run_cached(monkeypatch, "city=Paris&typeBien=Maison,Appartement", {"all": 3})
+    same, _ = run_cached(monkeypatch, "typeBien=Appartement,Maison&city=Paris", {"all": 3})
+    bumped, _ = run_cached(monkeypatch, "city=Paris&typeBien=Maison,Appartement", {"all": 4})
+    assert first.headers["ETag"] == same.headers["ETag"] != bumped.headers["ETag"]
+    assert json.loads(first.body) == {"items": [{"id": "1"}]}
+
+
+def test_matching_if_none_match_returns_304_without_computing(monkeypatch):
+    first, _ = run_cached(monkeypatch, "city=Paris", {"all": 1})
+    revalidated, calls = run_cached(monkeypatch, "city=Paris", {"all": 1}, {"If-None-Match": f'W/{first.headers["ETag"]}'})
+    assert revalidated.status_code == 304 and calls == []
+    stale, calls = run_cached(monkeypatch, "city=Paris", {"all": 2}, {"If-None-Match": first.headers["ETag"]})
+    assert stale.status_code == 200 and calls == ["city=Paris"]
+
+
+def test_local_cache_evicts_least_recently_used():
+    local = cache.LocalResponseCache(max_entries=2, ttl_seconds=60)
+    local.put("a", b"1")
+    local.put("b", b"2")
+    local.get("a")
+    local.put("c", b"3")
+    assert local.get("b") is None and local.get("a") == b"1" and local.get("c") == b"3"
+
+
+class CountingCollection:
+    def __init__(self):
+        self.calls = []
+
+    def distinct(self, field, query):
+        self.calls.append("distinct")
+        return ["75"]
+
+    def update_many(self, query, update):
+        self.calls.append("update_many")
+        return type("Result", (), {"modified_count": len(query["_id"]["$in"])})()
+
+
+def test_mark_annonces_seen_is_one_write_and_bumps_only_on_reactivation(monkeypatch):
+    from src.database import realStateLbc
+    bumps = []
+    monkeypatch.setattr(realStateLbc, "bump_cache_versions", bumps.append)
+    target = CountingCollection()
+    known = {"1": {"_id": "1"}, "2": {"_id": "2", "expired": False}}
+    assert realStateLbc.mark_annonces_seen(["1", "2", "3"], "shard", target, known) == 3
+    assert target.calls == ["update_many"] and bumps == []
+    known["2"] = {"_id": "2", "expired": True, "departement_id": "92"}
+    realStateLbc.mark_annonces_seen(["1", "2"], "shard", target, known)
+    assert target.calls == ["update_many"] * 2 and bumps == [{"92"}]
+
+
+def test_volatile_fields_are_served_without_cache(monkeypatch):
+    from src.api.listings import cached_projection, cacheable_fields
+    assert "last_seen_at" not in cached_projection(None)
+    assert cached_projection("id,last_seen_at") == {"id": 1, "last_seen_at": 1, "_id": 1}
+    assert cacheable_fields(None) and cacheable_fields("id,price") and not cacheable_fields("id,last_seen_at")
+
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"items": []}
+
+    monkeypatch.setattr(cache, "_local_cache", cache.LocalResponseCache(16, 60))
+    for _ in range(2):
+        response = asyncio.run(cached_json(make_request("fields=last_seen_at"), ["all"], compute, cacheable=False))
+        assert response.headers["X-Cache"] == "bypass" and "ETag" not in response.headers
+    assert len(calls) == 2
@@ -0,0 +1,115 @@
+import asyncio
+import pytest
+from src.config.settings import PAGE_MAX_RETRIES
+from src.scrapers import engine
+from src.scrapers.engine import RateLimiter, crawl_query
+from src.scrapers.plugin import ScraperPlugin, get_plugin
+
+
+class FakePlugin(ScraperPlugin):
+    name = "fake"
+    collection = "fake"
+    home_url = "https://fake.example/"
+
+    def __init__(self, pages: dict[int, dict | None]):
+        self.pages = pages
+        self.fetched = []
+
+    async def fetch_search_page(self, page, params, page_number):
+        self.fetched.append(page_number)
+        return self.pages.get(page_number)
+
+    def is_last_page(self, response, page_number):
+        return len(response["ads"]) < 2
+
+    def ad_id(self, raw):
+        return str(raw["id"])
+
+    def publication_date(self, raw):
+        return raw.get("date")
+
+    def tracked_fields(self, raw):
+        return {"price": raw.get("price")}
+
+    async def normalize_ad(self, raw, fields, detail=None):
+        return dict(fields)
+
+
+def ads(*ids, date="2025-03-01"):
+    return {"ads": [{"id": ad_id, "date": date} for ad_id in ids], "total": None}
+
+
+@pytest.fixture
+def crawl(monkeypatch):
+    """crawl_query sans base : état en mémoire, persistance remplacée par la part d'annonces connues."""
+    runs = {"state": {}, "completed": []}
+
+    async def persist_ads(plugin, page, page_ads, shard_key, seen, limiter, summary):
+        summary["ads"] += len(page_ads)
+        return runs.get("known_ratio", 0.0)
+
+    def save_page_checkpoint(key, state, page_number, page_ads, pivot=None, dates=None):
+        state.update(last_completed_page=page_number, ads_seen=state.get("ads_seen", 0) + len(page_ads))
+
+    monkeypatch.setattr(engine, "start_crawl", lambda key, params, resume=True: runs["state"])
+    monkeypatch.setattr(engine, "save_page_checkpoint", save_page_checkpoint)
+    monkeypatch.setattr(engine, "complete_crawl", lambda key, state, summary: runs["completed"].append(summary))
+    monkeypatch.setattr(engine, "persist_ads", persist_ads)
+
+    def run(plugin, mode="full", max_pages=10):
+        return asyncio.run(crawl_query(plugin, None, {}, mode, max_pages, RateLimiter(0), set()))
+
+    runs["run"] = run
+    return runs
+
+
+def test_last_page_makes_the_run_exhaustive(crawl):
+    plugin = FakePlugin({1: ads("1", "2"), 2: ads("3")})
+    summary = crawl["run"](plugin)
+    assert plugin.fetched == [1, 2]
+    assert summary["exhaustive"] and summary["ads"] == 3 and crawl["completed"] == [summary]
+
+
+def test_page_cap_or_unreadable_page_is_not_exhaustive(crawl):
+    assert not crawl["run"](FakePlugin({1: ads("1", "2"), 2: ads("3", "4")}), max_pages=2)["exhaustive"]
+    crawl["state"] = {}
+    plugin = FakePlugin({1: ads("1", "2")})
+    summary = crawl["run"](plugin)
+    # Page illisible : nouvelles tentatives, puis arrêt sans clore l'état (reprise au prochain lancement)
+    assert plugin.fetched == [1] + [2] * PAGE_MAX_RETRIES
+    assert not summary["exhaustive"] and len(crawl["completed"]) == 1
+
+
+def test_incremental_stops_below_the_high_water_mark(crawl):
+    crawl["state"]["high_water_mark"] = "2025-03-01"
+    plugin = FakePlugin({1: ads("1", "2", date="2025-02-28"), 2: ads("3", "4")})
+    summary = crawl["run"](plugin, mode="incremental")
+    assert plugin.fetched == [1] and summary["stopped_early"] and not summary["exhaustive"]
+
+
+def test_example_plugin_reads_its_search_api():
+    from src.scrapers.autres_sites.site_x_scraper import SiteXPlugin
+
+    class FakeResponse:
+        ok, status = True, 200
+
+        async def json(self):
+            return {"count": 31, "results": [{"id": 81, "price": 950, "surface": "42 m²", "zipcode": "69003"}]}
+
+    class FakeRequest:
+        async def get(self, url, params, timeout):
+            self.params = params
+            return FakeResponse()
+
+    class FakePage:
+        request = FakeRequest()
+
+    plugin = get_plugin("site_x")
+    assert isinstance(plugin, SiteXPlugin)
+    response = asyncio.run(plugin.fetch_search_page(FakePage(), plugin.default_params, 2))
+    assert FakePage.request.params == {"category": "locations", "page": 2, "per_page": plugin.page_size}
+    raw = response["ads"][0]
+    assert response["total"] == 31 and plugin.is_last_page(response, 2)
+    document = asyncio.run(plugin.normalize_ad(raw, plugin.tracked_fields(raw)))
+    assert document["id"] == "81" and document["departement_id"] == "69"
+    assert document["surface_m2"] == 42 and document["price_m2"] == round(950 / 42, 2)
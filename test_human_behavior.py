@@ -0,0 +1,20 @@
+import asyncio
+from src.utils.human_behavior import human_like_delay, start_behavior_session
+
+
+def test_waits_are_reported_and_capped_by_the_budget():
+    async def session():
+        behavior = start_behavior_session("fast", budget=0.05)
+        for _ in range(3):
+            await human_like_delay(1, 2)
+        return behavior.report()
+
+    report = asyncio.run(session())
+    assert report["profile"] == "fast" and report["waits"] == 3
+    # Chaque pause dépasse le budget restant : ramenée au budget, puis au délai minimal
+    assert report["budget_clamped"] == 3 and report["waited_seconds"] <= 0.16
+
+
+def test_delays_are_not_traced():
+    # Les étapes appelantes (lecture de page, traitement des annonces) portent les spans
+    assert not hasattr(human_like_delay, "__wrapped__")
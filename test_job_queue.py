@@ -0,0 +1,29 @@
+from pymongo.errors import DuplicateKeyError
+from src.database import job_queue
+from src.database.job_queue import enqueue_job
+
+
+class RacingCollection:
+    """Un autre processus insère le même job entre la recherche et l'insertion."""
+
+    def __init__(self):
+        self.active = None
+        self.inserted = []
+
+    def find_one(self, query, projection=None):
+        return self.active
+
+    def insert_one(self, document):
+        if document["dedup_key"] == "crawl:75" and not self.inserted:
+            self.inserted.append(document)
+            self.active = {"_id": "other-process"}
+            raise DuplicateKeyError("E11000 duplicate key error index: dedup_key_active")
+        self.inserted.append(document)
+
+
+def test_concurrent_enqueue_returns_the_existing_job(monkeypatch):
+    collection = RacingCollection()
+    monkeypatch.setattr(job_queue, "jobs_collection", collection)
+    assert enqueue_job("leboncoin", {}, dedup_key="crawl:75") == "other-process"
+    job_id = enqueue_job("leboncoin", {})
+    assert collection.inserted[-1]["_id"] == job_id and collection.inserted[-1]["status"] == "queued"
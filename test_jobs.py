@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+import pytest
+from src.api import jobs
+from src.config.settings import EXPIRY_GRACE_HOURS
+
+NOW = datetime(2025, 3, 1, 12, 0)
+RUN_STARTED_AT = NOW - timedelta(days=1)
+
+
+def crawl_state(status="completed", mode="full", exhaustive=True, started_at=RUN_STARTED_AT):
+    return {
+        "status": status,
+        # Un nouveau parcours a pu démarrer : started_at ne désigne plus le parcours résumé par last_run
+        "started_at": (NOW - timedelta(minutes=5)).isoformat(),
+        "last_run": {"mode": mode, "exhaustive": exhaustive,
+                     "started_at": started_at.isoformat() if started_at else None,
+                     "finished_at": (RUN_STARTED_AT + timedelta(hours=2)).isoformat()},
+    }
+
+
+@pytest.fixture
+def states(monkeypatch):
+    states = {}
+    monkeypatch.setattr(jobs, "load_crawl_state", states.get)
+    return states
+
+
+def test_cutoff_uses_the_completed_run_start(states):
+    states["a"] = crawl_state()
+    assert jobs.expiry_cutoff({"key": "a"}, NOW) == RUN_STARTED_AT
+
+
+def test_cutoff_respects_the_grace_period(states):
+    states["a"] = crawl_state(started_at=NOW - timedelta(minutes=30))
+    assert jobs.expiry_cutoff({"key": "a"}, NOW) == NOW - timedelta(hours=EXPIRY_GRACE_HOURS)
+
+
+@pytest.mark.parametrize("state", [
+    crawl_state(status="in_progress"),
+    crawl_state(mode="incremental"),
+    crawl_state(exhaustive=False),
+    crawl_state(started_at=None),
+    None,
+])
+def test_no_cutoff_without_a_completed_exhaustive_full_run(states, state):
+    if state is not None:
+        states["a"] = state
+    assert jobs.expiry_cutoff({"key": "a"}, NOW) is None
+
+
+def test_sweep_protects_ads_covered_by_overlapping_shards(states, monkeypatch):
+    targets = [
+        {"key": "paris-low", "label": "d_75 / prix 0-500", "params": {"locations": "d_75", "price": "0-500"}},
+        {"key": "idf", "label": "r_12", "params": {"locations": "r_12"}},
+        {"key": "gironde", "label": "d_33", "params": {"locations": "d_33"}},
+        {"key": "paris", "label": "d_75", "params": {"locations": "d_75"}},
+    ]
+    states["paris-low"] = crawl_state()
+    states["idf"] = crawl_state(status="in_progress")
+    states["gironde"] = crawl_state()
+    states["paris"] = crawl_state(started_at=RUN_STARTED_AT + timedelta(hours=1))
+    calls = []
+    monkeypatch.setattr(jobs, "schedule_targets", lambda: targets)
+    monkeypatch.setattr(jobs, "expire_unseen_annonces", lambda key, cutoff, protected: calls.append((key, protected)) or 0)
+
+    jobs.sweep_expired_annonces()
+    calls = dict(calls)
+    # Le shard régional en cours de parcours protège toutes les annonces qu'il couvre
+    # Un shard voisin terminé ne protège que les annonces qu'il a revues après son propre seuil
+    assert calls["paris-low"] == [
+        {"region_id": "12"},
+        {"departement_id": "75", "last_seen_at": {"$gte": RUN_STARTED_AT + timedelta(hours=1)}},
+    ]
+    assert calls["gironde"] == []
+    assert "idf" not in calls
+
+
+def test_last_page_comes_from_the_api_response():
+    from src.config.settings import ADS_PER_PAGE
+    from src.scrapers.leboncoin.listings_parser import is_last_page
+    full_page = {"ads": [{}] * ADS_PER_PAGE, "total": ADS_PER_PAGE * 5}
+    assert not is_last_page(full_page, 2) and not is_last_page(None, 2)
+    assert is_last_page(full_page, 5)
+    assert is_last_page({"ads": [{}], "total": None}, 1) and is_last_page({"ads": []}, 3)
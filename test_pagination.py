@@ -0,0 +1,41 @@
+from src.scrapers.pagination import PaginationTracker
+
+
+def page(ids, total):
+    return {"ads": [{"list_id": ad_id} for ad_id in ids], "total": total}
+
+
+def make_tracker():
+    return PaginationTracker(lambda ad: str(ad["list_id"]), page_size=3)
+
+
+def test_new_ads_at_the_top_only_produce_duplicates():
+    tracker = make_tracker()
+    assert [ad["list_id"] for ad in tracker.observe(1, page([1, 2, 3], 9)).fresh] == [1, 2, 3]
+    # Une annonce publiée en tête repousse la 3 sur la page 2
+    window = tracker.observe(2, page([3, 4, 5], 10))
+    assert [ad["list_id"] for ad in window.fresh] == [4, 5]
+    assert window.duplicates == 1 and window.gap_pages == []
+
+
+def test_removed_ads_trigger_a_refetch_of_the_previous_page():
+    tracker = make_tracker()
+    tracker.observe(1, page([1, 2, 3], 9))
+    tracker.observe(2, page([4, 5, 6], 9))
+    # Deux annonces retirées : 7 et 8 ont glissé sur la page 2, la page 3 commence à 9
+    window = tracker.observe(3, page([9, 10, 11], 7))
+    assert window.shift == 2 and window.gap_pages == [2]
+    recovered = tracker.observe_refetch(2, page([6, 7, 8], 7))
+    assert [ad["list_id"] for ad in recovered] == [7, 8]
+    # Une page déjà re-parcourue ne l'est plus
+    assert tracker.observe(4, page([12], 6)).gap_pages == [3]
+    assert tracker.report()["recovered"] == 2 and tracker.report()["unique_ads"] == 12
+
+
+def test_repeated_windows_exhaust_the_search():
+    tracker = make_tracker()
+    tracker.observe(1, page([1, 2, 3], 3))
+    tracker.observe(2, page([1, 2, 3], 3))
+    assert not tracker.exhausted
+    tracker.observe(3, page([1, 2, 3], 3))
+    assert tracker.exhausted
@@ -0,0 +1,34 @@
+import asyncio
+import time
+import httpx
+from src.config.settings import HTTP_BACKOFF_SECONDS
+from src.utils.request_manager import TokenBucket, retry_delay
+
+
+def timed_acquires(bucket: TokenBucket, count: int) -> float:
+    async def acquire_all():
+        started = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(count)))
+        return time.monotonic() - started
+
+    return asyncio.run(acquire_all())
+
+
+def test_token_bucket_allows_an_initial_burst():
+    assert timed_acquires(TokenBucket(rate=10, burst=5), 5) < 0.05
+
+
+def test_token_bucket_enforces_the_average_rate():
+    # 5 jetons d'emblée, puis 10 jetons à 50/s : au moins 0,2 s
+    elapsed = timed_acquires(TokenBucket(rate=50, burst=5), 15)
+    assert 0.18 <= elapsed < 1
+
+
+def test_token_bucket_without_rate_never_waits():
+    assert timed_acquires(TokenBucket(rate=0), 1000) < 0.1
+
+
+def test_retry_delay_honours_retry_after():
+    response = httpx.Response(429, headers={"Retry-After": "3"})
+    assert retry_delay(0, response) == 3
+    assert 0 <= retry_delay(2) <= HTTP_BACKOFF_SECONDS * 4
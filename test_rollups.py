@@ -0,0 +1,77 @@
+import random
+from datetime import datetime
+from src.database.rollups import (
+    SKETCH_ALPHA, ROLLUP_DIMENSIONS, sketch_bin, sketch_value, rollup_increments, merge_rollups
+)
+
+
+def exact_quantile(values, quantile):
+    ordered = sorted(values)
+    return ordered[int(quantile * (len(ordered) - 1))]
+
+
+def buckets_for(prices, week=datetime(2025, 2, 10)):
+    annonces = [({"departement_id": "75", "city": "Paris", "typeBien": "Appartement", "publication_date": week,
+                  "price": price, "price_m2": price / 40}, 1) for price in prices]
+    return rollup_increments(annonces)
+
+
+def as_document(increment):
+    """Seau tel que stocké par record_rollups (`$inc` appliqué à un document vide)."""
+    document = dict(increment["fields"])
+    for name, value in increment["inc"].items():
+        if "." in name:
+            field, index = name.split(".")
+            document.setdefault(field, {})[index] = value
+        else:
+            document[name] = value
+    return document
+
+
+def test_sketch_value_is_within_alpha_of_its_bin():
+    for value in (1, 9.5, 480, 1234.56, 98765):
+        representative = sketch_value(int(sketch_bin(value)))
+        assert abs(representative - value) <= SKETCH_ALPHA * value
+
+
+def test_merged_quantiles_stay_within_alpha():
+    rng = random.Random(7)
+    prices = [rng.lognormvariate(6.7, 0.4) for _ in range(2000)]
+    # Deux semaines fusionnées : les histogrammes s'additionnent
+    documents = [as_document(bucket) for prices_week, week in ((prices[:1200], datetime(2025, 2, 10)),
+                                                                 (prices[1200:], datetime(2025, 2, 17)))
+                 for key, bucket in buckets_for(prices_week, week).items() if key.startswith("departement_id|")]
+    merged = merge_rollups(documents)
+    assert merged["count"] == 2000 and merged["price"]["count"] == 2000
+    assert abs(merged["price"]["mean"] - sum(prices) / len(prices)) < 0.01
+    for name, quantile in (("median", 0.5), ("p90", 0.9)):
+        exact = exact_quantile(prices, quantile)
+        assert abs(merged["price"][name] - exact) <= SKETCH_ALPHA * exact + 0.01
+
+
+def test_city_rollups_are_keyed_by_departement():
+    assert all("city" not in dimension or "departement_id" in dimension for dimension in ROLLUP_DIMENSIONS)
+    keys = buckets_for([900])
+    assert "departement_id+city|75|Paris|2025-02-10" in keys
+
+
+
+def test_rebuild_invalidates_every_cached_response(monkeypatch):
+    from src.database import rollups
+
+    class EmptyCollection:
+        name = "marketRollups"
+
+        def find(self, *args, **kwargs):
+            return []
+
+        def drop(self):
+            pass
+
+    bumps = []
+    monkeypatch.setattr(rollups, "collection", EmptyCollection())
+    monkeypatch.setattr(rollups, "rollups_collection", EmptyCollection())
+    monkeypatch.setattr(rollups, "db", {"marketRollups_rebuild": EmptyCollection()})
+    monkeypatch.setattr(rollups, "bump_cache_versions", bumps.append)
+    assert rollups.rebuild_rollups() == 0
+    assert bumps == [[]]
@@ -0,0 +1,76 @@
+import os
+import pytest
+from pydantic import ValidationError
+from src.config import settings as settings_module
+from src.config.settings import Settings, load_settings
+
+
+@pytest.fixture
+def environment(tmp_path, monkeypatch):
+    """Répertoire de profils temporaire ; l'environnement du processus est restauré après le test."""
+    saved = dict(os.environ)
+    monkeypatch.setattr(settings_module, "ENVIRONMENT_DIR", str(tmp_path))
+    for name in (*Settings.model_fields, *settings_module.LEGACY_NAMES):
+        os.environ.pop(name, None)
+    os.environ.pop("XTRACTIFY_ENV", None)
+    yield tmp_path
+    os.environ.clear()
+    os.environ.update(saved)
+
+
+def test_env_strings_are_parsed():
+    settings = Settings(
+        BROWSER_HEADLESS="yes", LOG_JSON="0", BLOCKED_RESOURCE_TYPES="media,font,",
+        HTTP_HOST_RATES="img.leboncoin.fr=20,api64.ipify.org=0.5", HUMAN_BEHAVIOR_BUDGET="", SCRAPER_CONCURRENCY="4",
+    )
+    assert settings.BROWSER_HEADLESS is True and settings.LOG_JSON is False
+    assert settings.BLOCKED_RESOURCE_TYPES == ["media", "font"]
+    assert settings.HTTP_HOST_RATES == {"img.leboncoin.fr": 20.0, "api64.ipify.org": 0.5}
+    assert settings.HUMAN_BEHAVIOR_BUDGET is None and settings.SCRAPER_CONCURRENCY == 4
+
+
+def test_shard_result_cap_is_derived_unless_set():
+    assert Settings(ADS_PER_PAGE="10", SHARD_MAX_PAGES="3").SHARD_RESULT_CAP == 30
+    assert Settings(ADS_PER_PAGE="10", SHARD_RESULT_CAP="500").SHARD_RESULT_CAP == 500
+
+
+def test_invalid_value_is_rejected():
+    with pytest.raises(ValidationError):
+        Settings(SCRAPER_CONCURRENCY="deux")
+
+
+def test_profile_file_is_loaded_and_process_env_wins(environment):
+    (environment / "staging.env").write_text("SCRAPER_CONCURRENCY=2\nLOG_LEVEL=WARNING\n", encoding="utf-8")
+    os.environ["LOG_LEVEL"] = "DEBUG"
+    settings = load_settings("staging")
+    assert settings.SCRAPER_CONCURRENCY == 2
+    assert settings.LOG_LEVEL == "DEBUG"
+
+
+def test_missing_profile(environment):
+    # Profil par défaut absent : valeurs par défaut
+    assert load_settings("local").SCRAPER_CONCURRENCY == Settings().SCRAPER_CONCURRENCY
+    # Profil demandé explicitement mais introuvable : erreur au démarrage
+    os.environ["XTRACTIFY_ENV"] = "staging"
+    with pytest.raises(FileNotFoundError):
+        load_settings("staging")
+
+
+def test_every_setting_is_exported_as_a_constant():
+    for name in Settings.model_fields:
+        assert getattr(settings_module, name) == getattr(settings_module.settings, name)
+
+
+def test_legacy_names_are_accepted(environment):
+    (environment / "local.env").write_text(
+        "AWS_S3_ACCESS_KEY=key\nB2_BUCKET_NAME=images\nAWS_S3_BUCKET_NAME=old\n"
+        "IP_ROYAL_PROXY_PASS_BASE=secret_country-fr_session-abc_lifetime-120m\n", encoding="utf-8")
+    settings = load_settings("local")
+    assert settings.B2_KEY_ID == "key" and settings.B2_BUCKET_NAME == "images"
+    assert settings.IP_ROYAL_PROXY_PASSWORD == "secret"
+
+
+def test_prod_requires_its_secrets(environment):
+    (environment / "prod.env").write_text("MONGO_URI=mongodb://db\nB2_KEY_ID=key\n", encoding="utf-8")
+    with pytest.raises(RuntimeError, match="B2_APPLICATION_KEY"):
+        load_settings("prod")
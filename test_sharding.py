@@ -0,0 +1,74 @@
+import asyncio
+from src.scrapers.leboncoin.sharding import (
+    LEBONCOIN_REGIONS, PRICE_BANDS, SURFACE_BANDS, Shard, subdivide, plan_shards, shard_filter, shards_overlap
+)
+
+
+def assert_contiguous(bands):
+    assert bands[0][0] == 0 and bands[-1][1] is None
+    for (_, high), (next_low, _) in zip(bands, bands[1:]):
+        assert next_low == high
+
+
+def test_bands_cover_the_whole_line():
+    assert_contiguous(PRICE_BANDS)
+    assert_contiguous(SURFACE_BANDS)
+    # Valeurs entre deux entiers : une seule tranche les couvre
+    for param, field, bands, value in (("price", "price", PRICE_BANDS, 499.5), ("square", "surface_m2", SURFACE_BANDS, 19.5)):
+        conditions = [shard_filter({param: Shard(price=band).search_params({})["price"]})[field] for band in bands]
+        covering = [c for c in conditions if c["$gte"] <= value and ("$lt" not in c or value < c["$lt"])]
+        assert len(covering) == 1
+
+
+def test_subdivide_follows_region_departement_price_surface():
+    assert subdivide(Shard()) == [Shard(region_id=region_id) for region_id in LEBONCOIN_REGIONS]
+    assert [shard.departement_id for shard in subdivide(Shard(region_id="12"))] == LEBONCOIN_REGIONS["12"]
+    departement = Shard(region_id="12", departement_id="75")
+    assert [shard.price for shard in subdivide(departement)] == PRICE_BANDS
+
+
+def test_subdivide_bisects_price_into_disjoint_halves():
+    halves = subdivide(Shard(departement_id="75", price=(500, 800)))
+    assert [shard.price for shard in halves] == [(500, 650), (650, 800)]
+    open_ended = subdivide(Shard(departement_id="75", price=(2500, None)))
+    assert [shard.price for shard in open_ended] == [(2500, 5000), (5000, None)]
+
+
+def test_subdivide_falls_back_to_surface_then_stops():
+    narrow = Shard(departement_id="75", price=(500, 520))
+    assert [shard.surface for shard in subdivide(narrow)] == SURFACE_BANDS
+    assert [shard.surface for shard in subdivide(Shard(departement_id="75", price=(500, 520), surface=(0, 20)))] == [(0, 10), (10, 20)]
+    assert subdivide(Shard(departement_id="75", price=(500, 520), surface=(0, 8))) == []
+
+
+def test_plan_shards_keeps_every_leaf_under_cap():
+    # Un seul département volumineux, le reste de la France tient dans un shard par région
+    async def count_results(params: dict) -> int:
+        if params.get("locations") == "r_12":
+            return 5000
+        if params.get("locations") == "d_75":
+            return 900 if "price" not in params else 150
+        return 10
+
+    plan = asyncio.run(plan_shards(count_results, base_params={}, cap=200))
+    assert all(item["total"] <= 200 for item in plan)
+    paris = [item for item in plan if item["params"].get("locations") == "d_75"]
+    assert [item["params"]["price"] for item in paris] == ["0-500", "500-800", "800-1100", "1100-1500", "1500-2500", "2500-max"]
+    assert len({item["key"] for item in plan}) == len(plan)
+
+
+def test_shard_filter_matches_search_params():
+    assert shard_filter({"locations": "d_75", "price": "500-800", "square": "150-max"}) == {
+        "departement_id": "75",
+        "price": {"$gte": 500, "$lt": 800},
+        "surface_m2": {"$gte": 150},
+    }
+    assert shard_filter({"locations": "r_12"}) == {"region_id": "12"}
+
+
+def test_shards_overlap():
+    paris_low = {"locations": "d_75", "price": "0-500"}
+    assert not shards_overlap(paris_low, {"locations": "d_75", "price": "500-800"})
+    assert shards_overlap(paris_low, {"locations": "r_12", "price": "400-600"})
+    assert not shards_overlap(paris_low, {"locations": "d_33", "price": "0-500"})
+    assert shards_overlap(paris_low, {})